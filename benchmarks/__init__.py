@@ -0,0 +1,3 @@
+"""
+Benchmarks for the WebP to MP4 converter
+"""
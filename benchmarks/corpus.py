@@ -0,0 +1,142 @@
+"""
+Synthetic Benchmark Corpus
+Generates a reproducible set of WebP files covering the shapes of real inputs
+"""
+
+import os
+import json
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image
+
+# Bumped whenever the generated files change, so stale corpora are rebuilt
+CORPUS_VERSION = 1
+
+# Name of the file recording how a corpus directory was generated
+MANIFEST_FILE = 'manifest.json'
+
+# One corpus file
+#   name    -- case name, also the file name without extension
+#   kind    -- 'static', 'full' (every pixel changes) or 'partial' (a sprite moves over a fixed background)
+#   size    -- (width, height) of the canvas
+#   frames  -- number of frames
+Case = namedtuple('Case', ['name', 'kind', 'size', 'frames'])
+
+# Corpus presets; 'quick' keeps a run short, 'full' covers 10 to 5000 frames.
+# Pillow holds every frame in memory while saving, so large canvases get fewer frames.
+PRESETS = {
+    'quick': [
+        Case('static_small', 'static', (512, 512), 1),
+        Case('static_4k', 'static', (3840, 2160), 1),
+        Case('full_small', 'full', (320, 240), 10),
+        Case('partial_sticker', 'partial', (512, 512), 100),
+        Case('tiny_long', 'partial', (32, 32), 500),
+        Case('partial_4k', 'partial', (3840, 2160), 10),
+    ],
+    'full': [
+        Case('static_small', 'static', (512, 512), 1),
+        Case('static_4k', 'static', (3840, 2160), 1),
+        Case('full_small', 'full', (320, 240), 10),
+        Case('full_720p', 'full', (1280, 720), 60),
+        Case('partial_sticker', 'partial', (512, 512), 1000),
+        Case('tiny_long', 'partial', (32, 32), 5000),
+        Case('partial_4k', 'partial', (3840, 2160), 30),
+        Case('full_4k', 'full', (3840, 2160), 8),
+    ],
+}
+
+# Frame duration of the animated files in milliseconds
+FRAME_DURATION = 40
+
+
+def _background(size, seed):
+    """A smooth, deterministic RGBA gradient"""
+    width, height = size
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    phase = rng.random(3) * 6.28
+    channels = [
+        (np.sin(6 * x + 4 * y + phase[i]) * 0.5 + 0.5) * 255
+        for i in range(3)
+    ]
+    rgb = np.stack(channels, axis=-1).astype(np.uint8)
+    alpha = np.full((height, width, 1), 255, dtype=np.uint8)
+    return np.concatenate([rgb, alpha], axis=-1)
+
+
+def _frames(case):
+    """Yield the frames of a case as PIL images"""
+    width, height = case.size
+    background = _background(case.size, seed=len(case.name))
+
+    if case.kind in ('static', 'full'):
+        for index in range(case.frames):
+            # Shift the whole gradient so every pixel changes
+            shift = (index * 7) % width
+            yield Image.fromarray(np.roll(background, shift, axis=1))
+        return
+
+    # A semi-transparent sprite moving over a fixed background; libwebp stores only the changed area
+    sprite = max(4, min(width, height) // 8)
+    for index in range(case.frames):
+        frame = background.copy()
+        x = (index * 3) % max(1, width - sprite)
+        y = (index * 2) % max(1, height - sprite)
+        frame[y:y + sprite, x:x + sprite] = (255, 64, 32, 160)
+        yield Image.fromarray(frame)
+
+
+def generate_case(case, path):
+    """
+    Write one corpus file.
+
+    Args:
+        case (Case): Description of the file
+        path (str): Where to write the WebP file
+    """
+    frames = list(_frames(case))
+    if len(frames) == 1:
+        frames[0].save(path, 'WEBP', quality=80, method=0)
+    else:
+        frames[0].save(path, 'WEBP', save_all=True, append_images=frames[1:],
+                       duration=FRAME_DURATION, loop=0, quality=80, method=0)
+
+
+def ensure_corpus(directory, preset='quick', log=None):
+    """
+    Generate the corpus for a preset unless an identical one already exists.
+
+    Args:
+        directory (str): Corpus directory
+        preset (str): Name of the preset in PRESETS
+        log (callable, optional): Called with a message for every generated file
+
+    Returns:
+        list: (Case, path) for every file of the preset
+    """
+    cases = PRESETS[preset]
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    if manifest.get('version') != CORPUS_VERSION:
+        manifest = {'version': CORPUS_VERSION, 'cases': {}}
+
+    files = []
+    for case in cases:
+        path = os.path.join(directory, case.name + '.webp')
+        description = [case.kind, list(case.size), case.frames]
+        if manifest['cases'].get(case.name) != description or not os.path.exists(path):
+            if log:
+                log(f"Generating {case.name} ({case.size[0]}x{case.size[1]}, {case.frames} frames)")
+            generate_case(case, path)
+            manifest['cases'][case.name] = description
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=1)
+        files.append((case, path))
+    return files
@@ -0,0 +1,269 @@
+"""
+Benchmark Runner
+Times each conversion stage on the synthetic corpus and compares runs
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+from benchmarks.corpus import PRESETS, ensure_corpus
+from benchmarks.startup import run_startup_benchmarks
+from main.core.colour import get_colour_stage
+from main.core.converter import WebPConverter
+from main.core.decoder import WebPDecoder
+from main.core.encoder import FFmpegEncoder
+from main.core.probe import probe
+
+# Stages timed for every case
+STAGES = ('probe', 'decode', 'handoff', 'encode', 'convert')
+
+# Default relative slowdown reported as a regression
+DEFAULT_THRESHOLD = 0.10
+
+# Slowdowns smaller than this (seconds) are treated as noise
+DEFAULT_MIN_DELTA = 0.005
+
+# Frame rate used for encoding, so the encoder workload does not depend on detection
+BENCH_FPS = 25.0
+
+# Default corpus location, reused between runs
+DEFAULT_CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.corpus')
+
+
+def time_stages(path, output_file):
+    """
+    Run one conversion with every stage timed separately.
+
+    Decoding/compositing, handing frames to the encoder and encoding are timed in a
+    single instrumented, sequential pass; the end-to-end conversion, in which decoding
+    and encoding overlap, is timed on its own.
+
+    Args:
+        path (str): Input WebP file
+        output_file (str): Scratch output file
+
+    Returns:
+        tuple: (timings, frame_count, output_frames, result) where timings maps each stage to
+            seconds and result is the ConversionResult of the end-to-end conversion
+    """
+    timings = dict.fromkeys(STAGES, 0.0)
+
+    start = time.perf_counter()
+    probe(path)
+    timings['probe'] = time.perf_counter() - start
+
+    decoder = WebPDecoder(path)
+    colour = get_colour_stage()
+    frames = decoder.unique_frames()
+    encoder = None
+    output_frames = 0
+    while True:
+        start = time.perf_counter()
+        frame = next(frames, None)
+        timings['decode'] += time.perf_counter() - start
+        if frame is None:
+            break
+
+        start = time.perf_counter()
+        data = colour.apply(frame.pixels)
+        timings['handoff'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        if encoder is None:
+            if decoder.is_animated:
+                encoder = FFmpegEncoder(output_file, colour.output_size(decoder.size), BENCH_FPS).open()
+            else:
+                encoder = FFmpegEncoder.still(output_file, colour.output_size(decoder.size), 3).open()
+        encoder.write_data(data, frame.repeat, frame.duration if decoder.is_animated else None)
+        timings['encode'] += time.perf_counter() - start
+        output_frames += 1
+
+    start = time.perf_counter()
+    encoder.close()
+    timings['encode'] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = WebPConverter.convert_file(path, output_file, BENCH_FPS)
+    timings['convert'] = time.perf_counter() - start
+
+    return timings, decoder.frame_count, output_frames, result
+
+
+def run_benchmarks(files, repeat=3, log=None):
+    """
+    Benchmark every corpus file.
+
+    Args:
+        files (list): (Case, path) pairs from ensure_corpus()
+        repeat (int): Runs per case; the fastest time of each stage is kept
+        log (callable, optional): Called with a progress message per case
+
+    Returns:
+        dict: Results keyed by case name
+    """
+    results = {}
+    scratch_dir = tempfile.mkdtemp(prefix='webp2mp4-bench-')
+    try:
+        for case, path in files:
+            output_file = os.path.join(scratch_dir, case.name + '.mp4')
+            best = None
+            for _ in range(repeat):
+                timings, frame_count, output_frames, result = time_stages(path, output_file)
+                if best is None:
+                    best = timings
+                else:
+                    best = {stage: min(best[stage], timings[stage]) for stage in STAGES}
+
+            results[case.name] = {
+                'kind': case.kind,
+                'size': list(case.size),
+                'frames': frame_count,
+                'encoded_frames': output_frames,
+                'stages': best,
+                'frames_per_second': frame_count / best['convert'] if best['convert'] > 0 else 0.0,
+                # Busy time of the decoder thread and the encoder feed during the last conversion;
+                # with overlap, convert approaches the larger of the two instead of their sum
+                'pipeline': {
+                    'decode_busy': result.decode_time,
+                    'encode_busy': result.encode_time,
+                },
+            }
+            if log:
+                log(f"{case.name}: " + ", ".join(f"{stage} {best[stage] * 1000:.1f} ms" for stage in STAGES))
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+    return results
+
+
+def _git_commit():
+    """Commit of the working tree, if it is a git checkout"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def find_regressions(baseline, current, threshold=DEFAULT_THRESHOLD, min_delta=DEFAULT_MIN_DELTA):
+    """
+    Compare two benchmark reports.
+
+    Args:
+        baseline (dict): Earlier report
+        current (dict): New report
+        threshold (float): Relative slowdown counted as a regression (0.1 = 10%)
+        min_delta (float): Absolute slowdown in seconds below which differences are ignored
+
+    Returns:
+        list: (case, stage, baseline_seconds, current_seconds) for every regression
+    """
+    regressions = []
+    for name, result in current['cases'].items():
+        base = baseline.get('cases', {}).get(name)
+        if base is None:
+            continue
+        for stage, seconds in result['stages'].items():
+            base_seconds = base['stages'].get(stage)
+            if base_seconds is None:
+                continue
+            if seconds - base_seconds > max(min_delta, base_seconds * threshold):
+                regressions.append((name, stage, base_seconds, seconds))
+    return regressions
+
+
+def build_parser():
+    """Build the argument parser"""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Time the conversion stages on a synthetic WebP corpus.",
+    )
+    parser.add_argument("--preset", choices=sorted(PRESETS), default='quick',
+                        help="corpus preset (default: %(default)s)")
+    parser.add_argument("--cases", default=None,
+                        help="comma-separated case names to run (default: all cases of the preset)")
+    parser.add_argument("--corpus-dir", default=DEFAULT_CORPUS_DIR,
+                        help="where the corpus is generated and reused (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per case; the fastest is kept (default: %(default)s)")
+    parser.add_argument("-o", "--output", default=None,
+                        help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", default=None,
+                        help="JSON report of an earlier run; exit 1 if any stage regressed")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown counted as a regression (default: %(default)s)")
+    parser.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA,
+                        help="slowdowns below this many seconds are ignored (default: %(default)s)")
+    parser.add_argument("--startup-only", action="store_true",
+                        help="only time the imports of the entry points against their budgets")
+    return parser
+
+
+def main(argv=None):
+    """
+    Run the benchmarks
+
+    Args:
+        argv (list, optional): Command-line arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        int: Exit code; 1 if a regression against the baseline was found or
+            an entry point exceeded its import budget
+    """
+    args = build_parser().parse_args(argv)
+
+    def log(message):
+        print(message, file=sys.stderr)
+
+    startup, violations = run_startup_benchmarks(log=log)
+    for violation in violations:
+        log(f"OVER BUDGET {violation}")
+
+    if args.startup_only:
+        files = []
+    else:
+        files = ensure_corpus(args.corpus_dir, args.preset, log)
+    if args.cases:
+        wanted = set(args.cases.split(','))
+        files = [(case, path) for case, path in files if case.name in wanted]
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'preset': args.preset,
+            'repeat': args.repeat,
+        },
+        'startup': startup,
+        'cases': run_benchmarks(files, args.repeat, log),
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = find_regressions(baseline, report, args.threshold, args.min_delta)
+        for name, stage, before, after in regressions:
+            log(f"REGRESSION {name}/{stage}: {before * 1000:.1f} ms -> {after * 1000:.1f} ms")
+        if regressions:
+            return 1
+        log("No regressions")
+    return 1 if violations else 0
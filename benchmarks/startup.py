@@ -0,0 +1,85 @@
+"""
+Startup Benchmark
+Times importing each entry point in a fresh interpreter and checks it against a budget
+"""
+
+import sys
+import json
+import subprocess
+
+# Import time budget in seconds of each entry point, and the heavy packages it must not load.
+# The GUI and the launcher only need Tk until a conversion starts; converter workers need
+# NumPy and Pillow, but never MoviePy, which the converter no longer uses.
+IMPORT_BUDGETS = {
+    'main.__main__': (0.05, ('numpy', 'PIL', 'moviepy', 'imageio')),
+    'main.ui.main_window': (0.15, ('numpy', 'PIL', 'moviepy', 'imageio')),
+    'main.core.converter': (0.30, ('moviepy', 'imageio')),
+    'main.cli.command_line': (0.35, ('moviepy', 'imageio')),
+    'main.service.server': (0.35, ('moviepy', 'imageio')),
+}
+
+# Run in the child interpreter: import the module, then report the time taken and the packages loaded
+_MEASURE = """
+import sys, json, time
+start = time.perf_counter()
+__import__(sys.argv[1])
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'packages': sorted({name.split('.')[0] for name in sys.modules})}))
+"""
+
+
+def measure_import(module, repeat=5):
+    """
+    Time importing a module in fresh interpreters.
+
+    Interpreter startup itself (site-packages, .pth files) is not counted.
+
+    Args:
+        module (str): Dotted module name
+        repeat (int): Interpreters started; the fastest import is kept
+
+    Returns:
+        tuple: (seconds, packages) with the fastest import time and the top-level packages loaded
+    """
+    best = None
+    packages = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', _MEASURE, module])
+        result = json.loads(output)
+        if best is None or result['seconds'] < best:
+            best = result['seconds']
+        packages = result['packages']
+    return best, packages
+
+
+def run_startup_benchmarks(repeat=5, budgets=None, log=None):
+    """
+    Time every entry point and check it against its budget.
+
+    Args:
+        repeat (int): Interpreters started per entry point
+        budgets (dict, optional): Budgets as in IMPORT_BUDGETS
+        log (callable, optional): Called with a message per entry point
+
+    Returns:
+        tuple: (results, violations) where results maps each module to its import time,
+            budget and loaded heavy packages, and violations lists a message for every
+            budget exceeded or forbidden package loaded
+    """
+    results = {}
+    violations = []
+    for module, (budget, forbidden) in (budgets or IMPORT_BUDGETS).items():
+        seconds, packages = measure_import(module, repeat)
+        loaded = [package for package in forbidden if package in packages]
+        results[module] = {
+            'seconds': seconds,
+            'budget': budget,
+            'forbidden_loaded': loaded,
+        }
+        if seconds > budget:
+            violations.append(f"{module} took {seconds * 1000:.1f} ms to import, budget {budget * 1000:.0f} ms")
+        if loaded:
+            violations.append(f"{module} loaded {', '.join(loaded)}")
+        if log:
+            log(f"import {module}: {seconds * 1000:.1f} ms (budget {budget * 1000:.0f} ms)")
+    return results, violations
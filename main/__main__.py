@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
 """
 Main entry point for the WebP to MP4 converter application
+
+Without arguments the GUI is started; with arguments the headless
+command-line converter runs instead.
 """
 
 import sys
 import os
-import tkinter as tk
 
 # Add the parent directory to sys.path if running as a script
 if __name__ == "__main__" and __package__ is None:
@@ -13,29 +15,28 @@ if __name__ == "__main__" and __package__ is None:
     sys.path.insert(0, parent_dir)
     __package__ = "main"
 
-from main.ui.main_window import MainWindow, TKDND_AVAILABLE
-
-# Try to import tkinterdnd2, but don't fail if it's not available
-if TKDND_AVAILABLE:
-    from tkinterdnd2 import TkinterDnD
-
 
 def is_frozen():
     """Check if the application is running as a frozen executable"""
     return getattr(sys, 'frozen', False)
 
 
-def main():
+def run_gui():
     """
-    Main function to start the application
+    Start the graphical application
     """
+    # Imported here so the command-line mode never loads tkinter
+    import tkinter as tk
+    from main.ui.main_window import MainWindow, TKDND_AVAILABLE
+
     try:
         # Create the main window with TkinterDnD if available, otherwise standard tkinter
         if TKDND_AVAILABLE:
+            from tkinterdnd2 import TkinterDnD
             root = TkinterDnD.Tk()
         else:
             root = tk.Tk()
-        
+
         app = MainWindow(root)
         root.mainloop()
     except Exception as e:
@@ -43,9 +44,26 @@ def main():
         if not is_frozen():
             print(f"Error starting application: {e}")
         return 1
-    
+
     return 0
 
 
+def main(argv=None):
+    """
+    Main function to start the application
+
+    Args:
+        argv (list, optional): Command-line arguments. Defaults to sys.argv[1:].
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+
+    if argv:
+        from main.cli.command_line import main as run_cli
+        return run_cli(argv)
+
+    return run_gui()
+
+
 if __name__ == "__main__":
     sys.exit(main())
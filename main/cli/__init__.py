@@ -0,0 +1,3 @@
+"""
+Command-line interface for the WebP to MP4 converter
+"""
@@ -0,0 +1,495 @@
+"""
+Headless command-line mode for bulk conversion.
+
+Never imports tkinter, so it runs on machines without a display.
+"""
+
+import os
+import sys
+import glob
+import json
+import random
+import argparse
+import tempfile
+
+from main.core.batch import (
+    BatchConverter,
+    default_jobs,
+    OVERWRITE_ALWAYS,
+    OVERWRITE_POLICIES,
+)
+from main.core.cache import ConversionCache, DEFAULT_MAX_SIZE
+from main.core.colour import ColourStage, EVEN_MODES, EVEN_PAD, parse_colour
+from main.core.converter import PIPELINE_STREAM, PIPELINE_PNG
+from main.core.outputs import OUTPUT_KINDS
+from main.core.pipeline import DEFAULT_BUFFER_FRAMES
+from main.core.profiles import PROFILES, DEFAULT_PROFILE, STATIC_DURATION
+from main.core.resize import Resize, RESAMPLE_FILTERS, DEFAULT_RESAMPLE, parse_max_size
+from main.core.scheduling import SCHEDULES, SCHEDULE_INPUT
+from main.core.watcher import FolderWatcher, DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE_TIME, DEFAULT_STATE_FILE
+
+# Number of input files converted per profile by --calibrate
+DEFAULT_CALIBRATION_SAMPLE = 20
+
+# Exit codes
+EXIT_OK = 0
+EXIT_FAILURES = 1
+EXIT_USAGE = 2
+
+
+def parse_outputs(value):
+    """
+    Parse the --outputs option
+
+    Args:
+        value (str): Comma-separated output kinds
+
+    Returns:
+        list: Output kinds in the given order
+    """
+    kinds = [kind.strip() for kind in value.split(",") if kind.strip()]
+    unknown = [kind for kind in kinds if kind not in OUTPUT_KINDS]
+    if unknown or not kinds:
+        raise argparse.ArgumentTypeError(
+            f"expected a comma-separated list of {', '.join(OUTPUT_KINDS)}, got {value!r}")
+    return kinds
+
+
+def parse_background(value):
+    """
+    Parse the --background option
+
+    Args:
+        value (str): Colour name or hex code
+
+    Returns:
+        tuple: (r, g, b) colour
+    """
+    try:
+        return parse_colour(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a colour name or hex code such as #ffffff, got {value!r}")
+
+
+def parse_size(value):
+    """
+    Parse the --max-size option
+
+    Args:
+        value (str): 'WIDTHxHEIGHT' or a single number bounding both dimensions
+
+    Returns:
+        tuple: (width, height) of the box the frames must fit in
+    """
+    try:
+        return parse_max_size(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT or a single number such as 480, got {value!r}")
+
+
+def build_parser():
+    """
+    Build the argument parser
+
+    Returns:
+        argparse.ArgumentParser: Parser for the command-line options
+    """
+    parser = argparse.ArgumentParser(
+        prog="webp2mp4",
+        description="Convert WebP files to MP4. Run without arguments to start the GUI.",
+    )
+    parser.add_argument(
+        "inputs", nargs="+",
+        help="WebP files, glob patterns or directories (searched recursively)",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=default_jobs(),
+        help="number of parallel conversions (default: number of CPU cores)",
+    )
+    parser.add_argument(
+        "--fps", type=float, default=None,
+        help="frames per second of the output videos (default: detected per file)",
+    )
+    parser.add_argument(
+        "--still-duration", type=float, default=STATIC_DURATION,
+        help="length in seconds of videos made from static images (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-o", "--output-dir", default=None,
+        help="directory for the MP4 files (default: next to each input file)",
+    )
+    parser.add_argument(
+        "--overwrite", choices=OVERWRITE_POLICIES, default=OVERWRITE_ALWAYS,
+        help="what to do when an output file already exists (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--pipeline", choices=(PIPELINE_STREAM, PIPELINE_PNG), default=PIPELINE_STREAM,
+        help="conversion pipeline (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--schedule", choices=SCHEDULES, default=SCHEDULE_INPUT,
+        help="conversion order, by cost estimated from the file headers: input order, longest "
+             "first (shortest total time) or shortest first (results sooner) (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cost-log", default=None,
+        help="append the estimated cost and the actual time of every converted file to this "
+             "JSON-lines file, to calibrate the cost model",
+    )
+    parser.add_argument(
+        "--profile", choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+        help="encoding profile: " + "; ".join(f"{p.name}: {p.description}" for p in PROFILES.values())
+             + " (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--calibrate", action="store_true",
+        help="convert a sample of the inputs with every profile and report throughput and output size "
+             "as JSON; no output files are kept",
+    )
+    parser.add_argument(
+        "--sample", type=int, default=DEFAULT_CALIBRATION_SAMPLE,
+        help="number of input files converted per profile by --calibrate (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--segments", type=int, default=1,
+        help="encode long animations as up to this many segments in parallel and join them "
+             "losslessly (default: %(default)s, no splitting)",
+    )
+    parser.add_argument(
+        "--outputs", type=parse_outputs, default=None,
+        help="comma-separated files to create from each input in one decoding pass, from "
+             + ", ".join(OUTPUT_KINDS) + " (default: mp4 only)",
+    )
+    parser.add_argument(
+        "--background", type=parse_background, default="black",
+        help="colour transparent areas are flattened onto, as a name or hex code (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--even", choices=EVEN_MODES, default=EVEN_PAD,
+        help="make odd widths and heights even, as yuv420p requires, by padding with the background "
+             "colour or cropping the last row or column (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-size", type=parse_size, default=None,
+        help="downscale frames to fit in WIDTHxHEIGHT (or NxN for a single number), keeping the aspect ratio",
+    )
+    parser.add_argument(
+        "--scale", type=float, default=None,
+        help="downscale frames by this factor, between 0 and 1",
+    )
+    parser.add_argument(
+        "--resample", choices=sorted(RESAMPLE_FILTERS), default=DEFAULT_RESAMPLE,
+        help="resampling filter used by --max-size and --scale (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--buffer-frames", type=int, default=DEFAULT_BUFFER_FRAMES,
+        help="decoded frames a conversion may hold while waiting for the encoder; "
+             "bounds memory use regardless of animation length (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cache-dir", default=None,
+        help="reuse videos of inputs converted before with the same settings, cached in this directory",
+    )
+    parser.add_argument(
+        "--cache-size", type=float, default=DEFAULT_MAX_SIZE / (1024 * 1024),
+        help="size limit of the cache in MB (default: %(default)d)",
+    )
+    parser.add_argument(
+        "--journal", default=None,
+        help="record the state of every file in this journal; rerunning the same command after "
+             "an interruption skips the files already converted",
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="keep running and convert new or changed files in the given directories; "
+             "prints one JSON result per line",
+    )
+    parser.add_argument(
+        "--state-file", default=None,
+        help="state file of watch mode (default: %s in the first directory)" % DEFAULT_STATE_FILE,
+    )
+    parser.add_argument(
+        "--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+        help="seconds between directory scans in watch mode (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--settle-time", type=float, default=DEFAULT_SETTLE_TIME,
+        help="seconds a file must stay unchanged before it is converted in watch mode (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-q", "--quiet", action="store_true",
+        help="do not print per-file progress to stderr",
+    )
+    return parser
+
+
+def resize_option(args):
+    """
+    Downscaling requested on the command line
+
+    Args:
+        args (argparse.Namespace): Parsed options
+
+    Returns:
+        Resize: The setting, or None if neither --max-size nor --scale was given
+    """
+    if args.max_size is None and args.scale is None:
+        return None
+    return Resize(args.max_size, args.scale, args.resample)
+
+
+def collect_inputs(inputs):
+    """
+    Expand files, glob patterns and directories into a list of WebP files.
+
+    Args:
+        inputs (list): Paths, glob patterns or directories
+
+    Returns:
+        tuple: (files, missing) where files is a de-duplicated list of WebP paths in
+               the order found and missing lists the inputs that matched nothing
+    """
+    files = []
+    missing = []
+    seen = set()
+
+    def add(path):
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            files.append(path)
+
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = []
+            for root, dirs, names in os.walk(item):
+                dirs.sort()
+                matches.extend(os.path.join(root, n) for n in sorted(names) if n.lower().endswith('.webp'))
+        elif os.path.isfile(item):
+            matches = [item]
+        else:
+            matches = sorted(p for p in glob.glob(item, recursive=True) if os.path.isfile(p))
+
+        if not matches:
+            missing.append(item)
+        for path in matches:
+            add(path)
+
+    return files, missing
+
+
+def run_watch(parser, args, converter):
+    """
+    Watch the input directories until interrupted
+
+    Args:
+        parser (argparse.ArgumentParser): Parser, used to report usage errors
+        args (argparse.Namespace): Parsed arguments
+        converter (BatchConverter): Conversion settings
+
+    Returns:
+        int: Exit code
+    """
+    for item in args.inputs:
+        if not os.path.isdir(item):
+            parser.error(f"--watch needs directories, not {item}")
+
+    watcher = FolderWatcher(
+        args.inputs,
+        converter,
+        state_file=args.state_file,
+        poll_interval=args.poll_interval,
+        settle_time=args.settle_time,
+    )
+
+    def report(result):
+        print(json.dumps(result.to_dict()), flush=True)
+
+    if not args.quiet:
+        print(f"Watching {', '.join(watcher.directories)} (Ctrl+C to stop)", file=sys.stderr)
+    try:
+        watcher.run(result_callback=report)
+    except KeyboardInterrupt:
+        pass
+    if not args.quiet:
+        print(f"Stopped. Converted {watcher.converted} files, {watcher.failed} failed.", file=sys.stderr)
+    return EXIT_OK
+
+
+def run_calibration(args, files):
+    """
+    Convert a sample of the files with every encoding profile and compare the profiles
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+        files (list): Input files to sample from
+
+    Returns:
+        int: Exit code
+    """
+    if len(files) > args.sample:
+        # A fixed seed keeps repeated calibrations comparable
+        files = sorted(random.Random(0).sample(files, args.sample))
+
+    report = []
+    with tempfile.TemporaryDirectory(prefix="webp2mp4-calibrate-") as temp_dir:
+        for name, profile in PROFILES.items():
+            if not args.quiet:
+                print(f"Calibrating profile {name} on {len(files)} files...", file=sys.stderr)
+            output_dir = os.path.join(temp_dir, name)
+            os.makedirs(output_dir)
+            converter = BatchConverter(
+                jobs=args.jobs,
+                fps=args.fps,
+                output_dir=output_dir,
+                pipeline=args.pipeline,
+                still_duration=args.still_duration,
+                buffer_frames=args.buffer_frames,
+                profile=profile,
+                colour=ColourStage(args.background, args.even),
+                resize=resize_option(args),
+            )
+            batch = converter.run(files)
+            output_bytes = sum(os.path.getsize(r.output_file) for r in batch.succeeded)
+            report.append({
+                'profile': name,
+                'settings': profile.settings(),
+                'files': len(files),
+                'failed': len(batch.failed),
+                'elapsed': batch.elapsed,
+                'files_per_second': batch.files_per_second,
+                'frames_per_second': batch.frames_per_second,
+                'output_bytes': output_bytes,
+                'bytes_per_frame': output_bytes / batch.frame_count if batch.frame_count else 0.0,
+                'peak_rss': batch.peak_rss,
+            })
+
+    json.dump({'jobs': args.jobs, 'profiles': report}, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return EXIT_FAILURES if any(item['failed'] for item in report) else EXIT_OK
+
+
+def write_cost_log(path, batch, args):
+    """
+    Append the estimated cost and the conversion time of every converted file to a log
+
+    Args:
+        path (str): Path of the JSON-lines log
+        batch (BatchResult): Finished batch
+        args (argparse.Namespace): Options of the batch
+    """
+    with open(path, "a", encoding="utf-8") as f:
+        for result in batch.succeeded:
+            if result.cache_hit or result.estimated_cost is None:
+                continue
+            f.write(json.dumps({
+                'input_file': result.input_file,
+                'frame_count': result.frame_count,
+                'estimated_cost': result.estimated_cost,
+                'elapsed': result.elapsed,
+                'profile': args.profile,
+                'outputs': args.outputs,
+                'jobs': args.jobs,
+            }) + "\n")
+
+
+def main(argv=None):
+    """
+    Run the command-line converter
+
+    Args:
+        argv (list, optional): Command-line arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        int: Exit code; non-zero if any file failed
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.jobs <= 0:
+        parser.error("--jobs must be a positive number")
+    if args.fps is not None and args.fps <= 0:
+        parser.error("--fps must be a positive number")
+    if args.still_duration <= 0:
+        parser.error("--still-duration must be a positive number")
+    if args.buffer_frames <= 0:
+        parser.error("--buffer-frames must be a positive number")
+    if args.segments <= 0:
+        parser.error("--segments must be a positive number")
+    if args.scale is not None and not 0 < args.scale <= 1:
+        parser.error("--scale must be greater than 0 and at most 1")
+    if args.sample <= 0:
+        parser.error("--sample must be a positive number")
+    if args.calibrate and args.watch:
+        parser.error("--calibrate cannot be combined with --watch")
+    if args.journal and args.watch:
+        parser.error("--journal cannot be combined with --watch, which keeps its own state file")
+    if args.outputs and args.pipeline != PIPELINE_STREAM:
+        parser.error("--outputs requires the stream pipeline")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    cache = None
+    if args.cache_dir:
+        cache = ConversionCache(args.cache_dir, int(args.cache_size * 1024 * 1024))
+
+    converter = BatchConverter(
+        jobs=args.jobs,
+        fps=args.fps,
+        output_dir=args.output_dir,
+        pipeline=args.pipeline,
+        overwrite=args.overwrite,
+        still_duration=args.still_duration,
+        cache=cache,
+        buffer_frames=args.buffer_frames,
+        profile=args.profile,
+        segments=args.segments,
+        outputs=args.outputs,
+        journal_file=args.journal,
+        schedule=args.schedule,
+        colour=ColourStage(args.background, args.even),
+        resize=resize_option(args),
+    )
+
+    if args.watch:
+        return run_watch(parser, args, converter)
+
+    files, missing = collect_inputs(args.inputs)
+    for item in missing:
+        print(f"No WebP files found for {item}", file=sys.stderr)
+    if not files:
+        return EXIT_USAGE
+    if args.calibrate:
+        return run_calibration(args, files)
+
+    def report(result, done, total):
+        if args.quiet:
+            return
+        if result.skipped:
+            state = "skipped"
+        elif result.cache_hit:
+            state = "ok (cached)"
+        elif result.success:
+            state = "ok"
+        else:
+            state = f"failed: {result.error}"
+        print(f"[{done}/{total}] {result.input_file}: {state}", file=sys.stderr)
+
+    batch = converter.run(files, result_callback=report)
+    if args.cost_log:
+        write_cost_log(args.cost_log, batch, args)
+
+    summary = batch.summary()
+    summary['missing'] = missing
+    if cache is not None:
+        summary['cache'] = cache.stats()
+    json.dump(summary, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+    if batch.failed or missing:
+        return EXIT_FAILURES
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,531 @@
+"""
+Batch Conversion Module
+Runs WebP to MP4 conversions across a pool of worker processes
+"""
+
+import os
+import time
+import signal
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from main.core.colour import get_colour_stage
+from main.core.converter import WebPConverter, PIPELINE_STREAM
+from main.core.journal import BatchJournal
+from main.core.pipeline import DEFAULT_BUFFER_FRAMES
+from main.core.profiles import get_profile, STATIC_DURATION
+from main.core.resize import get_resize
+from main.core.scheduling import SCHEDULES, SCHEDULE_INPUT, estimate_cost, schedule_order, fit_cost_scale
+
+# Policies for output files that already exist
+OVERWRITE_ALWAYS = 'overwrite'  # Convert again and replace the file
+OVERWRITE_SKIP = 'skip'         # Keep the file and skip the conversion
+OVERWRITE_ERROR = 'error'       # Keep the file and report the input as failed
+OVERWRITE_POLICIES = (OVERWRITE_ALWAYS, OVERWRITE_SKIP, OVERWRITE_ERROR)
+
+# How often (seconds) the batch loop checks for cancellation while jobs are running
+POLL_INTERVAL = 0.2
+
+
+def default_jobs():
+    """Number of worker processes used when none is given"""
+    return os.cpu_count() or 1
+
+
+class FileResult:
+    """
+    Outcome of converting one file in a batch
+    """
+
+    def __init__(self, input_file, output_file, success, error=None, frame_count=0, elapsed=0.0, skipped=False,
+                 dropped_frames=0, cache_hit=False, peak_rss=None, outputs=None, resumed=False,
+                 estimated_cost=None, encoded_frames=0):
+        """
+        Initialize the result
+
+        Args:
+            input_file (str): Path to the input WebP file
+            output_file (str): Path to the MP4 file (expected path if the conversion failed)
+            success (bool): Whether the conversion succeeded
+            error (str, optional): Error message if the conversion failed
+            frame_count (int): Number of frames converted
+            elapsed (float): Conversion time in seconds
+            skipped (bool): Whether the file was skipped because its output already existed
+            dropped_frames (int): Number of duplicate frames merged before encoding
+            cache_hit (bool): Whether the video was taken from the conversion cache
+            peak_rss (int, optional): Peak resident memory in bytes of the worker and its ffmpeg process
+            outputs (dict, optional): Path of every output by kind, if several outputs were created
+            resumed (bool): Whether the file was skipped because the batch journal records it as converted
+            estimated_cost (float, optional): Cost of the conversion estimated from the file header
+                before it was scheduled; compare with elapsed to calibrate the cost model
+            encoded_frames (int): Number of frames actually encoded; merged duplicates count once
+        """
+        self.input_file = input_file
+        self.output_file = output_file
+        self.success = success
+        self.error = error
+        self.frame_count = frame_count
+        self.elapsed = elapsed
+        self.skipped = skipped
+        self.dropped_frames = dropped_frames
+        self.cache_hit = cache_hit
+        self.peak_rss = peak_rss
+        self.outputs = outputs
+        self.resumed = resumed
+        self.estimated_cost = estimated_cost
+        self.encoded_frames = encoded_frames
+
+    def to_dict(self):
+        """Return the result as a plain dictionary"""
+        return dict(self.__dict__)
+
+
+class BatchResult:
+    """
+    Outcome of a whole batch, with aggregate throughput
+    """
+
+    def __init__(self, results, elapsed, cancelled=False):
+        """
+        Initialize the batch result
+
+        Args:
+            results (list): FileResult for every file in the batch, in input order
+            elapsed (float): Wall-clock time of the batch in seconds
+            cancelled (bool): Whether the batch was cancelled before finishing
+        """
+        self.results = results
+        self.elapsed = elapsed
+        self.cancelled = cancelled
+
+    @property
+    def succeeded(self):
+        """Results of the files that were converted"""
+        return [r for r in self.results if r.success and not r.skipped]
+
+    @property
+    def failed(self):
+        """Results of the files that failed or were cancelled"""
+        return [r for r in self.results if not r.success]
+
+    @property
+    def skipped(self):
+        """Results of the files skipped because their output already existed"""
+        return [r for r in self.results if r.skipped]
+
+    @property
+    def resumed(self):
+        """Results of the files skipped because the journal records them as converted"""
+        return [r for r in self.results if r.resumed]
+
+    @property
+    def frame_count(self):
+        """Total number of frames converted"""
+        return sum(r.frame_count for r in self.succeeded)
+
+    @property
+    def dropped_frames(self):
+        """Total number of duplicate frames merged before encoding"""
+        return sum(r.dropped_frames for r in self.succeeded)
+
+    @property
+    def encoded_frames(self):
+        """Total number of frames actually encoded"""
+        return sum(r.encoded_frames for r in self.succeeded)
+
+    @property
+    def cache_hits(self):
+        """Results of the files taken from the conversion cache"""
+        return [r for r in self.results if r.cache_hit]
+
+    @property
+    def peak_rss(self):
+        """Largest peak resident memory reported by a conversion, in bytes"""
+        values = [r.peak_rss for r in self.results if r.peak_rss is not None]
+        return max(values) if values else None
+
+    @property
+    def cost_calibration(self):
+        """Seconds per unit of estimated cost fitted to the files converted, see fit_cost_scale()"""
+        return fit_cost_scale([(r.estimated_cost, r.elapsed) for r in self.succeeded
+                               if r.estimated_cost is not None and not r.cache_hit])
+
+    @property
+    def files_per_second(self):
+        """Converted files per second of wall-clock time"""
+        return len(self.succeeded) / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def frames_per_second(self):
+        """Converted frames per second of wall-clock time"""
+        return self.frame_count / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        """
+        Summarize the batch.
+
+        Returns:
+            dict: Counts, throughput and per-file results
+        """
+        return {
+            'total': len(self.results),
+            'succeeded': len(self.succeeded),
+            'failed': len(self.failed),
+            'skipped': len(self.skipped),
+            'resumed': len(self.resumed),
+            'cancelled': self.cancelled,
+            'elapsed': self.elapsed,
+            'frames': self.frame_count,
+            'dropped_frames': self.dropped_frames,
+            'encoded_frames': self.encoded_frames,
+            'cache_hits': len(self.cache_hits),
+            'peak_rss': self.peak_rss,
+            'files_per_second': self.files_per_second,
+            'frames_per_second': self.frames_per_second,
+            'cost_calibration': self.cost_calibration,
+            'results': [r.to_dict() for r in self.results],
+        }
+
+
+def init_worker():
+    """
+    Set up a worker process.
+
+    Ctrl+C is left to the parent process, which stops the pool cleanly.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def convert_job(input_file, output_file, fps, pipeline, still_duration, cache, buffer_frames=DEFAULT_BUFFER_FRAMES,
+                profile=None, segments=1, outputs=None, colour=None, resize=None, status_callback=None,
+                progress_callback=None):
+    """
+    Convert a single file, capturing any error in the result.
+
+    Runs inside a worker process, so it is a module-level function and only
+    returns picklable data. In a worker, progress_callback is the put method of a
+    managed queue read by the parent process.
+    """
+    start = time.time()
+    try:
+        result = WebPConverter.convert_file(input_file, output_file, fps, status_callback, pipeline,
+                                            still_duration, cache, progress_callback, buffer_frames, profile,
+                                            segments, outputs, colour, resize)
+        return FileResult(input_file, result.output_file, True,
+                          frame_count=result.frame_count, elapsed=result.elapsed,
+                          dropped_frames=result.dropped_frames, encoded_frames=result.encoded_frames,
+                          cache_hit=result.cache_hit,
+                          peak_rss=result.peak_rss, outputs=result.outputs)
+    except Exception as e:
+        return FileResult(input_file, output_file, False, error=str(e), elapsed=time.time() - start)
+
+
+class BatchConverter:
+    """
+    Converts many WebP files, running several conversions in parallel.
+
+    Each file is converted by WebPConverter in its own worker process. With a single
+    job the files are converted in the calling process instead, which also allows
+    status messages. Progress events are reported in both cases.
+    """
+
+    def __init__(self, jobs=None, fps=None, output_dir=None, pipeline=PIPELINE_STREAM,
+                 overwrite=OVERWRITE_ALWAYS, still_duration=STATIC_DURATION, cache=None,
+                 buffer_frames=DEFAULT_BUFFER_FRAMES, profile=None, segments=1, outputs=None, journal_file=None,
+                 schedule=SCHEDULE_INPUT, colour=None, resize=None):
+        """
+        Initialize the batch converter
+
+        Args:
+            jobs (int, optional): Number of worker processes. Defaults to the CPU count.
+            fps (float, optional): Frames per second for all videos. If None, detected per file.
+            output_dir (str, optional): Directory for the MP4 files. If None, next to each input.
+            pipeline (str, optional): Conversion pipeline passed to WebPConverter
+            overwrite (str, optional): What to do when an output file already exists,
+                one of OVERWRITE_POLICIES
+            still_duration (float, optional): Length in seconds of videos made from static images
+            cache (ConversionCache, optional): Cache shared by all workers to skip repeat conversions
+            buffer_frames (int, optional): Maximum number of decoded frames each conversion keeps
+                waiting for its encoder
+            profile (str or EncodingProfile, optional): Encoding profile for all videos
+            segments (int, optional): Encode long animations in up to this many parallel segments.
+                The segments run in extra processes next to the pool, so this pays off for
+                batches of a few long files rather than many short ones.
+            outputs (list, optional): Output kinds to create from each file in one decoding
+                pass, named after its MP4 path; see WebPConverter.convert()
+            journal_file (str, optional): Path of a BatchJournal recording the state of every file.
+                If it exists from an interrupted run with the same settings, files it records
+                as converted are skipped and only the rest are converted.
+            schedule (str, optional): Order in which the files are converted, one of SCHEDULES:
+                'input' keeps the given order, 'longest' starts the most expensive files first
+                to shorten the whole batch, 'shortest' the cheapest first to lower the mean time
+                until a file is done. Costs are estimated from the file headers.
+            colour (ColourStage, optional): Background colour and even size handling for all videos
+            resize (Resize, optional): Downscaling of the frames of all videos
+
+        Raises:
+            ValueError: If the overwrite policy or the scheduling policy is unknown
+        """
+        if overwrite not in OVERWRITE_POLICIES:
+            raise ValueError(f"Unknown overwrite policy: {overwrite}")
+        if schedule not in SCHEDULES:
+            raise ValueError(f"Unknown scheduling policy: {schedule}")
+        self.jobs = max(1, jobs or default_jobs())
+        self.fps = fps
+        self.output_dir = output_dir
+        self.pipeline = pipeline
+        self.overwrite = overwrite
+        self.still_duration = still_duration
+        self.cache = cache
+        self.buffer_frames = buffer_frames
+        self.profile = profile
+        self.segments = segments
+        self.outputs = outputs
+        self.journal_file = journal_file
+        self.schedule = schedule
+        self.colour = colour
+        self.resize = resize
+        self._cancel_event = threading.Event()
+
+    def output_path(self, input_file):
+        """
+        Determine the output path for an input file
+
+        Args:
+            input_file (str): Path to the input WebP file
+
+        Returns:
+            str: Path of the MP4 file to create
+        """
+        name = os.path.splitext(os.path.basename(input_file))[0] + ".mp4"
+        if self.output_dir:
+            # Use specified output directory
+            return os.path.join(self.output_dir, name)
+        # Use same directory as input file
+        return os.path.join(os.path.dirname(input_file), name)
+
+    def job_args(self, input_file):
+        """
+        Arguments of the worker job converting one file with this batch's settings
+
+        Args:
+            input_file (str): Path to the input WebP file
+
+        Returns:
+            tuple: Positional arguments for the worker job
+        """
+        return (input_file, self.output_path(input_file), self.fps, self.pipeline,
+                self.still_duration, self.cache, self.buffer_frames, self.profile, self.segments,
+                self.outputs, self.colour, self.resize)
+
+    def settings(self):
+        """
+        Conversion settings that affect the outputs, as recorded in the batch journal
+
+        Returns:
+            dict: JSON-serializable settings
+        """
+        return {
+            'fps': self.fps,
+            'output_dir': self.output_dir,
+            'pipeline': self.pipeline,
+            'still_duration': self.still_duration,
+            'profile': get_profile(self.profile).settings(),
+            'segments': self.segments,
+            'outputs': self.outputs,
+            'colour': get_colour_stage(self.colour).settings(),
+            'resize': get_resize(self.resize).settings() if self.resize is not None else None,
+        }
+
+    def cancel(self):
+        """Cancel the running batch; files not yet started are skipped"""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        """Whether cancel() has been called"""
+        return self._cancel_event.is_set()
+
+    def run(self, files, result_callback=None, status_callback=None, progress_callback=None):
+        """
+        Convert all files.
+
+        Args:
+            files (list): Paths of the WebP files to convert
+            result_callback (callable, optional): Called as result_callback(file_result, done, total)
+                each time a file finishes
+            status_callback (callable, optional): Callback for status updates; only used with a single job
+            progress_callback (callable, optional): Called in this process with the rate-limited
+                ProgressEvents of every file being converted
+
+        Returns:
+            BatchResult: Per-file results and aggregate throughput
+        """
+        self._cancel_event.clear()
+        start = time.time()
+        journal = BatchJournal(self.journal_file, self.settings()) if self.journal_file else None
+        try:
+            resumed = self._resume(journal, files)
+            resize = get_resize(self.resize)
+            costs = [None if f in resumed else estimate_cost(f, self.profile, self.outputs, resize, self.still_duration)
+                     for f in files]
+            order = schedule_order([cost or 0.0 for cost in costs], self.schedule)
+            if self.jobs == 1:
+                results = self._run_inline(files, order, costs, result_callback, status_callback, progress_callback,
+                                           journal, resumed)
+            else:
+                results = self._run_pool(files, order, costs, result_callback, progress_callback, journal, resumed)
+        finally:
+            if journal is not None:
+                journal.close()
+        return BatchResult(results, time.time() - start, self.cancelled)
+
+    def _resume(self, journal, files):
+        """
+        Find the files the journal records as converted and mark the others pending.
+
+        Returns:
+            dict: input file -> FileResult for every file that is skipped
+        """
+        if journal is None:
+            return {}
+        resumed = {}
+        for input_file in files:
+            output_file = self.output_path(input_file)
+            if journal.completed(input_file, output_file):
+                resumed[input_file] = FileResult(input_file, output_file, True, skipped=True, resumed=True)
+        journal.mark_pending([f for f in files if f not in resumed])
+        return resumed
+
+    @staticmethod
+    def _record(journal, result):
+        """Record the outcome of a file in the journal"""
+        if journal is None or result.resumed:
+            return
+        if result.success:
+            journal.mark_done(result)
+        else:
+            journal.mark_failed(result)
+
+    def _cancelled_result(self, input_file):
+        """Result for a file skipped because the batch was cancelled"""
+        return FileResult(input_file, self.output_path(input_file), False, error="Cancelled")
+
+    def existing_output_result(self, input_file):
+        """
+        Apply the overwrite policy to an input file.
+
+        Returns:
+            FileResult: Result for the file if its existing output means it is not converted, otherwise None
+        """
+        output_file = self.output_path(input_file)
+        if self.overwrite == OVERWRITE_ALWAYS or not os.path.exists(output_file):
+            return None
+        if self.overwrite == OVERWRITE_SKIP:
+            return FileResult(input_file, output_file, True, skipped=True)
+        return FileResult(input_file, output_file, False, error="Output file already exists")
+
+    def _run_inline(self, files, order, costs, result_callback, status_callback, progress_callback, journal=None,
+                    resumed=None):
+        """Convert the files one after another in this process, in the scheduled order"""
+        results = [None] * len(files)
+        total = len(files)
+        done = 0
+        for index in order:
+            input_file = files[index]
+            result = (resumed or {}).get(input_file) or self.existing_output_result(input_file)
+            if result is None and self.cancelled:
+                result = self._cancelled_result(input_file)
+            elif result is None:
+                if journal is not None:
+                    journal.mark_running(input_file)
+                result = convert_job(*self.job_args(input_file), status_callback=status_callback,
+                                     progress_callback=progress_callback)
+                self._record(journal, result)
+            else:
+                self._record(journal, result)
+            result.estimated_cost = costs[index]
+            results[index] = result
+            done += 1
+            if result_callback:
+                result_callback(result, done, total)
+        return results
+
+    def _run_pool(self, files, order, costs, result_callback, progress_callback, journal=None, resumed=None):
+        """Convert the files in a pool of worker processes, submitted in the scheduled order"""
+        results = [None] * len(files)
+        total = len(files)
+        done = 0
+
+        # Workers send their progress events through a managed queue drained by the loop below
+        manager = multiprocessing.Manager() if progress_callback else None
+        events = manager.Queue() if manager else None
+        worker_progress = events.put if events else None
+
+        def drain():
+            while events is not None:
+                try:
+                    progress_callback(events.get_nowait())
+                except queue.Empty:
+                    return
+
+        with ProcessPoolExecutor(max_workers=self.jobs, initializer=init_worker) as executor:
+            futures = {}
+            for index in order:
+                input_file = files[index]
+                result = (resumed or {}).get(input_file) or self.existing_output_result(input_file)
+                if result is not None:
+                    self._record(journal, result)
+                    result.estimated_cost = costs[index]
+                    results[index] = result
+                    done += 1
+                    if result_callback:
+                        result_callback(result, done, total)
+                    continue
+                future = executor.submit(convert_job, *self.job_args(input_file),
+                                         progress_callback=worker_progress)
+                futures[future] = index
+
+            # The pool starts jobs in submission order, so the journal marks them running in that order
+            submitted = list(futures)
+            started = 0
+            pending = set(futures)
+            while pending:
+                if self.cancelled:
+                    # Running jobs finish; queued ones are dropped
+                    for future in pending:
+                        future.cancel()
+
+                finished, pending = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                drain()
+                while journal is not None and started < len(submitted):
+                    future = submitted[started]
+                    if not future.cancelled():
+                        # Cancelled jobs never run; the next one may have started anyway
+                        if not (future.running() or future.done()):
+                            break
+                        journal.mark_running(files[futures[future]])
+                    started += 1
+                for future in finished:
+                    index = futures[future]
+                    if future.cancelled():
+                        result = self._cancelled_result(files[index])
+                    else:
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            # The worker process itself failed
+                            result = FileResult(files[index], self.output_path(files[index]), False, error=str(e))
+                        self._record(journal, result)
+                    result.estimated_cost = costs[index]
+                    results[index] = result
+                    done += 1
+                    if result_callback:
+                        result_callback(result, done, total)
+
+        if manager is not None:
+            drain()
+            manager.shutdown()
+        return results
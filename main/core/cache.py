@@ -0,0 +1,249 @@
+"""
+Conversion Cache Module
+Content-addressed on-disk cache of converted videos
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+
+# Bumped whenever a change to the converter changes its output for the same parameters
+CACHE_VERSION = 1
+
+# Default size limit of the cache in bytes
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+
+# Name of the index file inside the cache directory
+INDEX_FILE = 'index.json'
+
+# Lock files older than this (seconds) are assumed to be left over from a crashed process
+LOCK_STALE_AFTER = 30.0
+
+# Read size used when hashing input files
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    """
+    Hash the content of a file.
+
+    Args:
+        path (str): Path to the file
+
+    Returns:
+        str: SHA-256 hex digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _link_or_copy(source, destination):
+    """Hard-link source to destination, copying if linking is not possible"""
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        # Different file systems or no hard link support
+        shutil.copy2(source, destination)
+
+
+class _DirectoryLock:
+    """
+    Inter-process lock based on exclusively creating a lock file.
+
+    Works on every platform and file system, so worker processes of a batch
+    can share one cache directory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > LOCK_STALE_AFTER:
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    # The lock was released in the meantime
+                    continue
+                time.sleep(0.01)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        return False
+
+
+class ConversionCache:
+    """
+    Cache of converted videos keyed by input content and conversion parameters.
+
+    An index file records every entry with its size and last use, so lookups never
+    scan the directory. When the total size exceeds the limit, the least recently
+    used entries are evicted. Hit and miss counts are kept in the index as well.
+    """
+
+    def __init__(self, cache_dir, max_size=DEFAULT_MAX_SIZE):
+        """
+        Initialize the cache
+
+        Args:
+            cache_dir (str): Directory holding the cached videos and the index
+            max_size (int): Size limit of the cached videos in bytes
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def _index_path(self):
+        return os.path.join(self.cache_dir, INDEX_FILE)
+
+    def _lock(self):
+        return _DirectoryLock(os.path.join(self.cache_dir, INDEX_FILE + '.lock'))
+
+    def _load_index(self):
+        """Read the index; a missing or unreadable index is treated as empty"""
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') == CACHE_VERSION:
+                return index
+        except (OSError, ValueError):
+            pass
+        return {'version': CACHE_VERSION, 'hits': 0, 'misses': 0, 'entries': {}}
+
+    def _save_index(self, index):
+        """Write the index atomically"""
+        temp_path = self._index_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(temp_path, self._index_path)
+
+    @staticmethod
+    def key(input_file, params):
+        """
+        Compute the cache key of a conversion.
+
+        Args:
+            input_file (str): Path to the input WebP file
+            params (dict): Every parameter that affects the output (fps, codec, size, ...)
+
+        Returns:
+            str: Hex digest identifying the input content and the parameters
+        """
+        digest = hashlib.sha256(file_digest(input_file).encode('ascii'))
+        digest.update(json.dumps([CACHE_VERSION, params], sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def fetch(self, key, output_file):
+        """
+        Place the cached video for a key at output_file.
+
+        Args:
+            key (str): Cache key from key()
+            output_file (str): Where the video should be created
+
+        Returns:
+            dict: Metadata stored with the entry on a hit, None on a miss
+        """
+        with self._lock():
+            index = self._load_index()
+            entry = index['entries'].get(key)
+            cached_file = os.path.join(self.cache_dir, entry['file']) if entry else None
+
+            if entry and os.path.exists(cached_file):
+                _link_or_copy(cached_file, output_file)
+                entry['last_used'] = time.time()
+                index['hits'] += 1
+                self._save_index(index)
+                return entry.get('metadata', {})
+
+            # Drop entries whose file was removed behind our back
+            index['entries'].pop(key, None)
+            index['misses'] += 1
+            self._save_index(index)
+            return None
+
+    def store(self, key, output_file, metadata=None):
+        """
+        Add a converted video to the cache, evicting old entries if needed.
+
+        Args:
+            key (str): Cache key from key()
+            output_file (str): The converted video
+            metadata (dict, optional): JSON-serializable data returned by fetch() on a hit
+        """
+        name = key + os.path.splitext(output_file)[1]
+        cached_file = os.path.join(self.cache_dir, name)
+
+        with self._lock():
+            _link_or_copy(output_file, cached_file)
+            index = self._load_index()
+            index['entries'][key] = {
+                'file': name,
+                'size': os.path.getsize(cached_file),
+                'last_used': time.time(),
+                'metadata': metadata or {},
+            }
+            self._evict(index)
+            self._save_index(index)
+
+    def _evict(self, index):
+        """Remove least recently used entries until the cache fits its size limit"""
+        entries = index['entries']
+        total = sum(e['size'] for e in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]['last_used']):
+            if total <= self.max_size:
+                break
+            entry = entries.pop(key)
+            total -= entry['size']
+            try:
+                os.remove(os.path.join(self.cache_dir, entry['file']))
+            except OSError:
+                pass
+
+    def stats(self):
+        """
+        Get cache statistics.
+
+        Returns:
+            dict: Hit and miss counts, hit rate, number of entries and total size in bytes
+        """
+        with self._lock():
+            index = self._load_index()
+        hits, misses = index['hits'], index['misses']
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'entries': len(index['entries']),
+            'size': sum(e['size'] for e in index['entries'].values()),
+            'max_size': self.max_size,
+        }
+
+    def clear(self):
+        """Remove every cached video and reset the statistics"""
+        with self._lock():
+            index = self._load_index()
+            for entry in index['entries'].values():
+                try:
+                    os.remove(os.path.join(self.cache_dir, entry['file']))
+                except OSError:
+                    pass
+            self._save_index({'version': CACHE_VERSION, 'hits': 0, 'misses': 0, 'entries': {}})
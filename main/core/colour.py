@@ -0,0 +1,133 @@
+"""
+Colour Stage Module
+Turns composited RGBA frames into the packed RGB frames the encoder reads
+"""
+
+from collections import namedtuple
+import numpy as np
+from PIL import ImageColor
+
+from main.core.compositor import _div255
+
+# Colour transparent areas are flattened onto; black keeps the colour channels as composited
+DEFAULT_BACKGROUND = (0, 0, 0)
+
+# How odd canvas sizes are made even, as yuv420p requires
+EVEN_PAD = 'pad'    # Add a row or column of the background colour
+EVEN_CROP = 'crop'  # Drop the last row or column
+EVEN_MODES = (EVEN_PAD, EVEN_CROP)
+
+
+def parse_colour(value):
+    """
+    Parse a background colour.
+
+    Args:
+        value (str or tuple): A colour name ('white'), hex code ('#ffcc00') or (r, g, b) tuple
+
+    Returns:
+        tuple: (r, g, b) with components from 0 to 255
+
+    Raises:
+        ValueError: If the colour cannot be parsed
+    """
+    if isinstance(value, str):
+        return ImageColor.getrgb(value)[:3]
+    rgb = tuple(int(component) for component in value)
+    if len(rgb) != 3 or not all(0 <= component <= 255 for component in rgb):
+        raise ValueError(f"Invalid colour: {value}")
+    return rgb
+
+
+class ColourStage(namedtuple('ColourStage', ['background', 'even'])):
+    """
+    Prepares composited frames for the encoder, between decoding and encoding
+
+    Fields:
+        background  -- (r, g, b) colour transparent pixels are flattened onto
+        even        -- how odd widths and heights are made even, one of EVEN_MODES
+
+    Frames come from the decoder as RGBA with their colour already multiplied by
+    alpha, i.e. flattened onto black. The stage blends in the background over the
+    whole frame with a few NumPy operations, pads or crops it to even dimensions
+    and packs it into a new contiguous rgb24 array, the raw format ffmpeg reads,
+    so every frame is converted exactly once and the encoder can use yuv420p.
+    """
+    __slots__ = ()
+
+    def output_size(self, size):
+        """
+        Size of the frames produced for a canvas.
+
+        Args:
+            size (tuple): (width, height) of the canvas
+
+        Returns:
+            tuple: Even (width, height); a dimension of 1 is always padded
+        """
+        return tuple(
+            length + length % 2 if self.even == EVEN_PAD or length == 1 else length - length % 2
+            for length in size
+        )
+
+    def apply(self, pixels):
+        """
+        Flatten, resize to even dimensions and pack one frame.
+
+        Args:
+            pixels (numpy.ndarray): Premultiplied RGBA pixels, shape (height, width, 4), uint8
+
+        Returns:
+            numpy.ndarray: New contiguous RGB pixels of the output size, uint8
+        """
+        height, width = pixels.shape[:2]
+        out_width, out_height = self.output_size((width, height))
+        rows, columns = min(height, out_height), min(width, out_width)
+        source = pixels[:rows, :columns]
+        out = np.empty((out_height, out_width, 3), dtype=np.uint8)
+        target = out[:rows, :columns]
+
+        if self.background == DEFAULT_BACKGROUND:
+            np.copyto(target, source[..., :3])
+        else:
+            # colour + background * (255 - alpha) / 255; premultiplied colour never exceeds alpha
+            work = np.subtract(255, source[..., 3:4], dtype=np.uint16)
+            work = work * np.array(self.background, dtype=np.uint16)
+            _div255(work)
+            work += source[..., :3]
+            np.copyto(target, work, casting='unsafe')
+
+        if out_height > rows:
+            out[rows:] = self.background
+        if out_width > columns:
+            out[:rows, columns:] = self.background
+        return out
+
+    def __call__(self, frame):
+        """Apply the stage to the pixels of a DecodedFrame; used as FrameQueue's prepare hook"""
+        return frame._replace(pixels=self.apply(frame.pixels))
+
+    def settings(self):
+        """The fields as JSON-serializable values, for cache keys and journals"""
+        return {'background': list(self.background), 'even': self.even}
+
+
+def get_colour_stage(colour=None):
+    """
+    Look up the colour stage to use.
+
+    Args:
+        colour (ColourStage, optional): Custom stage, returned as is. Defaults to flattening
+            onto black and padding odd sizes.
+
+    Returns:
+        ColourStage: The stage
+
+    Raises:
+        ValueError: If the even mode is unknown
+    """
+    if colour is None:
+        return ColourStage(DEFAULT_BACKGROUND, EVEN_PAD)
+    if colour.even not in EVEN_MODES:
+        raise ValueError(f"Unknown even size mode: {colour.even}")
+    return colour._replace(background=parse_colour(colour.background))
@@ -0,0 +1,80 @@
+"""
+Frame Compositor Module
+Composites animation frames onto a reusable NumPy canvas
+"""
+
+import numpy as np
+
+
+def _div255(values):
+    """
+    Divide by 255 with rounding, in place.
+
+    Uses the same integer arithmetic as Pillow's paste(), so results match it exactly.
+    Values must be below 65281 to fit the uint16 intermediate.
+    """
+    values += 128
+    values += values >> 8
+    values >>= 8
+    return values
+
+
+class FrameCompositor:
+    """
+    Keeps the current frame of an animation on a single preallocated RGBA canvas.
+
+    libwebp composites every frame onto the full canvas itself, so a frame differs
+    from the previous one only inside the box it updates (and the box of a disposed
+    previous frame). Only that box is converted, compared and copied, and the
+    scratch buffer is reused across frames, so updating costs O(dirty region) per
+    frame instead of allocating and converting full-canvas images.
+
+    The colour channels of the canvas are kept flattened onto black (colour
+    multiplied by coverage), which is what the encoder receives once the alpha
+    channel is dropped. The alpha channel holds the coverage of each pixel.
+    """
+
+    def __init__(self, size):
+        """
+        Initialize the compositor
+
+        Args:
+            size (tuple): (width, height) of the canvas
+        """
+        width, height = size
+        self.size = size
+        self.canvas = np.zeros((height, width, 4), dtype=np.uint8)
+        self._work = np.empty((height, width, 4), dtype=np.uint16)
+
+    def reset(self):
+        """Clear the canvas to transparent black"""
+        self.canvas[...] = 0
+
+    def composite(self, pixels, region=None):
+        """
+        Replace a box of the canvas with composited pixels.
+
+        Args:
+            pixels (numpy.ndarray): RGBA pixels of the box with straight alpha, shape (h, w, 4), uint8
+            region (tuple, optional): (x0, y0, x1, y1) box the pixels cover. Defaults to the whole canvas.
+
+        Returns:
+            bool: True if the canvas changed
+        """
+        if region is None:
+            region = (0, 0) + tuple(self.size)
+        x0, y0 = region[:2]
+        height, width = pixels.shape[:2]
+        target = self.canvas[y0:y0 + height, x0:x0 + width]
+        work = self._work[:height, :width]
+        alpha = pixels[..., 3:4]
+
+        # Colour: src * a / 255; coverage: a
+        np.multiply(pixels[..., :3], alpha, out=work[..., :3], dtype=np.uint16)
+        _div255(work[..., :3])
+        work[..., 3:4] = alpha
+
+        if np.array_equal(work, target):
+            return False
+        np.copyto(target, work, casting='unsafe')
+        return True
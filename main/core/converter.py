@@ -3,12 +3,135 @@ WebP to MP4 Converter Core Module
 Handles the actual conversion logic from WebP to MP4
 """
 
+import io
 import os
 import sys
+import time
 import shutil
+import logging
 import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from PIL import Image
-from moviepy.video.io.ImageSequenceClip import ImageSequenceClip
+
+from main.core.colour import get_colour_stage
+from main.core.decoder import WebPDecoder, DEFAULT_FPS, fps_from_durations
+from main.core.encoder import FFmpegEncoder, DEFAULT_CODEC
+from main.core.pipeline import FrameQueue, FrameFanOut, DEFAULT_BUFFER_FRAMES
+from main.core.outputs import output_targets, create_output
+from main.core.probe import probe
+from main.core.profiles import get_profile, STATIC_DURATION
+from main.core.resize import get_resize
+from main.core.progress import ProgressReporter, STAGE_PROBE, STAGE_DECODE, STAGE_ENCODE
+from main.core.segments import plan_segments, encode_segment, concat_segments, segment_dir, remove_segment_dir
+from main.utils.resources import peak_rss
+
+# Conversion pipelines
+PIPELINE_STREAM = 'stream'  # Pipe raw frames straight into ffmpeg
+PIPELINE_PNG = 'png'        # Extract PNG frames to disk, then encode them
+
+logger = logging.getLogger(__name__)
+
+
+def partial_path(path):
+    """
+    Temporary path an output is written to before it is renamed to its final path.
+    
+    The file keeps its name, so ffmpeg picks the same container and status
+    messages show the real name, but lives in a hidden directory next to the
+    output. The path is the same on every run, so leftovers of an interrupted
+    conversion are cleared by the next one.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, f'.{name}.partial', name)
+
+
+def _decoding_stopped(basename, frame_count, error, status_callback):
+    """Report a file whose decoding failed part-way; the frames decoded before the error are kept"""
+    logger.warning("Decoding %s stopped after %d frames", basename, frame_count, exc_info=error)
+    if status_callback:
+        status_callback(f"Decoding {basename} stopped after {frame_count} frames: {error}")
+
+
+def _forced_duration(fps):
+    """Display time in milliseconds of every frame at a frame rate given by the user, or None"""
+    return 1000.0 / fps if fps else None
+
+
+def _display_name(source, default):
+    """File name of a path for status messages, or default for data in memory and streams"""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.basename(source)
+    return default
+
+
+def _prepare_partial(path):
+    """Create an empty partial directory for an output and return the partial path"""
+    temp_path = partial_path(path)
+    shutil.rmtree(os.path.dirname(temp_path), ignore_errors=True)
+    os.makedirs(os.path.dirname(temp_path))
+    return temp_path
+
+
+def _commit_partial(temp_path, path):
+    """Move a complete output to its final path, replacing any existing file"""
+    if os.path.exists(path) and os.path.samefile(temp_path, path):
+        # Both are hard links to the same cached video; rename() would leave temp_path in place
+        os.remove(temp_path)
+    else:
+        # Replace rather than overwrite an existing file, which may be hard-linked from the cache
+        os.replace(temp_path, path)
+    os.rmdir(os.path.dirname(temp_path))
+
+
+def _discard_partial(temp_path):
+    """Remove an incomplete output and its partial directory"""
+    shutil.rmtree(os.path.dirname(temp_path), ignore_errors=True)
+
+
+class ConversionResult:
+    """
+    Outcome of a single conversion
+    """
+    
+    def __init__(self, input_file, output_file, fps, frame_count, dropped_frames=0, elapsed=0.0, cache_hit=False,
+                 peak_rss=None, decode_time=None, encode_time=None, outputs=None, encoded_frames=None):
+        """
+        Initialize the result
+        
+        Args:
+            input_file (str): Path to the input WebP file
+            output_file (str): Path to the created MP4 file
+            fps (float): Frames per second of the output video
+            frame_count (int): Number of frames decoded from the input
+            dropped_frames (int): Number of duplicate frames merged into the previous frame
+            elapsed (float): Wall-clock conversion time in seconds
+            cache_hit (bool): Whether the video was taken from the conversion cache
+            peak_rss (int, optional): Peak resident memory in bytes of the converting process
+                and its largest ffmpeg process, if the platform reports it
+            decode_time (float, optional): Seconds spent decoding and preparing frames
+            encode_time (float, optional): Seconds spent handing frames to ffmpeg and waiting for it;
+                in the streaming pipeline both run concurrently, so elapsed is close to the larger one
+            outputs (dict, optional): Path of every output by kind, if several outputs were created
+            encoded_frames (int, optional): Number of frames handed to the encoder; merged duplicate
+                frames are encoded once. Defaults to frame_count - dropped_frames.
+        """
+        self.input_file = input_file
+        self.output_file = output_file
+        self.fps = fps
+        self.frame_count = frame_count
+        self.dropped_frames = dropped_frames
+        self.elapsed = elapsed
+        self.cache_hit = cache_hit
+        self.peak_rss = peak_rss
+        self.decode_time = decode_time
+        self.encode_time = encode_time
+        self.outputs = outputs
+        self.encoded_frames = frame_count - dropped_frames if encoded_frames is None else encoded_frames
+    
+    def to_dict(self):
+        """Return the result as a plain dictionary"""
+        return dict(self.__dict__)
+
 
 class WebPConverter:
     """
@@ -21,6 +144,9 @@ class WebPConverter:
         """
         Detect the FPS of a WebP file.
         
+        The frame durations are read from the file header. Only if the header cannot
+        be parsed are the frames decoded to collect them.
+        
         Args:
             path (str): Path to the WebP file
             
@@ -28,46 +154,21 @@ class WebPConverter:
             float: Detected FPS or 20 as default if detection fails
         """
         try:
-            # Open the WebP file
-            with Image.open(path) as img:
-                # Check if it's animated
-                try:
-                    img.seek(1)  # Try to move to the second frame
-                    # It's animated, try to get the duration of frames
-                    durations = []
-                    current_frame = 0
-                    
-                    # Reset to first frame
-                    img.seek(0)
-                    
-                    # Collect durations of frames
-                    while True:
-                        try:
-                            # Get duration in milliseconds
-                            duration = img.info.get('duration', 100)  # Default to 100ms if not specified
-                            durations.append(duration)
-                            current_frame += 1
-                            img.seek(current_frame)
-                        except EOFError:
-                            break
-                    
-                    # Calculate average duration in seconds
-                    if durations:
-                        avg_duration = sum(durations) / len(durations) / 1000.0  # Convert to seconds
-                        if avg_duration > 0:
-                            fps = 1.0 / avg_duration
-                            return fps
-                
-                except EOFError:
-                    # Not animated, default to 20 FPS for static images
-                    pass
-        
-        except Exception as e:
-            pass
+            info = probe(path)
+        except (OSError, ValueError):
+            info = None
+        if info is not None:
+            if not info.is_animated:
+                return DEFAULT_FPS
+            return fps_from_durations(info.durations)
         
-        # Default FPS if detection fails
-        default_fps = 20.0
-        return default_fps
+        decoder = WebPDecoder(path)
+        try:
+            for _ in decoder.frames():
+                pass
+        except Exception:
+            return DEFAULT_FPS
+        return decoder.fps()
     
     @staticmethod
     def analyse_image(path):
@@ -80,27 +181,26 @@ class WebPConverter:
         Returns:
             dict: Analysis results including size and mode
         """
-        im = Image.open(path)
-        results = {
-            'size': im.size,
-            'mode': 'full',
-        }
         try:
-            while True:
-                if im.tile:
-                    tile = im.tile[0]
-                    update_region = tile[1]
-                    update_region_dimensions = update_region[2:]
-                    if update_region_dimensions != im.size:
-                        results['mode'] = 'partial'
-                        break
-                im.seek(im.tell() + 1)
-        except EOFError:
+            info = probe(path)
+            return {
+                'size': info.size,
+                'mode': 'partial' if info.partial else 'full',
+            }
+        except (OSError, ValueError):
+            pass
+        
+        decoder = WebPDecoder(path)
+        for _ in decoder.frames():
             pass
-        return results
+        return {
+            'size': decoder.size,
+            'mode': decoder.mode,
+        }
     
     @staticmethod
-    def process_image(path, temp_dir, status_callback=None):
+    def process_image(path, temp_dir, status_callback=None, decoder=None, merge_duplicates=False, progress=None,
+                      colour=None):
         """
         Extract frames from the WebP file.
         
@@ -108,66 +208,53 @@ class WebPConverter:
             path (str): Path to the WebP file
             temp_dir (str): Directory to store temporary frame images
             status_callback (callable, optional): Callback function for status updates
+            decoder (WebPDecoder, optional): Decoder to use. After the call it holds the
+                durations, canvas size and mode collected during extraction.
+            merge_duplicates (bool, optional): Save identical consecutive frames only once.
+                The decoder's repeats list then holds the run length of each saved frame.
+            progress (ProgressReporter, optional): Reporter to send decode progress to
+            colour (ColourStage, optional): Save the frames as RGB prepared by this stage
+                instead of the composited RGBA pixels
             
         Returns:
             list: List of paths to extracted frame images
         """
+        if decoder is None:
+            decoder = WebPDecoder(path)
+        
+        basename = os.path.basename(path)
         images = []
         try:
-            mode = WebPConverter.analyse_image(path)['mode']
-            
-            im = Image.open(path)
-            
-            i = 0
-            p = im.getpalette()
-            last_frame = im.convert('RGBA')
+            frames = decoder.unique_frames() if merge_duplicates else decoder.frames()
+            for frame in frames:
+                frame_file_name = os.path.join(temp_dir, f'{os.path.splitext(basename)[0]}-{frame.index}.png')
+                
+                # Update status with frame info
+                if status_callback:
+                    status_callback(f"Processing frame {frame.index} of {basename}")
+                
+                image = frame.image if colour is None else Image.fromarray(colour.apply(frame.pixels))
+                image.save(frame_file_name, 'PNG')
+                images.append(frame_file_name)
+                if progress is not None:
+                    progress.update(STAGE_DECODE, frame.index + frame.repeat)
             
-            try:
-                while True:
-                    basename = os.path.basename(path)
-                    output_folder = temp_dir
-                    frame_file_name = os.path.join(output_folder, f'{os.path.splitext(basename)[0]}-{i}.png')
-                    
-                    # Update status with frame info
-                    if status_callback:
-                        status_callback(f"Processing frame {i} of {os.path.basename(path)}")
-                    
-                    if '.gif' in path.lower():
-                        if not im.getpalette():
-                            im.putpalette(p)
-                    
-                    new_frame = Image.new('RGBA', im.size)
-                    
-                    if mode == 'partial':
-                        new_frame.paste(last_frame)
-                    
-                    new_frame.paste(im, (0, 0), im.convert('RGBA'))
-                    
-                    new_frame.save(frame_file_name, 'PNG')
-                    images.append(frame_file_name)
-                    i += 1
-                    last_frame = new_frame
-                    im.seek(im.tell() + 1)
-            except EOFError:
-                # Update status with completion info
-                if status_callback and i > 0:
-                    status_callback(f"Extracted all {i} frames from {os.path.basename(path)}")
-                pass
+            # Update status with completion info
+            if status_callback and images:
+                status_callback(f"Extracted all {len(images)} frames from {basename}")
         except Exception as e:
-            import traceback
-            traceback.print_exc()
             # If we have at least one frame, we can continue
             if not images:
                 raise
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            raise
+            _decoding_stopped(basename, len(images), e, status_callback)
             
         return images
     
     @staticmethod
-    def convert(input_file, output_file=None, fps=None, status_callback=None):
+    def convert(input_file, output_file=None, fps=None, status_callback=None, pipeline=PIPELINE_STREAM,
+                still_duration=STATIC_DURATION, cache=None, progress_callback=None,
+                buffer_frames=DEFAULT_BUFFER_FRAMES, profile=None, segments=1, outputs=None, colour=None,
+                resize=None):
         """
         Convert WebP to MP4.
         
@@ -176,84 +263,500 @@ class WebPConverter:
             output_file (str, optional): Path to the output MP4 file. If None, uses the same name as input with .mp4 extension
             fps (float, optional): Frames per second for the output video. If None, will be detected from source.
             status_callback (callable, optional): Callback function for status updates
+            pipeline (str, optional): PIPELINE_STREAM pipes frames straight into ffmpeg,
+                PIPELINE_PNG extracts PNG frames to disk and encodes them from there
+            still_duration (float, optional): Length in seconds of the video made from a static image
+            cache (ConversionCache, optional): Cache to take the video from, or to add it to
+            progress_callback (callable, optional): Called with rate-limited ProgressEvents carrying
+                the stage, frames done, total frame count, bytes encoded and elapsed time
+            buffer_frames (int, optional): Maximum number of decoded frames waiting for the encoder
+                in the streaming pipeline; memory use is bounded by this, not by the animation length
+            profile (str or EncodingProfile, optional): Encoding profile, e.g. 'fast', 'balanced'
+                or 'archive'. Defaults to DEFAULT_PROFILE.
+            segments (int, optional): Split a long animation into up to this many frame ranges that
+                are encoded in parallel processes and joined without re-encoding (streaming pipeline only)
+            outputs (list, optional): Files to create from one decoding pass instead of the MP4 file:
+                output kinds ('mp4', 'webm', 'poster', 'thumbnails'), named after output_file, or
+                OutputTarget objects. Their encoders run concurrently. Requires the streaming
+                pipeline; the cache and segments are not used.
+            colour (ColourStage, optional): Background colour transparent areas are flattened onto
+                and how odd sizes are made even. Defaults to black and padding.
+            resize (Resize, optional): Downscale the frames to fit max_size or by scale, with the
+                given resampling filter. Each frame is resized once, right after compositing, so
+                the frame handoff and the encoders work at the smaller size.
             
         Returns:
-            str: Path to the created MP4 file
+            str: Path to the created MP4 file, or to the first output if outputs is given
             
         Raises:
-            ValueError: If no frames could be extracted from the WebP file
+            ValueError: If no frames could be extracted from the WebP file or the pipeline is unknown
             Exception: For any other errors during conversion
         """
+        result = WebPConverter.convert_file(input_file, output_file, fps, status_callback, pipeline,
+                                            still_duration, cache, progress_callback, buffer_frames, profile,
+                                            segments, outputs, colour, resize)
+        return result.output_file
+    
+    @staticmethod
+    def convert_file(input_file, output_file=None, fps=None, status_callback=None, pipeline=PIPELINE_STREAM,
+                     still_duration=STATIC_DURATION, cache=None, progress_callback=None,
+                     buffer_frames=DEFAULT_BUFFER_FRAMES, profile=None, segments=1, outputs=None, colour=None,
+                     resize=None):
+        """
+        Convert WebP to MP4 and report details about the conversion.
+        
+        Takes the same arguments as convert().
+        
+        Returns:
+            ConversionResult: Output path, FPS, frame count, elapsed time, peak memory and whether
+                the cache was hit
+        """
         if output_file is None:
             output_file = os.path.splitext(input_file)[0] + '.mp4'
+        if still_duration <= 0:
+            raise ValueError("Still image duration must be positive")
+        if segments < 1:
+            raise ValueError("The number of segments must be at least 1")
+        
+        if pipeline not in (PIPELINE_STREAM, PIPELINE_PNG):
+            raise ValueError(f"Unknown conversion pipeline: {pipeline}")
+        profile = get_profile(profile)
+        colour = get_colour_stage(colour)
+        resize = get_resize(resize)
+        
+        start = time.time()
+        if outputs is not None:
+            targets = output_targets(outputs, output_file)
+            if pipeline != PIPELINE_STREAM:
+                raise ValueError("Multiple outputs require the streaming pipeline")
+            temp_targets = [target._replace(path=_prepare_partial(target.path)) for target in targets]
+            try:
+                result = WebPConverter._convert_outputs(input_file, temp_targets, fps, status_callback,
+                                                        still_duration, progress_callback, buffer_frames, profile,
+                                                        colour, resize)
+                for target, temp_target in zip(targets, temp_targets):
+                    _commit_partial(temp_target.path, target.path)
+            finally:
+                for temp_target in temp_targets:
+                    _discard_partial(temp_target.path)
+            result.output_file = targets[0].path
+            result.outputs = {target.kind: target.path for target in targets}
+            result.elapsed = time.time() - start
+            return result
+        
+        # The output is written under a temporary name and renamed once complete, so an
+        # interrupted conversion never leaves a truncated file that looks finished
+        temp_file = _prepare_partial(output_file)
+        try:
+            result = WebPConverter._convert_to(input_file, output_file, temp_file, fps, status_callback, pipeline,
+                                               still_duration, cache, progress_callback, buffer_frames, profile,
+                                               segments, colour, resize)
+        finally:
+            _discard_partial(temp_file)
+        result.elapsed = time.time() - start
+        return result
+    
+    @staticmethod
+    def convert_bytes(data, output=None, fps=None, status_callback=None, still_duration=STATIC_DURATION,
+                      progress_callback=None, buffer_frames=DEFAULT_BUFFER_FRAMES, profile=None, colour=None,
+                      resize=None):
+        """
+        Convert WebP data held in memory to MP4, without temporary files.
+        
+        The data is decoded from memory and the video is read from ffmpeg's output
+        pipe. Since ffmpeg cannot seek back in a pipe to put the index in front, the
+        MP4 is fragmented; browsers and players handle it like a regular MP4, and it
+        can be played while it is still being received.
+        
+        Args:
+            data (bytes or file-like): Content of the WebP file, or a binary stream to read it from
+            output (file-like, optional): Writable binary stream the MP4 is written to as it is
+                encoded. If None, the MP4 is returned as bytes.
+            fps, status_callback, still_duration, progress_callback, buffer_frames, profile, colour, resize:
+                As for convert()
             
-        temp_dir = tempfile.mkdtemp()
+        Returns:
+            bytes: The MP4 file, or None if it was written to output
+            
+        Raises:
+            ValueError: If no frames could be extracted from the WebP data
+        """
+        if hasattr(data, 'read'):
+            data = data.read()
+        if still_duration <= 0:
+            raise ValueError("Still image duration must be positive")
+        target = io.BytesIO() if output is None else output
+        WebPConverter._convert_stream(data, target, fps, status_callback, still_duration, progress_callback,
+                                      buffer_frames, get_profile(profile), get_colour_stage(colour),
+                                      get_resize(resize))
+        return target.getvalue() if output is None else None
+    
+    @staticmethod
+    def _convert_to(input_file, output_file, temp_file, fps, status_callback, pipeline, still_duration, cache,
+                    progress_callback, buffer_frames, profile, segments, colour, resize):
+        """
+        Convert to a single MP4 file through temp_file, taking it from the cache if possible.
+        """
+        cache_key = None
+        if cache is not None:
+            params = {
+                'fps': fps,
+                'pipeline': pipeline,
+                'still_duration': still_duration,
+                'codec': DEFAULT_CODEC,
+                'profile': profile.settings(),
+                'segments': segments,
+                'colour': colour.settings(),
+                'resize': resize.settings() if resize is not None else None,
+            }
+            cache_key = cache.key(input_file, params)
+            metadata = cache.fetch(cache_key, temp_file)
+            if metadata is not None:
+                _commit_partial(temp_file, output_file)
+                if status_callback:
+                    status_callback(f"Video taken from cache: {os.path.basename(output_file)}")
+                ProgressReporter(input_file, progress_callback).finish(metadata.get('frame_count', 0))
+                return ConversionResult(input_file, output_file, metadata.get('fps'),
+                                        metadata.get('frame_count', 0), metadata.get('dropped_frames', 0),
+                                        cache_hit=True, encoded_frames=metadata.get('encoded_frames'))
+        
+        plan = None
+        if pipeline == PIPELINE_STREAM and segments > 1:
+            plan = WebPConverter._segment_plan(input_file, segments)
+        
+        if plan is not None:
+            result = WebPConverter._convert_segmented(input_file, temp_file, fps, status_callback, progress_callback,
+                                                      buffer_frames, profile, plan, colour, resize)
+        elif pipeline == PIPELINE_STREAM:
+            result = WebPConverter._convert_stream(input_file, temp_file, fps, status_callback, still_duration,
+                                                   progress_callback, buffer_frames, profile, colour, resize)
+        elif pipeline == PIPELINE_PNG:
+            result = WebPConverter._convert_png(input_file, temp_file, fps, status_callback, still_duration,
+                                                progress_callback, profile, colour, resize)
+        _commit_partial(temp_file, output_file)
+        result.output_file = output_file
+        
+        if cache is not None:
+            cache.store(cache_key, output_file, {
+                'fps': result.fps,
+                'frame_count': result.frame_count,
+                'dropped_frames': result.dropped_frames,
+                'encoded_frames': result.encoded_frames,
+            })
+        return result
+    
+    @staticmethod
+    def _convert_stream(input_file, output_file, fps, status_callback, still_duration, progress_callback=None,
+                        buffer_frames=DEFAULT_BUFFER_FRAMES, profile=None, colour=None, resize=None):
+        """
+        Convert by piping decoded frames straight into ffmpeg, without temporary files.
+        
+        Frames are decoded and passed through the colour stage in a background thread while this thread
+        feeds them to ffmpeg, so decoding and encoding overlap. They are handed over
+        through a queue of at most buffer_frames frames, so memory use does not grow
+        with the length of the animation. The frame rate is taken from the file header before
+        decoding starts. A static image is encoded as a single frame lasting
+        still_duration seconds. The input may also be bytes and the output a stream,
+        see convert_bytes().
+        """
+        basename = _display_name(input_file, "WebP data")
+        output_name = _display_name(output_file, "MP4 stream")
+        if status_callback:
+            status_callback(f"Extracting frames from {basename}")
+        
+        decoder = WebPDecoder(input_file, resize, _forced_duration(fps))
+        progress = ProgressReporter(input_file if isinstance(input_file, (str, os.PathLike)) else None,
+                                    progress_callback)
+        # Canvas size, animation flag and frame count are needed before the first frame
+        progress.frames_total = decoder.probe()
+        progress.update(STAGE_PROBE)
+        
+        # Detect FPS if not provided
+        if not decoder.is_animated:
+            fps = None
+        elif fps is None:
+            fps = WebPConverter.detect_fps(input_file)
+            if status_callback:
+                status_callback(f"Converting {basename} at {fps:.2f} FPS...")
+        
+        encoder = None
+        encode_time = 0.0
+        colour = get_colour_stage(colour)
+        size = colour.output_size(decoder.size)
+        # Identical consecutive frames are merged and encoded once, lasting the whole run;
+        # the colour stage runs on the decoder thread
+        frames = FrameQueue(decoder.unique_frames(), buffer_frames, prepare=colour)
         try:
+            try:
+                for frame in frames:
+                    start = time.perf_counter()
+                    if encoder is None:
+                        if status_callback:
+                            status_callback(f"Encoding video to {output_name}")
+                        if decoder.is_animated:
+                            encoder = FFmpegEncoder(output_file, size, fps, profile=profile).open()
+                        else:
+                            # A static image is encoded once and shown for still_duration seconds
+                            if status_callback:
+                                status_callback(f"Creating video from static image")
+                            encoder = FFmpegEncoder.still(output_file, size, still_duration,
+                                                          profile=profile).open()
+                            fps = float(encoder.fps)
+                    encoder.write_data(frame.pixels, frame.repeat, frame.duration if decoder.is_animated else None)
+                    encode_time += time.perf_counter() - start
+                    progress.update(STAGE_ENCODE, frame.index + frame.repeat, encoder.bytes_written)
+            except Exception as e:
+                # If we have at least one frame, we can continue
+                if decoder.frame_count == 0:
+                    raise
+                _decoding_stopped(basename, decoder.frame_count, e, status_callback)
+            
+            if decoder.frame_count == 0:
+                raise ValueError("No frames were extracted from the WebP file")
+            
+            if decoder.dropped_frames and status_callback:
+                status_callback(f"Merged {decoder.dropped_frames} duplicate frames of {basename}")
+            start = time.perf_counter()
+            encoder.close()
+            encode_time += time.perf_counter() - start
+            
             if status_callback:
-                status_callback(f"Extracting frames from {os.path.basename(input_file)}")
+                status_callback(f"Video created successfully: {output_name}")
+            progress.finish(decoder.frame_count)
             
-            # Check if file is a valid WebP
-            is_animated = False
+            return ConversionResult(input_file, output_file, fps, decoder.frame_count, decoder.dropped_frames,
+                                    peak_rss=peak_rss(), decode_time=frames.busy_time, encode_time=encode_time,
+                                    encoded_frames=encoder.frames_written)
+        except Exception:
+            if encoder is not None:
+                encoder.abort()
+            raise
+        finally:
+            frames.close()
+    
+    @staticmethod
+    def _convert_outputs(input_file, targets, fps, status_callback, still_duration, progress_callback=None,
+                         buffer_frames=DEFAULT_BUFFER_FRAMES, profile=None, colour=None, resize=None):
+        """
+        Create several outputs from one decoding pass.
+        
+        The file is decoded once, as in _convert_stream(), and every frame is handed
+        to all outputs. Each output runs in its own thread with its own queue of at most
+        buffer_frames frames, so the encoders work concurrently and N outputs cost
+        one decode.
+        """
+        basename = os.path.basename(input_file)
+        if status_callback:
+            status_callback(f"Extracting frames from {basename}")
+        
+        decoder = WebPDecoder(input_file, resize, _forced_duration(fps))
+        progress = ProgressReporter(input_file, progress_callback)
+        progress.frames_total = decoder.probe()
+        progress.update(STAGE_PROBE)
+        
+        if not decoder.is_animated:
+            fps = None
+        elif fps is None:
+            fps = WebPConverter.detect_fps(input_file)
+            if status_callback:
+                status_callback(f"Converting {basename} at {fps:.2f} FPS...")
+        
+        colour = get_colour_stage(colour)
+        writers = [create_output(target, profile) for target in targets]
+        try:
+            for writer in writers:
+                writer.open(colour.output_size(decoder.size), fps, progress.frames_total,
+                            None if decoder.is_animated else still_duration)
+            if status_callback:
+                status_callback(f"Encoding {basename} to {len(writers)} outputs")
+            
+            fan_out = FrameFanOut([writer.write for writer in writers], buffer_frames)
+            frames = FrameQueue(decoder.unique_frames(), buffer_frames, prepare=colour)
             try:
-                with Image.open(input_file) as img:
-                    # Check if it's animated
+                decoded = iter(frames)
+                while True:
                     try:
-                        img.seek(1)
-                        is_animated = True
-                        img.seek(0)
-                    except EOFError:
-                        is_animated = False
+                        frame = next(decoded)
+                    except StopIteration:
+                        break
+                    except Exception as e:
+                        # If we have at least one frame, we can continue
+                        if decoder.frame_count == 0:
+                            raise
+                        _decoding_stopped(basename, decoder.frame_count, e, status_callback)
+                        break
+                    fan_out.put(frame)
+                    progress.update(STAGE_ENCODE, frame.index + frame.repeat)
+            finally:
+                # Stop the decoder thread even if an output failed before the end of the file
+                frames.close()
+                fan_out.close()
             
-            except Exception as e:
-                raise
+            if decoder.frame_count == 0:
+                raise ValueError("No frames were extracted from the WebP file")
             
-            # Detect FPS if not provided
-            if fps is None:
-                fps = WebPConverter.detect_fps(input_file)
+            start = time.perf_counter()
+            for writer in writers:
+                writer.close()
+            encode_time = max(fan_out.busy_times) + time.perf_counter() - start
+        except Exception:
+            for writer in writers:
+                writer.abort()
+            raise
+        
+        if status_callback:
+            status_callback(f"Created {len(writers)} outputs from {basename}")
+        progress.finish(decoder.frame_count)
+        
+        if fps is None:
+            # Frame rate of the videos made from the static image
+            fps = next((writer.fps for writer in writers if writer.fps is not None), None)
+        return ConversionResult(input_file, targets[0].path, fps, decoder.frame_count, decoder.dropped_frames,
+                                peak_rss=peak_rss(), decode_time=frames.busy_time, encode_time=encode_time,
+                                outputs={target.kind: target.path for target in targets})
+    
+    @staticmethod
+    def _segment_plan(input_file, segments):
+        """
+        Frame ranges for a segmented conversion.
+        
+        Returns:
+            list: (start, stop) ranges, or None if the file is not animated or too short to split
+        """
+        try:
+            info = probe(input_file)
+        except (OSError, ValueError):
+            return None
+        if not info.is_animated:
+            return None
+        plan = plan_segments(info.frame_count, segments)
+        return plan if len(plan) > 1 else None
+    
+    @staticmethod
+    def _convert_segmented(input_file, output_file, fps, status_callback, progress_callback, buffer_frames, profile,
+                           plan, colour=None, resize=None):
+        """
+        Convert a long animation by encoding frame ranges in parallel processes.
+        
+        Each range starts from the fully composited canvas, so it is encoded
+        independently; the segment videos are then joined without re-encoding.
+        Every frame keeps its duration from the file (or the frame rate given), so
+        the result has the same frames and timing as a single encode.
+        """
+        basename = os.path.basename(input_file)
+        progress = ProgressReporter(input_file, progress_callback, frames_total=plan[-1][1])
+        progress.update(STAGE_PROBE)
+        
+        frame_duration = _forced_duration(fps)
+        if fps is None:
+            fps = WebPConverter.detect_fps(input_file)
+            if status_callback:
+                status_callback(f"Converting {basename} at {fps:.2f} FPS...")
+        if status_callback:
+            status_callback(f"Encoding {basename} in {len(plan)} parallel segments")
+        
+        directory = segment_dir(output_file)
+        try:
+            segment_files = [os.path.join(directory, f'segment-{i:04d}.mp4') for i in range(len(plan))]
+            segment_results = [None] * len(plan)
+            frames_done = 0
+            with ProcessPoolExecutor(max_workers=len(plan)) as executor:
+                futures = {
+                    executor.submit(encode_segment, input_file, path, start, stop, fps, profile, buffer_frames,
+                                    colour, resize, frame_duration): i
+                    for i, (path, (start, stop)) in enumerate(zip(segment_files, plan))
+                }
+                try:
+                    for future in as_completed(futures):
+                        segment_results[futures[future]] = future.result()
+                        frames_done += segment_results[futures[future]]['frame_count']
+                        progress.update(STAGE_ENCODE, frames_done)
+                except Exception:
+                    for future in futures:
+                        future.cancel()
+                    raise
             
-            # For non-animated WebP, create a simple video with the same frame repeated
-            if not is_animated:
-                # Save the image as a single frame
-                frame_file_name = os.path.join(temp_dir, f'{os.path.splitext(os.path.basename(input_file))[0]}-0.png')
-                with Image.open(input_file) as img:
-                    img.convert('RGBA').save(frame_file_name, 'PNG')
-                
-                # Create a video with the single frame repeated
-                if status_callback:
-                    status_callback(f"Creating video from static image")
-                clip = ImageSequenceClip([frame_file_name], fps=fps)
-                # Make the clip 3 seconds long by repeating the frame
-                clip = clip.set_duration(3)
-                
-                if status_callback:
-                    status_callback(f"Encoding video to {os.path.basename(output_file)}")
-                clip.write_videofile(output_file, codec='libx264')
-                
-                if status_callback:
-                    status_callback(f"Video created successfully: {os.path.basename(output_file)}")
-                return output_file
+            if status_callback:
+                status_callback(f"Joining {len(plan)} segments of {basename}")
+            concat_segments(segment_files, output_file)
+        finally:
+            remove_segment_dir(directory)
+        
+        if status_callback:
+            status_callback(f"Video created successfully: {os.path.basename(output_file)}")
+        frame_count = sum(r['frame_count'] for r in segment_results)
+        progress.finish(frame_count)
+        
+        peaks = [r['peak_rss'] for r in segment_results if r['peak_rss'] is not None]
+        return ConversionResult(input_file, output_file, fps, frame_count,
+                                sum(r['dropped_frames'] for r in segment_results),
+                                peak_rss=max(peaks) if peaks else None,
+                                decode_time=sum(r['decode_time'] for r in segment_results),
+                                encode_time=sum(r['encode_time'] for r in segment_results),
+                                encoded_frames=sum(r['encoded_frames'] for r in segment_results))
+    
+    @staticmethod
+    def _convert_png(input_file, output_file, fps, status_callback, still_duration, progress_callback=None,
+                     profile=None, colour=None, resize=None):
+        """
+        Convert by extracting PNG frames to a temporary directory and encoding them from there.
+        
+        This is the original pipeline, kept as a fallback. Identical consecutive frames
+        are saved once and encoded once, lasting as long as the whole run.
+        """
+        temp_dir = tempfile.mkdtemp()
+        try:
+            if status_callback:
+                status_callback(f"Extracting frames from {os.path.basename(input_file)}")
             
-            # For animated WebP, extract all frames
-            images = WebPConverter.process_image(input_file, temp_dir, status_callback)
+            # Decode the file once; durations and animation info are collected on the way
+            decoder = WebPDecoder(input_file, resize, _forced_duration(fps))
+            progress = ProgressReporter(input_file, progress_callback)
+            if progress_callback:
+                progress.frames_total = decoder.probe()
+                progress.update(STAGE_PROBE)
+            # Frames are saved as the RGB the encoder reads, so they are not converted again
+            images = WebPConverter.process_image(input_file, temp_dir, status_callback, decoder, merge_duplicates=True,
+                                                 progress=progress, colour=get_colour_stage(colour))
             
             if not images:
                 raise ValueError("No frames were extracted from the WebP file")
             
-            if status_callback:
-                status_callback(f"Creating video from {len(images)} frames")
-            clip = ImageSequenceClip(images, fps=fps)
+            with Image.open(images[0]) as first:
+                size = first.size
+            if decoder.is_animated:
+                # Detect FPS if not provided
+                if fps is None:
+                    fps = decoder.fps()
+                    if status_callback:
+                        status_callback(f"Converting {os.path.basename(input_file)} at {fps:.2f} FPS...")
+                if status_callback:
+                    status_callback(f"Creating video from {len(images)} frames")
+                encoder = FFmpegEncoder(output_file, size, fps, profile=profile)
+            else:
+                # A static image is encoded once and shown for still_duration seconds
+                if status_callback:
+                    status_callback(f"Creating video from static image")
+                encoder = FFmpegEncoder.still(output_file, size, still_duration, profile=profile)
+                fps = float(encoder.fps)
             
             if status_callback:
                 status_callback(f"Encoding video to {os.path.basename(output_file)}")
-            clip.write_videofile(output_file, codec='libx264')
+            progress.update(STAGE_ENCODE, 0)
+            done = 0
+            with encoder:
+                # A merged frame was saved once and lasts as long as the frames it stands for
+                for image_file, repeat, duration in zip(images, decoder.repeats, decoder.unique_durations):
+                    with Image.open(image_file) as image:
+                        encoder.write(image, repeat, duration if decoder.is_animated else None)
+                    done += repeat
+                    progress.update(STAGE_ENCODE, done, encoder.bytes_written)
             
             if status_callback:
                 status_callback(f"Video created successfully: {os.path.basename(output_file)}")
+            progress.finish(decoder.frame_count)
             
-            return output_file
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            raise
+            return ConversionResult(input_file, output_file, fps, decoder.frame_count, decoder.dropped_frames,
+                                    peak_rss=peak_rss(), encoded_frames=encoder.frames_written)
         finally:
             shutil.rmtree(temp_dir)
@@ -0,0 +1,314 @@
+"""
+WebP Decoder Module
+Decodes a WebP file in a single pass, yielding composited frames with their metadata
+"""
+
+from collections import namedtuple
+import numpy as np
+from PIL import Image
+
+from main.core.compositor import FrameCompositor
+from main.core.probe import probe, open_source
+
+# Frame duration (ms) assumed when the file does not specify one, or gives 0
+DEFAULT_FRAME_DURATION = 100
+
+# FPS used when it cannot be derived from the frame durations
+DEFAULT_FPS = 20.0
+
+
+class DecodedFrame(namedtuple('DecodedFrame', ['index', 'pixels', 'duration', 'region', 'partial', 'repeat', 'changed'])):
+    """
+    A single composited frame produced by the decoder
+
+    Fields:
+        index     -- position of the frame in the animation
+        pixels    -- composited RGBA pixels covering the whole canvas, shape (height, width, 4),
+                     with the colour multiplied by alpha (flattened onto black); downscaled
+                     to the decoder's size if it resizes frames
+        duration  -- display time in milliseconds, from the file unless the decoder forces one
+        region    -- (x0, y0, x1, y1) box updated by this frame, in canvas coordinates
+        partial   -- True if the frame only updates part of the canvas
+        repeat    -- number of consecutive source frames this frame stands for
+        changed   -- False if the canvas is identical to the previous frame
+    """
+    __slots__ = ()
+
+    @property
+    def image(self):
+        """The pixels as a PIL RGBA image"""
+        return Image.fromarray(self.pixels)
+
+
+def fps_from_durations(durations, default=DEFAULT_FPS):
+    """
+    Derive the frame rate from a list of frame durations.
+
+    Args:
+        durations (list): Frame durations in milliseconds
+        default (float): FPS to return if no usable duration is available
+
+    Returns:
+        float: Frames per second matching the average frame duration
+    """
+    if durations:
+        avg_duration = sum(durations) / len(durations) / 1000.0  # Convert to seconds
+        if avg_duration > 0:
+            return 1.0 / avg_duration
+    return default
+
+
+class WebPDecoder:
+    """
+    Single-pass decoder for WebP files.
+
+    Iterating over frames() opens the file once and decodes each frame exactly once.
+    Canvas size, animation flag, durations and partial-update mode are collected
+    along the way, so no extra pass over the file is needed to get them.
+
+    Frames of an animation come from libwebp already composited onto the full
+    canvas. The box each frame can change is read from its ANMF chunk header, so
+    only that box is converted, compared with the previous frame and copied.
+
+    With a Resize setting, every frame is downscaled as soon as it is composited.
+    Compositing itself needs the full canvas, but everything after it works at the
+    smaller size.
+    """
+
+    def __init__(self, path, resize=None, frame_duration=None):
+        """
+        Initialize the decoder
+
+        Args:
+            path (str or bytes): Path to the WebP file, or its content
+            resize (Resize, optional): Downscaling applied to every composited frame
+            frame_duration (float, optional): Display time in milliseconds given to every
+                frame instead of the one in the file, e.g. 1000 / fps for a fixed frame rate
+        """
+        self.path = path
+        self.resize = resize
+        self.frame_duration = frame_duration
+        self.canvas_size = None
+        self.size = None
+        self.is_animated = False
+        self.mode = 'full'
+        self.total_frames = None
+        self.durations = []
+        self.repeats = []
+        self.unique_durations = []
+
+    def _open(self):
+        """Open the file with Pillow; content held in memory is wrapped in a stream"""
+        if isinstance(self.path, (bytes, bytearray, memoryview)):
+            return Image.open(open_source(self.path))
+        return Image.open(self.path)
+
+    def _set_canvas_size(self, size):
+        """Record the canvas size and the size of the frames yielded for it"""
+        self.canvas_size = size
+        self.size = self.resize.output_size(size) if self.resize is not None else size
+
+    def probe(self):
+        """
+        Read the canvas size and frame count without decoding any frame.
+
+        The RIFF headers are parsed directly; Pillow is only asked if they cannot be.
+
+        Returns:
+            int: Number of frames in the file
+        """
+        try:
+            info = probe(self.path)
+            self._set_canvas_size(info.size)
+            self.total_frames = info.frame_count
+        except ValueError:
+            with self._open() as im:
+                self._set_canvas_size(im.size)
+                self.total_frames = getattr(im, 'n_frames', 1)
+        self.is_animated = self.total_frames > 1
+        return self.total_frames
+
+    @property
+    def frame_count(self):
+        """Number of frames decoded so far"""
+        return len(self.durations)
+
+    @property
+    def dropped_frames(self):
+        """Number of duplicate frames merged away by unique_frames()"""
+        if not self.repeats:
+            return 0
+        return sum(self.repeats) - len(self.repeats)
+
+    def fps(self, default=DEFAULT_FPS):
+        """
+        FPS derived from the durations of the decoded frames.
+
+        Args:
+            default (float): FPS to return for static images or missing durations
+
+        Returns:
+            float: Detected FPS
+        """
+        if not self.is_animated:
+            return default
+        return fps_from_durations(self.durations, default)
+
+    def _update_regions(self, size):
+        """
+        Box of the canvas each frame of an animation can change.
+
+        A frame draws inside its own box, and if the previous frame is disposed
+        its box is cleared first, so the update region covers both.
+
+        Args:
+            size (tuple): (width, height) of the canvas as decoded
+
+        Returns:
+            list: (x0, y0, x1, y1) box of every frame, or None if the headers cannot be read
+                or do not match the decoded file
+        """
+        try:
+            info = probe(self.path)
+        except (OSError, ValueError):
+            return None
+        if info.size != tuple(size) or info.frame_count != self.total_frames:
+            return None
+
+        width, height = size
+        regions = []
+        previous = None
+        for frame in info.frames:
+            x0, y0, x1, y1 = frame.region
+            if previous is not None and previous.dispose:
+                px0, py0, px1, py1 = previous.region
+                x0, y0, x1, y1 = min(x0, px0), min(y0, py0), max(x1, px1), max(y1, py1)
+            regions.append((x0, y0, min(x1, width), min(y1, height)))
+            previous = frame
+        return regions
+
+    def frames(self, start=0, stop=None):
+        """
+        Decode the file, yielding one composited frame at a time.
+
+        The pixels of an animated file are a view of the decoder's canvas, which is
+        reused for the next frame; copy them to keep a frame around.
+
+        When decoding starts after the first frame, libwebp still reconstructs the
+        skipped frames, and the first frame yielded is the complete composited canvas,
+        so it can serve as a keyframe. Durations then only cover the decoded range.
+
+        Args:
+            start (int): Index of the first frame to yield
+            stop (int, optional): Index after the last frame to yield. Defaults to the end.
+
+        Yields:
+            DecodedFrame: The next composited frame
+        """
+        self.durations = []
+        self.mode = 'full'
+
+        with self._open() as im:
+            self._set_canvas_size(im.size)
+            self.total_frames = getattr(im, 'n_frames', 1)
+            self.is_animated = self.total_frames > 1
+            palette = im.getpalette()
+            canvas_box = (0, 0) + im.size
+            compositor = FrameCompositor(im.size) if self.is_animated else None
+            regions = self._update_regions(im.size) if self.is_animated else None
+            index = start
+            if start:
+                im.seek(start)
+
+            while stop is None or index < stop:
+                if palette is not None and not im.getpalette():
+                    im.putpalette(palette)
+
+                # The first frame of a range always replaces the whole canvas
+                region = canvas_box
+                if regions is not None and index > start:
+                    region = regions[index]
+                partial = region != canvas_box
+                if partial:
+                    self.mode = 'partial'
+
+                im.load()
+
+                duration = im.info.get('duration') or DEFAULT_FRAME_DURATION
+                self.durations.append(duration)
+                if self.frame_duration is not None:
+                    duration = self.frame_duration
+
+                if compositor is None:
+                    # A static image is used as is; transparent ones are premultiplied
+                    # like the canvas of an animation
+                    pixels = np.asarray(im.convert('RGBA'))
+                    if 'A' in im.getbands() or 'transparency' in im.info:
+                        flattened = FrameCompositor(im.size)
+                        flattened.composite(pixels)
+                        pixels = flattened.canvas
+                    changed = True
+                else:
+                    # The rest of the canvas is the same as in the previous frame,
+                    # so only the updated region is converted and copied
+                    source = im.crop(region) if partial else im
+                    changed = compositor.composite(np.asarray(source.convert('RGBA')), region)
+                    pixels = compositor.canvas
+
+                if self.resize is not None:
+                    pixels = self.resize.apply(pixels)
+
+                yield DecodedFrame(index, pixels, duration, region, partial, 1, changed or index == start)
+
+                index += 1
+                try:
+                    im.seek(index)
+                except EOFError:
+                    break
+
+    def _count_run(self, frame):
+        """Record the repeat count and duration of a frame yielded by unique_frames()"""
+        self.repeats.append(frame.repeat)
+        self.unique_durations.append(frame.duration)
+
+    def unique_frames(self, start=0, stop=None):
+        """
+        Decode the file, merging identical consecutive frames.
+
+        A run of identical composited frames is yielded once, with the summed duration
+        and the length of the run as its repeat count. Each frame is yielded once the
+        next different frame (or the end of the file) is reached. The repeat counts and
+        durations of the yielded frames are collected in repeats and unique_durations.
+
+        Args:
+            start (int): Index of the first frame to decode, see frames()
+            stop (int, optional): Index after the last frame to decode
+
+        Yields:
+            DecodedFrame: The next distinct composited frame
+        """
+        self.repeats = []
+        self.unique_durations = []
+        held = None
+
+        try:
+            for frame in self.frames(start, stop):
+                if held is not None and not frame.changed:
+                    held = held._replace(duration=held.duration + frame.duration, repeat=held.repeat + 1)
+                    continue
+
+                if held is not None:
+                    self._count_run(held)
+                    yield held
+                # The decoder reuses its canvas, so keep a copy until the run ends
+                held = frame._replace(pixels=frame.pixels.copy())
+        except Exception:
+            # Hand out the frame decoded before the error, then report the error
+            if held is not None:
+                self._count_run(held)
+                yield held
+            raise
+
+        if held is not None:
+            self._count_run(held)
+            yield held
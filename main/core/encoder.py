@@ -0,0 +1,366 @@
+"""
+Video Encoder Module
+Streams timestamped raw RGB frames straight into an ffmpeg process
+"""
+
+import os
+import re
+import threading
+import subprocess
+from functools import lru_cache
+from fractions import Fraction
+import numpy as np
+import imageio_ffmpeg
+
+from main.core.profiles import get_profile
+
+# Codec used for the output videos
+DEFAULT_CODEC = 'libx264'
+
+# Codec used for WebM videos
+VP9_CODEC = 'libvpx-vp9'
+
+# MP4 written to a pipe is fragmented: ffmpeg cannot seek back to put the index in front
+STREAM_MOVFLAGS = 'frag_keyframe+empty_moov+default_base_moof'
+
+# Bytes copied at a time from ffmpeg's output to a stream
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Frame timestamps are handed to ffmpeg in milliseconds, the unit of WebP frame durations
+TIMESTAMP_SCALE = 1000
+
+# ffmpeg options keeping every frame at its timestamp, by the first ffmpeg version taking them.
+# -fps_mode replaced -vsync in 5.1; 'demux' (the input's time base) is accepted since 7.0.
+TIMING_PARAMS = (
+    ((7, 0), ['-fps_mode', 'vfr', '-enc_time_base', 'demux']),
+    ((5, 1), ['-fps_mode', 'vfr', '-enc_time_base', '-1']),
+    ((0, 0), ['-vsync', 'vfr', '-enc_time_base', '-1']),
+)
+
+# First ffmpeg version keeping the duration of the last frame. Older ones end the video
+# when the last frame starts, so that frame is sent again, for a millisecond, at the end.
+LAST_FRAME_DURATION_VERSION = (7, 0)
+
+
+@lru_cache(maxsize=None)
+def ffmpeg_version():
+    """
+    Version of the ffmpeg executable used for encoding.
+
+    Returns:
+        tuple: (major, minor), or None for builds without a release number (e.g. from git)
+    """
+    match = re.match(r'n?(\d+)\.(\d+)', imageio_ffmpeg.get_ffmpeg_version())
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def timing_params(version):
+    """
+    ffmpeg options encoding every frame at its timestamp, in the input's time base.
+
+    Args:
+        version (tuple): (major, minor) ffmpeg version; None is taken as a recent build
+
+    Returns:
+        list: Command line options
+    """
+    for first_version, params in TIMING_PARAMS:
+        if version is None or version >= first_version:
+            return list(params)
+
+
+def _ebml_size(length):
+    """Element size as an 8-byte EBML variable-length integer"""
+    return (1 << 56 | length).to_bytes(8, 'big')
+
+
+def _ebml(element_id, payload):
+    """A Matroska (EBML) element"""
+    return element_id + _ebml_size(len(payload)) + payload
+
+
+def _ebml_uint(element_id, value):
+    """A Matroska element holding an unsigned integer"""
+    return _ebml(element_id, value.to_bytes(max(1, (value.bit_length() + 7) // 8), 'big'))
+
+
+def _matroska_header(size):
+    """
+    Start of a Matroska stream with one raw rgb24 video track.
+
+    Raw video has no timestamps, so frames are wrapped in Matroska, the simplest
+    container ffmpeg reads from a pipe that carries a time and duration per frame.
+    The segment has an unknown size, so frames can be appended as they come.
+    """
+    width, height = size
+    ebml = _ebml(b'\x1a\x45\xdf\xa3',
+                 _ebml_uint(b'\x42\x86', 1) + _ebml_uint(b'\x42\xf7', 1) + _ebml_uint(b'\x42\xf2', 4)
+                 + _ebml_uint(b'\x42\xf3', 8) + _ebml(b'\x42\x82', b'matroska')
+                 + _ebml_uint(b'\x42\x87', 4) + _ebml_uint(b'\x42\x85', 2))
+    segment = b'\x18\x53\x80\x67' + b'\x01\xff\xff\xff\xff\xff\xff\xff'
+    info = _ebml(b'\x15\x49\xa9\x66', _ebml_uint(b'\x2a\xd7\xb1', 1000000000 // TIMESTAMP_SCALE))
+    video = _ebml(b'\xe0', _ebml_uint(b'\xb0', width) + _ebml_uint(b'\xba', height)
+                  + _ebml(b'\x2e\xb5\x24', b'RGB\x18'))
+    track = _ebml(b'\xae', _ebml_uint(b'\xd7', 1) + _ebml_uint(b'\x73\xc5', 1) + _ebml_uint(b'\x83', 1)
+                  + _ebml(b'\x86', b'V_UNCOMPRESSED') + video)
+    return ebml + segment + info + _ebml(b'\x16\x54\xae\x6b', track)
+
+
+def _matroska_frame(length, pts, duration):
+    """
+    Matroska elements around one frame of the given byte length.
+
+    Every frame is a cluster of its own holding a block group with the frame's
+    duration, so the timestamps are absolute and the last frame keeps its length.
+
+    Returns:
+        tuple: (bytes written before the frame data, bytes written after it)
+    """
+    timestamp = _ebml_uint(b'\xe7', pts)
+    block = b'\xa1' + _ebml_size(4 + length) + b'\x81\x00\x00\x00'
+    block_duration = _ebml_uint(b'\x9b', duration)
+    group_length = len(block) + length + len(block_duration)
+    group = b'\xa0' + _ebml_size(group_length)
+    cluster = b'\x1f\x43\xb6\x75' + _ebml_size(len(timestamp) + len(group) + group_length)
+    return cluster + timestamp + group + block, block_duration
+
+
+class _PipeWriter:
+    """
+    Feeds data to an ffmpeg process, optionally copying the encoded video to a stream.
+
+    The output is read in a background thread, so ffmpeg never blocks on a full pipe.
+    """
+
+    def __init__(self, command, stream=None):
+        self._stream = stream
+        self._error = None
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                         stdout=subprocess.DEVNULL if stream is None else subprocess.PIPE)
+        self._reader = None
+        if stream is not None:
+            self._reader = threading.Thread(target=self._copy, name='ffmpeg-output', daemon=True)
+            self._reader.start()
+
+    def _copy(self):
+        """Reader thread: copy ffmpeg's output to the stream"""
+        try:
+            for chunk in iter(lambda: self._process.stdout.read(STREAM_CHUNK_SIZE), b''):
+                self._stream.write(chunk)
+        except Exception as e:
+            self._error = e
+            self._process.kill()
+
+    def send(self, data):
+        """Write data to ffmpeg"""
+        try:
+            self._process.stdin.write(data)
+        except BrokenPipeError:
+            raise RuntimeError("ffmpeg stopped while encoding") from self._error
+
+    def close(self):
+        """Wait for ffmpeg to finish and for its output to be copied"""
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        self._process.wait()
+        if self._reader is not None:
+            self._reader.join()
+        if self._error is not None:
+            raise self._error
+        if self._process.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed with exit code {self._process.returncode}")
+
+
+class FFmpegEncoder:
+    """
+    Encodes frames by piping raw RGB data into ffmpeg.
+
+    Frames are handed over in memory, so no intermediate image files are written.
+    Every frame carries its own timestamp and duration and ffmpeg keeps them
+    (variable frame rate), so a frame shown for several ticks is encoded once
+    instead of being repeated at a fixed rate.
+    """
+
+    def __init__(self, output_file, size, fps, codec=DEFAULT_CODEC, profile=None):
+        """
+        Initialize the encoder
+
+        Args:
+            output_file (str or file-like): Path to the output video file, or a writable binary
+                stream that receives the video; MP4 written to a stream is fragmented
+            size (tuple): (width, height) of the frames
+            fps (float or Fraction): Frame rate giving the duration of frames written
+                without one; a Fraction allows rates below 1 FPS
+            codec (str): ffmpeg video codec
+            profile (str or EncodingProfile, optional): Encoding profile. Defaults to DEFAULT_PROFILE.
+        """
+        self.output_file = output_file
+        self.size = size
+        self.fps = fps
+        self.codec = codec
+        self.profile = get_profile(profile)
+        self.frames_written = 0
+        self.bytes_written = 0
+        self._time = 0.0
+        self._next_pts = 0
+        self._writer = None
+        self._last_data = None
+        self._closing_frame = False
+
+    def _pixel_format(self):
+        """Output pixel format; yuv420p needs even dimensions"""
+        if self.profile.pix_fmt:
+            return self.profile.pix_fmt
+        width, height = self.size
+        if width % 2 == 0 and height % 2 == 0:
+            return 'yuv420p'
+        # Same choice libx264 makes for RGB input when no format is given
+        return 'yuv444p'
+
+    def _output_params(self):
+        """Encoder options of the profile"""
+        if self.codec == VP9_CODEC:
+            params = self.profile.vp9_params()
+        else:
+            params = ['-preset', self.profile.preset] + self.profile.codec_params()
+        if self.profile.threads:
+            params += ['-threads', str(self.profile.threads)]
+        return params
+
+    def _command(self):
+        """ffmpeg command line reading timestamped frames from stdin"""
+        if isinstance(self.output_file, (str, os.PathLike)):
+            container, target = [], [os.fspath(self.output_file)]
+        elif self.codec == VP9_CODEC:
+            container, target = ['-f', 'webm'], ['pipe:1']
+        else:
+            container, target = ['-f', 'mp4', '-movflags', STREAM_MOVFLAGS], ['pipe:1']
+        return ([imageio_ffmpeg.get_ffmpeg_exe(), '-y', '-v', 'error', '-f', 'matroska', '-i', '-', '-an',
+                 '-vcodec', self.codec, '-pix_fmt', self._pixel_format()]
+                + self._output_params()
+                + timing_params(ffmpeg_version())
+                + container + target)
+
+    def open(self):
+        """Start the ffmpeg process"""
+        stream = None if isinstance(self.output_file, (str, os.PathLike)) else self.output_file
+        version = ffmpeg_version()
+        self._closing_frame = version is not None and version < LAST_FRAME_DURATION_VERSION
+        self._writer = _PipeWriter(self._command(), stream)
+        self._writer.send(_matroska_header(self.size))
+        return self
+
+    def write(self, frame, repeat=1, duration=None):
+        """
+        Send a frame to the encoder.
+
+        Args:
+            frame (numpy.ndarray or PIL.Image.Image): Frame to encode, as an RGB(A) array of
+                shape (height, width, channels) or an image; any alpha channel is dropped
+            repeat (int): Number of frame periods the frame is shown for
+            duration (float, optional): Display time in milliseconds; see write_data()
+        """
+        self.write_data(self.frame_data(frame), repeat, duration)
+
+    @staticmethod
+    def frame_data(frame):
+        """
+        Convert a frame to the raw RGB data sent to ffmpeg.
+
+        Args:
+            frame (numpy.ndarray or PIL.Image.Image): Frame as accepted by write()
+
+        Returns:
+            Buffer holding the packed RGB pixels
+        """
+        if isinstance(frame, np.ndarray):
+            return np.ascontiguousarray(frame[..., :3])
+        return frame.convert('RGB').tobytes()
+
+    def write_data(self, data, repeat=1, duration=None):
+        """
+        Send raw RGB data prepared by frame_data() to the encoder.
+
+        The frame is encoded once, whatever its display time. Timestamps are kept
+        as exact running totals and rounded to milliseconds, so rounding never
+        accumulates; every frame lasts at least one millisecond.
+
+        Args:
+            data: Packed RGB pixels of one frame
+            repeat (int): Number of frame periods (1 / fps) the frame is shown for,
+                used if no duration is given
+            duration (float, optional): Display time in milliseconds
+        """
+        if duration is None:
+            duration = repeat * TIMESTAMP_SCALE / self.fps
+        pts = max(round(self._time), self._next_pts)
+        self._time += float(duration)
+        self._next_pts = max(round(self._time), pts + 1)
+
+        length = self._send(data, pts, self._next_pts - pts)
+        if self._closing_frame:
+            # The pixels may be a view of a canvas the decoder reuses
+            self._last_data = bytes(memoryview(data).cast('B'))
+        self.frames_written += 1
+        self.bytes_written += length
+
+    def _send(self, data, pts, duration):
+        """Send one frame wrapped in Matroska; returns its length in bytes"""
+        length = len(memoryview(data).cast('B'))
+        before, after = _matroska_frame(length, pts, duration)
+        self._writer.send(before)
+        self._writer.send(data)
+        self._writer.send(after)
+        return length
+
+    def close(self):
+        """Flush the remaining frames and wait for ffmpeg to finish"""
+        if self._writer is None:
+            return
+        try:
+            if self._last_data is not None:
+                self._send(self._last_data, self._next_pts, 1)
+        finally:
+            writer, self._writer, self._last_data = self._writer, None, None
+            writer.close()
+
+    def abort(self):
+        """Stop ffmpeg and remove the incomplete output file"""
+        try:
+            self.close()
+        except (RuntimeError, OSError):
+            pass  # ffmpeg already failed; that error is being reported
+        if isinstance(self.output_file, (str, os.PathLike)) and os.path.exists(self.output_file):
+            os.remove(self.output_file)
+
+    @classmethod
+    def still(cls, output_file, size, duration, **kwargs):
+        """
+        Create an encoder for a video showing one frame for the given time.
+
+        The frame is encoded once and lasts the whole video, instead of being
+        repeated fps * duration times.
+
+        Args:
+            output_file (str): Path to the output video file
+            size (tuple): (width, height) of the frame
+            duration (float): Length of the video in seconds
+            **kwargs: Further FFmpegEncoder arguments
+
+        Returns:
+            FFmpegEncoder: Encoder to write the single frame to
+        """
+        fps = 1 / Fraction(duration).limit_denominator(1000)
+        return cls(output_file, size, fps, **kwargs)
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
@@ -0,0 +1,237 @@
+"""
+Batch Journal Module
+Records the state of every file of a batch so an interrupted batch can be resumed
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+
+from main.core.cache import file_digest
+
+# States of a file in the journal
+STATE_PENDING = 'pending'   # Not converted yet
+STATE_RUNNING = 'running'   # Being converted; a crash leaves files in this state
+STATE_DONE = 'done'         # Converted; the outputs are complete
+STATE_FAILED = 'failed'     # The conversion failed
+STATES = (STATE_PENDING, STATE_RUNNING, STATE_DONE, STATE_FAILED)
+
+# Directory of the journals kept by the GUI, one per batch, away from the user's folders
+JOURNAL_DIR = os.path.join(tempfile.gettempdir(), 'webp2mp4-journals')
+
+# Seconds after which the journal of a batch that was never resumed is deleted
+JOURNAL_MAX_AGE = 7 * 24 * 3600
+
+
+def batch_journal_path(files, output_dir=None, directory=None):
+    """
+    Path of the journal of a batch, outside the input and output folders.
+
+    The name is a hash of the input files and the output directory, so selecting the
+    same files again after a crash finds the journal of the interrupted batch.
+    Journals older than JOURNAL_MAX_AGE, left by batches never resumed, are deleted.
+
+    Args:
+        files (list): Input files of the batch, in any order
+        output_dir (str, optional): Output directory of the batch
+        directory (str, optional): Directory of the journals. Defaults to JOURNAL_DIR.
+
+    Returns:
+        str: Path of the journal file; the directory is created if needed
+    """
+    directory = directory or JOURNAL_DIR
+    os.makedirs(directory, exist_ok=True)
+    now = time.time()
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if now - os.path.getmtime(path) > JOURNAL_MAX_AGE:
+                os.remove(path)
+        except OSError:
+            pass  # Removed by another instance
+
+    key = json.dumps([sorted(os.path.abspath(f) for f in files),
+                      os.path.abspath(output_dir) if output_dir else None])
+    return os.path.join(directory, hashlib.sha256(key.encode('utf-8')).hexdigest()[:32] + '.jsonl')
+
+
+class BatchJournal:
+    """
+    Append-only record of the state of each file in a batch.
+
+    Every state change is appended to the journal as one JSON line and synced
+    to disk, so the journal survives a crash of the application or the host at
+    any point, and a change costs the same however many files the batch has. The
+    last record of a file wins; a line torn by a crash is ignored. The journal is
+    compacted to one record per file when it is opened.
+
+    A file counts as completed when its last record is 'done', the input still
+    has the modification time and size recorded then, and every output still
+    has its recorded size, which only costs a stat per file. The SHA-256
+    checksum of each output is recorded as well and checked by
+    completed(verify=True).
+
+    The first line holds the conversion settings. When a journal is opened
+    with different settings, its records are discarded and the batch starts over.
+    """
+
+    def __init__(self, path, settings=None):
+        """
+        Open or create a journal
+
+        Args:
+            path (str): Path of the journal file
+            settings (dict, optional): JSON-serializable conversion settings of the batch
+        """
+        self.path = path
+        # Round-trip so the settings compare equal to the ones read back from the file
+        self.settings = json.loads(json.dumps(settings or {}, sort_keys=True))
+        self.records = {}
+        self._file = None
+        self._load()
+
+    def _load(self):
+        """Read the records of a previous run and compact the journal"""
+        settings = None
+        records = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Torn by a crash while being written
+                    if 'settings' in entry:
+                        settings = entry['settings']
+                    elif entry.get('input'):
+                        records[entry['input']] = entry
+        except OSError:
+            pass
+        self.records = records if settings == self.settings else {}
+
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'settings': self.settings}, sort_keys=True) + '\n')
+            for record in self.records.values():
+                f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _append(self, records):
+        """Add records to the journal and sync them to disk"""
+        for record in records:
+            self.records[record['input']] = record
+            self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    @staticmethod
+    def _record(input_file, state, **fields):
+        """A journal record for a file"""
+        record = {'input': input_file, 'state': state, 'time': time.time()}
+        record.update(fields)
+        return record
+
+    def state(self, input_file):
+        """
+        Last recorded state of a file
+
+        Returns:
+            str: One of STATES, or None if the file is not in the journal
+        """
+        record = self.records.get(input_file)
+        return record['state'] if record else None
+
+    def completed(self, input_file, output_file, verify=False):
+        """
+        Whether a file was converted to output_file and nothing changed since.
+
+        Args:
+            input_file (str): Path to the input WebP file
+            output_file (str): Path of the main output the file would be converted to
+            verify (bool): Also compare the checksums of the outputs, which reads them
+
+        Returns:
+            bool: True if the file does not need to be converted again
+        """
+        record = self.records.get(input_file)
+        if record is None or record['state'] != STATE_DONE or record.get('output') != output_file:
+            return False
+        try:
+            st = os.stat(input_file)
+            if [st.st_mtime_ns, st.st_size] != [record['input_mtime'], record['input_size']]:
+                return False
+            for path, output in record['outputs'].items():
+                if os.path.getsize(path) != output['size']:
+                    return False
+                if verify and file_digest(path) != output['sha256']:
+                    return False
+        except OSError:
+            return False
+        return True
+
+    def mark_pending(self, input_files):
+        """Record files as waiting to be converted"""
+        self._append([self._record(input_file, STATE_PENDING) for input_file in input_files])
+
+    def mark_running(self, input_file):
+        """Record that a file is being converted"""
+        self._append([self._record(input_file, STATE_RUNNING)])
+
+    def mark_done(self, result):
+        """
+        Record a converted file with the size and checksum of its outputs.
+
+        Args:
+            result (FileResult): Successful result of the file
+        """
+        paths = list(result.outputs.values()) if result.outputs else [result.output_file]
+        st = os.stat(result.input_file)
+        outputs = {path: {'size': os.path.getsize(path), 'sha256': file_digest(path)} for path in paths}
+        self._append([self._record(result.input_file, STATE_DONE, output=result.output_file, outputs=outputs,
+                                   input_mtime=st.st_mtime_ns, input_size=st.st_size)])
+
+    def mark_failed(self, result):
+        """
+        Record a file whose conversion failed.
+
+        Args:
+            result (FileResult): Failed result of the file
+        """
+        self._append([self._record(result.input_file, STATE_FAILED, output=result.output_file,
+                                   error=result.error)])
+
+    def counts(self):
+        """
+        Number of files in each state
+
+        Returns:
+            dict: state -> number of files
+        """
+        counts = dict.fromkeys(STATES, 0)
+        for record in self.records.values():
+            counts[record['state']] += 1
+        return counts
+
+    def close(self):
+        """Close the journal file"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """Close and delete the journal, e.g. once the whole batch has been converted"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
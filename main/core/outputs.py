@@ -0,0 +1,214 @@
+"""
+Output Targets Module
+Writers for the files created from one decoded frame stream: videos, a poster and a thumbnail strip
+"""
+
+import os
+from collections import namedtuple
+from PIL import Image
+
+from main.core.encoder import FFmpegEncoder, DEFAULT_CODEC, VP9_CODEC
+
+# Kinds of output
+OUTPUT_MP4 = 'mp4'                # H.264 video
+OUTPUT_WEBM = 'webm'              # VP9 video
+OUTPUT_POSTER = 'poster'          # JPEG of the first frame
+OUTPUT_THUMBNAILS = 'thumbnails'  # JPEG of evenly spaced frames side by side
+OUTPUT_KINDS = (OUTPUT_MP4, OUTPUT_WEBM, OUTPUT_POSTER, OUTPUT_THUMBNAILS)
+
+# Appended to the base name of the MP4 output to name the other outputs
+OUTPUT_SUFFIXES = {
+    OUTPUT_MP4: '.mp4',
+    OUTPUT_WEBM: '.webm',
+    OUTPUT_POSTER: '.jpg',
+    OUTPUT_THUMBNAILS: '-thumbnails.jpg',
+}
+
+# Thumbnail strip layout
+DEFAULT_THUMBNAIL_COUNT = 10
+DEFAULT_THUMBNAIL_HEIGHT = 96
+
+# Quality of the JPEG outputs
+JPEG_QUALITY = 90
+
+
+class OutputTarget(namedtuple('OutputTarget', ['kind', 'path'])):
+    """
+    A file to create from the decoded frames
+
+    Fields:
+        kind  -- one of OUTPUT_KINDS
+        path  -- path of the file
+    """
+    __slots__ = ()
+
+
+def output_targets(outputs, output_file):
+    """
+    Resolve a list of outputs to targets.
+
+    Args:
+        outputs (list): Output kinds or OutputTarget objects. A kind is written next to
+            output_file and named after it; the MP4 output is output_file itself.
+        output_file (str): Path of the MP4 output
+
+    Returns:
+        list: OutputTarget for every output, in the given order
+
+    Raises:
+        ValueError: If there are no outputs, a kind is unknown or two outputs share a path
+    """
+    base = os.path.splitext(output_file)[0]
+    targets = []
+    for output in outputs:
+        if not isinstance(output, OutputTarget):
+            if output not in OUTPUT_KINDS:
+                raise ValueError(f"Unknown output: {output}")
+            path = output_file if output == OUTPUT_MP4 else base + OUTPUT_SUFFIXES[output]
+            output = OutputTarget(output, path)
+        elif output.kind not in OUTPUT_KINDS:
+            raise ValueError(f"Unknown output: {output.kind}")
+        targets.append(output)
+
+    if not targets:
+        raise ValueError("No outputs given")
+    paths = [os.path.abspath(target.path) for target in targets]
+    if len(set(paths)) != len(paths):
+        raise ValueError("Two outputs have the same path")
+    return targets
+
+
+class VideoOutput:
+    """Encodes the frames to an MP4 (H.264) or WebM (VP9) video"""
+
+    def __init__(self, target, profile=None):
+        self.target = target
+        self.profile = profile
+        self.encoder = None
+        self.fps = None
+        self._still = False
+
+    def open(self, size, fps, frame_count, still_duration=None):
+        """
+        Start the encoder
+
+        Args:
+            size (tuple): (width, height) of the frames
+            fps (float): Frames per second of an animation
+            frame_count (int): Number of frames in the file
+            still_duration (float, optional): Length in seconds of a video made from a static
+                image; if given, fps is ignored and the single frame is encoded once
+        """
+        codec = VP9_CODEC if self.target.kind == OUTPUT_WEBM else DEFAULT_CODEC
+        if still_duration is None:
+            self.encoder = FFmpegEncoder(self.target.path, size, fps, codec=codec, profile=self.profile)
+        else:
+            self.encoder = FFmpegEncoder.still(self.target.path, size, still_duration, codec=codec,
+                                               profile=self.profile)
+        self.fps = float(self.encoder.fps)
+        self._still = still_duration is not None
+        self.encoder.open()
+
+    def write(self, frame):
+        """Encode a frame whose pixels were prepared by the colour stage, for its own duration"""
+        self.encoder.write_data(frame.pixels, frame.repeat, None if self._still else frame.duration)
+
+    def close(self):
+        """Wait for the encoder to finish the video"""
+        self.encoder.close()
+
+    def abort(self):
+        """Stop the encoder and remove the incomplete video"""
+        if self.encoder is not None:
+            self.encoder.abort()
+
+
+class ImageOutput:
+    """Base class for the JPEG outputs, which are saved when the stream ends"""
+
+    def __init__(self, target):
+        self.target = target
+        self.fps = None
+        self._image = None
+
+    def close(self):
+        """Save the image"""
+        if self._image is not None:
+            self._image.save(self.target.path, 'JPEG', quality=JPEG_QUALITY)
+
+    def abort(self):
+        """Remove the image if it was already saved"""
+        if os.path.exists(self.target.path):
+            os.remove(self.target.path)
+
+
+class PosterOutput(ImageOutput):
+    """Saves the first frame as a JPEG image"""
+
+    def open(self, size, fps, frame_count, still_duration=None):
+        """Prepare for a new frame stream; see VideoOutput.open()"""
+        self._image = None
+
+    def write(self, frame):
+        """Keep the first frame"""
+        if self._image is None:
+            self._image = Image.fromarray(frame.pixels)
+
+
+class ThumbnailStripOutput(ImageOutput):
+    """Saves evenly spaced frames, scaled down and side by side, as one JPEG image"""
+
+    def __init__(self, target, count=DEFAULT_THUMBNAIL_COUNT, height=DEFAULT_THUMBNAIL_HEIGHT):
+        super().__init__(target)
+        self.count = count
+        self.height = height
+        self._picks = []
+        self._taken = 0
+        self._thumbnail_size = None
+
+    def open(self, size, fps, frame_count, still_duration=None):
+        """Choose the frames to show; see VideoOutput.open()"""
+        count = max(1, min(self.count, frame_count))
+        # The middle frame of each of count equal parts of the animation
+        self._picks = [(2 * i + 1) * frame_count // (2 * count) for i in range(count)]
+        self._taken = 0
+        width, height = size
+        height_out = min(self.height, height)
+        self._thumbnail_size = (max(1, round(width * height_out / height)), height_out)
+        self._image = None
+
+    def write(self, frame):
+        """Add the frame to the strip if it stands for one of the chosen frames"""
+        thumbnail = None
+        while self._taken < len(self._picks) and self._picks[self._taken] < frame.index + frame.repeat:
+            if thumbnail is None:
+                thumbnail = Image.fromarray(frame.pixels).resize(self._thumbnail_size, Image.LANCZOS)
+            if self._image is None:
+                width, height = self._thumbnail_size
+                self._image = Image.new('RGB', (width * len(self._picks), height))
+            self._image.paste(thumbnail, (self._taken * self._thumbnail_size[0], 0))
+            self._taken += 1
+
+    def close(self):
+        """Save the strip, cut to the frames actually decoded"""
+        if self._image is not None and self._taken < len(self._picks):
+            self._image = self._image.crop((0, 0, self._taken * self._thumbnail_size[0], self._image.height))
+        super().close()
+
+
+def create_output(target, profile=None):
+    """
+    Create the writer for an output target.
+
+    Args:
+        target (OutputTarget): The output
+        profile (str or EncodingProfile, optional): Encoding profile of the videos
+
+    Returns:
+        Writer with open(), write(frame), close() and abort() methods
+    """
+    if target.kind in (OUTPUT_MP4, OUTPUT_WEBM):
+        return VideoOutput(target, profile)
+    if target.kind == OUTPUT_POSTER:
+        return PosterOutput(target)
+    return ThumbnailStripOutput(target)
@@ -0,0 +1,176 @@
+"""
+Frame Pipeline Module
+Hands decoded frames to the encoder through a bounded queue
+"""
+
+import time
+import queue
+import threading
+
+# Frames held between the decoder and the encoder when none is given
+DEFAULT_BUFFER_FRAMES = 8
+
+# Marks the end of the frame stream in the queue
+_END = object()
+
+
+class FrameQueue:
+    """
+    Runs a frame generator in a background thread and hands its frames over
+    through a bounded queue.
+
+    The producer blocks while the queue is full, so no more than max_frames
+    frames wait for the consumer, however long the animation is. Items must
+    not share memory with later items (unique_frames() copies each frame).
+
+    Iterating yields the items in order. An exception raised by the generator
+    is re-raised in the consumer after the items produced before it.
+
+    Decoding and compositing release the GIL for most of their work, as does
+    writing to the ffmpeg pipe, so the producer and the consumer run in parallel
+    and a conversion takes about as long as the slower of the two.
+    """
+
+    def __init__(self, frames, max_frames=DEFAULT_BUFFER_FRAMES, prepare=None):
+        """
+        Initialize the queue
+
+        Args:
+            frames (iterable): Frames to hand over, usually WebPDecoder.unique_frames()
+            max_frames (int): Maximum number of frames waiting in the queue
+            prepare (callable, optional): Applied to each frame in the producer thread,
+                e.g. to convert it to the encoder's input format; its result is queued
+        """
+        if max_frames < 1:
+            raise ValueError("The frame buffer must hold at least one frame")
+        self.frames = frames
+        self.max_frames = max_frames
+        self.prepare = prepare
+        self.busy_time = 0.0
+        self._queue = queue.Queue(maxsize=max_frames)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._error = None
+
+    def _put(self, item):
+        """Queue an item, giving up if the consumer stopped; returns False in that case"""
+        while not self._stop_event.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        """Producer thread: move the frames into the queue, timing the work spent on them"""
+        try:
+            frames = iter(self.frames)
+            while True:
+                start = time.perf_counter()
+                frame = next(frames, _END)
+                if frame is not _END and self.prepare is not None:
+                    frame = self.prepare(frame)
+                self.busy_time += time.perf_counter() - start
+                if frame is _END or not self._put(frame):
+                    break
+        except Exception as e:
+            self._error = e
+        self._put(_END)
+
+    def __iter__(self):
+        self._thread = threading.Thread(target=self._produce, name='webp-decoder', daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _END:
+                    break
+                yield item
+            if self._error is not None:
+                raise self._error
+        finally:
+            self.close()
+
+    def close(self):
+        """Stop the producer and release the queued frames"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+
+class FrameFanOut:
+    """
+    Hands every item to several consumers, each running in its own thread
+    with its own bounded queue.
+
+    Consumers work concurrently, so the slowest one sets the pace and the
+    others never wait for each other beyond their queue size. Items are shared
+    between the consumers and must not be modified by them.
+
+    An exception raised by a consumer stops it; it is re-raised by the next
+    put() or by close().
+    """
+
+    def __init__(self, consumers, max_frames=DEFAULT_BUFFER_FRAMES):
+        """
+        Initialize the fan-out
+
+        Args:
+            consumers (list): Callables, each called with every item in order
+            max_frames (int): Maximum number of items waiting for each consumer
+        """
+        if max_frames < 1:
+            raise ValueError("The frame buffer must hold at least one frame")
+        self.consumers = list(consumers)
+        self.busy_times = [0.0] * len(self.consumers)
+        self._queues = [queue.Queue(maxsize=max_frames) for _ in self.consumers]
+        self._errors = [None] * len(self.consumers)
+        self._threads = [
+            threading.Thread(target=self._consume, args=(i,), name=f'output-{i}', daemon=True)
+            for i in range(len(self.consumers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _consume(self, i):
+        """Consumer thread: pass the items of queue i to consumer i, timing its work"""
+        consumer = self.consumers[i]
+        while True:
+            item = self._queues[i].get()
+            if item is _END:
+                break
+            if self._errors[i] is not None:
+                continue  # Keep draining so put() never blocks on a failed consumer
+            start = time.perf_counter()
+            try:
+                consumer(item)
+            except Exception as e:
+                self._errors[i] = e
+            self.busy_times[i] += time.perf_counter() - start
+
+    def _raise_error(self):
+        """Re-raise the first consumer error, if any"""
+        for error in self._errors:
+            if error is not None:
+                raise error
+
+    def put(self, item):
+        """Queue an item for every consumer, blocking while a queue is full"""
+        self._raise_error()
+        for q in self._queues:
+            q.put(item)
+
+    def close(self):
+        """Wait for the consumers to process all queued items and re-raise any error"""
+        for q in self._queues:
+            q.put(_END)
+        for thread in self._threads:
+            thread.join()
+        self._raise_error()
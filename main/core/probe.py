@@ -0,0 +1,264 @@
+"""
+WebP Header Probe Module
+Reads frame metadata from the RIFF container without decoding any pixels
+"""
+
+import io
+import struct
+from collections import namedtuple
+
+# Size of the fields at the start of an ANMF chunk: offsets, frame size, duration and flags
+ANMF_HEADER_SIZE = 16
+
+# VP8X feature flags
+VP8X_ALPHA = 0x10
+VP8X_ANIMATION = 0x02
+
+# ANMF flags
+ANMF_NO_BLEND = 0x02
+ANMF_DISPOSE = 0x01
+
+# Signature byte of a lossless bitstream
+VP8L_SIGNATURE = 0x2f
+
+
+class FrameInfo(namedtuple('FrameInfo', ['x', 'y', 'width', 'height', 'duration', 'blend', 'dispose',
+                                         'has_alpha'])):
+    """
+    Header information about one frame
+
+    Fields:
+        x, y           -- position of the frame on the canvas
+        width, height  -- size of the frame
+        duration       -- display time in milliseconds (0 for a still image)
+        blend          -- True if the frame is alpha-blended over the canvas, False if it replaces it
+        dispose        -- True if the frame's area is cleared before the next frame is drawn
+        has_alpha      -- True if the frame carries an alpha channel
+    """
+    __slots__ = ()
+
+    @property
+    def region(self):
+        """(x0, y0, x1, y1) box covered by the frame"""
+        return (self.x, self.y, self.x + self.width, self.y + self.height)
+
+
+class WebPInfo(namedtuple('WebPInfo', ['width', 'height', 'is_animated', 'has_alpha', 'loop_count',
+                                       'background', 'frames'])):
+    """
+    Header information about a WebP file
+
+    Fields:
+        width, height  -- canvas size
+        is_animated    -- True for an animation
+        has_alpha      -- True if any frame carries an alpha channel
+        loop_count     -- number of loops of an animation (0 means forever), None for a still image
+        background     -- background colour (B, G, R, A) of an animation, None for a still image
+        frames         -- FrameInfo for every frame
+    """
+    __slots__ = ()
+
+    @property
+    def size(self):
+        """(width, height) of the canvas"""
+        return (self.width, self.height)
+
+    @property
+    def frame_count(self):
+        """Number of frames"""
+        return len(self.frames)
+
+    @property
+    def durations(self):
+        """Frame durations in milliseconds"""
+        return [frame.duration for frame in self.frames]
+
+    @property
+    def partial(self):
+        """True if any frame updates only part of the canvas"""
+        canvas = (0, 0, self.width, self.height)
+        return any(frame.region != canvas for frame in self.frames)
+
+    @property
+    def pixel_count(self):
+        """Canvas pixels composited over the whole animation, a measure of its decoding cost"""
+        return self.width * self.height * len(self.frames)
+
+
+def _uint24(data, offset):
+    """Little-endian 24-bit integer"""
+    return data[offset] | data[offset + 1] << 8 | data[offset + 2] << 16
+
+
+def _chunks(f, start, end):
+    """
+    Iterate over the chunks between two file offsets.
+
+    Only the chunk headers are read; the caller may read from the start of the
+    payload, and the file is positioned at the next chunk before it is yielded.
+
+    Yields:
+        tuple: (fourcc, payload size, payload offset)
+    """
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            break  # Truncated file
+        fourcc = chunk[:4]
+        size = struct.unpack('<I', chunk[4:])[0]
+        yield fourcc, size, offset + 8
+        # Payloads are padded to an even size
+        offset += 8 + size + (size & 1)
+
+
+def _read(f, offset, size):
+    """Read exactly size bytes at offset"""
+    f.seek(offset)
+    data = f.read(size)
+    if len(data) < size:
+        raise ValueError("Truncated WebP file")
+    return data
+
+
+def _bitstream_info(f, fourcc, payload, size):
+    """
+    Frame size and alpha flag of a VP8 or VP8L bitstream.
+
+    Returns:
+        tuple: (width, height, has_alpha)
+    """
+    if fourcc == b'VP8 ':
+        data = _read(f, payload, 10)
+        if data[3:6] != b'\x9d\x01\x2a':
+            raise ValueError("Invalid VP8 bitstream")
+        width, height = struct.unpack('<HH', data[6:10])
+        return width & 0x3fff, height & 0x3fff, False
+    data = _read(f, payload, 5)
+    if data[0] != VP8L_SIGNATURE:
+        raise ValueError("Invalid VP8L bitstream")
+    bits = struct.unpack('<I', data[1:5])[0]
+    return (bits & 0x3fff) + 1, (bits >> 14 & 0x3fff) + 1, bool(bits >> 28 & 1)
+
+
+def _frame_alpha(f, start, end):
+    """Whether the image data of an ANMF chunk has an alpha channel"""
+    for fourcc, size, payload in _chunks(f, start, end):
+        if fourcc == b'ALPH':
+            return True
+        if fourcc == b'VP8L':
+            return _bitstream_info(f, fourcc, payload, size)[2]
+        if fourcc == b'VP8 ':
+            return False
+    return False
+
+
+def open_source(source):
+    """
+    Open a WebP file for reading.
+
+    Args:
+        source (str or bytes): Path to the file, or its content
+
+    Returns:
+        Binary file object
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return open(source, 'rb')
+
+
+def probe(path):
+    """
+    Read canvas, animation and frame information from the headers of a WebP file.
+
+    Only chunk headers and the first bytes of each bitstream are read, so this is
+    fast regardless of the size of the image or the number of frames.
+
+    Args:
+        path (str or bytes): Path to the WebP file, or its content
+
+    Returns:
+        WebPInfo: Information about the file
+
+    Raises:
+        ValueError: If the file is not a WebP file or its headers are invalid
+        OSError: If the file cannot be read
+    """
+    with open_source(path) as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WEBP':
+            raise ValueError("Not a WebP file")
+        riff_end = 8 + struct.unpack('<I', header[4:8])[0]
+
+        canvas = None
+        flags = 0
+        loop_count = None
+        background = None
+        frames = []
+
+        for fourcc, size, payload in _chunks(f, 12, riff_end):
+            if fourcc == b'VP8X':
+                data = _read(f, payload, 10)
+                flags = data[0]
+                canvas = (_uint24(data, 4) + 1, _uint24(data, 7) + 1)
+            elif fourcc == b'ANIM':
+                data = _read(f, payload, 6)
+                background = tuple(data[:4])
+                loop_count = struct.unpack('<H', data[4:6])[0]
+            elif fourcc == b'ANMF':
+                if size < ANMF_HEADER_SIZE:
+                    raise ValueError("Truncated ANMF chunk")
+                data = _read(f, payload, ANMF_HEADER_SIZE)
+                has_alpha = _frame_alpha(f, payload + ANMF_HEADER_SIZE, payload + size)
+                frames.append(FrameInfo(
+                    x=_uint24(data, 0) * 2,
+                    y=_uint24(data, 3) * 2,
+                    width=_uint24(data, 6) + 1,
+                    height=_uint24(data, 9) + 1,
+                    duration=_uint24(data, 12),
+                    blend=not data[15] & ANMF_NO_BLEND,
+                    dispose=bool(data[15] & ANMF_DISPOSE),
+                    has_alpha=has_alpha,
+                ))
+            elif fourcc in (b'VP8 ', b'VP8L') and not frames:
+                # Still image, simple or extended format
+                width, height, has_alpha = _bitstream_info(f, fourcc, payload, size)
+                if canvas is None:
+                    canvas = (width, height)
+                else:
+                    has_alpha = has_alpha or bool(flags & VP8X_ALPHA)
+                frames.append(FrameInfo(0, 0, width, height, 0, False, False, has_alpha))
+                break
+
+        if canvas is None or not frames:
+            raise ValueError("No image data in WebP file")
+
+        is_animated = bool(flags & VP8X_ANIMATION) and len(frames) > 1
+        return WebPInfo(
+            width=canvas[0],
+            height=canvas[1],
+            is_animated=is_animated,
+            has_alpha=any(frame.has_alpha for frame in frames),
+            loop_count=loop_count,
+            background=background,
+            frames=frames,
+        )
+
+
+def frame_durations(path):
+    """
+    Read the frame durations of an animated WebP file from its ANMF chunk headers.
+
+    Args:
+        path (str): Path to the WebP file
+
+    Returns:
+        list: Duration of each frame in milliseconds; empty for a still image
+
+    Raises:
+        ValueError: If the file is not a WebP file or its headers are invalid
+    """
+    info = probe(path)
+    return info.durations if info.is_animated else []
@@ -0,0 +1,124 @@
+"""
+Encoding Profiles Module
+Named x264 settings trading encoding speed against file size and quality
+"""
+
+from collections import namedtuple
+
+# Default length in seconds of the video created from a static image
+STATIC_DURATION = 3
+
+# Names of the built-in profiles
+PROFILE_FAST = 'fast'
+PROFILE_BALANCED = 'balanced'
+PROFILE_ARCHIVE = 'archive'
+
+# libvpx-vp9 speed (-cpu-used, 0 is slowest) closest to each x264 preset
+VP9_SPEEDS = {
+    'ultrafast': 5, 'superfast': 5, 'veryfast': 4, 'faster': 3, 'fast': 3,
+    'medium': 2, 'slow': 1, 'slower': 1, 'veryslow': 0,
+}
+
+# Added to the x264 CRF for a VP9 CRF of similar quality; VP9 uses a 0-63 scale
+VP9_CRF_OFFSET = 10
+
+
+class EncodingProfile(namedtuple('EncodingProfile', ['name', 'preset', 'crf', 'tune', 'threads', 'pix_fmt',
+                                                     'description'])):
+    """
+    A named set of x264 encoder settings
+
+    Fields:
+        name         -- profile name
+        preset       -- x264 preset (speed/compression trade-off)
+        crf          -- constant rate factor; lower is better quality and larger files
+        tune         -- x264 tuning, or None
+        threads      -- encoder threads per video, or None to let x264 decide
+        pix_fmt      -- output pixel format, or None for yuv420p (yuv444p for odd sizes)
+        description  -- one-line summary for user interfaces
+    """
+    __slots__ = ()
+
+    def codec_params(self):
+        """
+        ffmpeg options for the rate control and tuning of this profile.
+
+        The preset, threads and pixel format are passed separately, because
+        both encoders have dedicated arguments for them.
+
+        Returns:
+            list: ffmpeg command-line options
+        """
+        params = ['-crf', str(self.crf)]
+        if self.tune:
+            params += ['-tune', self.tune]
+        return params
+
+    def vp9_params(self):
+        """
+        ffmpeg options giving libvpx-vp9 about the speed and quality of this profile.
+
+        Returns:
+            list: ffmpeg command-line options (constant quality mode)
+        """
+        return [
+            '-crf', str(min(63, self.crf + VP9_CRF_OFFSET)), '-b:v', '0',
+            '-deadline', 'good', '-cpu-used', str(VP9_SPEEDS.get(self.preset, 2)),
+            '-row-mt', '1',
+        ]
+
+    def to_dict(self):
+        """Return the profile as a plain dictionary"""
+        return self._asdict()
+
+    def settings(self):
+        """The fields that affect the encoded video, without the name and description"""
+        return {
+            'preset': self.preset,
+            'crf': self.crf,
+            'tune': self.tune,
+            'threads': self.threads,
+            'pix_fmt': self.pix_fmt,
+        }
+
+
+PROFILES = {
+    # Highest throughput under load: one encoder thread per video, so a full worker
+    # pool keeps every core busy without thread contention
+    PROFILE_FAST: EncodingProfile(PROFILE_FAST, 'veryfast', 23, None, 1, None,
+                                  "Fastest encoding, larger files"),
+    # The settings used before profiles existed: x264 defaults with the medium preset
+    PROFILE_BALANCED: EncodingProfile(PROFILE_BALANCED, 'medium', 23, None, None, None,
+                                      "Good quality at moderate speed"),
+    # Smallest files at high quality, tuned for flat areas. Kept at yuv420p: many browsers and
+    # hardware decoders cannot play 4:4:4 H.264 (High 4:4:4 Predictive profile)
+    PROFILE_ARCHIVE: EncodingProfile(PROFILE_ARCHIVE, 'slow', 18, 'animation', None, None,
+                                     "Best quality, slow encoding"),
+}
+
+# Profile used when none is given
+DEFAULT_PROFILE = PROFILE_BALANCED
+
+
+def get_profile(profile=None):
+    """
+    Look up an encoding profile.
+
+    Args:
+        profile (str or EncodingProfile, optional): Profile name, or a custom profile which
+            is returned as is. Defaults to DEFAULT_PROFILE.
+
+    Returns:
+        EncodingProfile: The profile
+
+    Raises:
+        ValueError: If there is no profile with the given name
+    """
+    if profile is None:
+        profile = DEFAULT_PROFILE
+    if isinstance(profile, EncodingProfile):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Unknown encoding profile: {profile}")
@@ -0,0 +1,127 @@
+"""
+Progress Reporting Module
+Typed, rate-limited progress events for a single conversion
+"""
+
+import os
+import time
+from collections import namedtuple
+
+# Conversion stages reported in progress events
+STAGE_PROBE = 'probe'     # File header read, frame count known
+STAGE_DECODE = 'decode'   # Decoding frames before encoding starts
+STAGE_ENCODE = 'encode'   # Encoding frames (decoding alongside when the FPS is known)
+STAGE_DONE = 'done'       # Video written
+
+# Minimum time (seconds) between two events of the same stage
+DEFAULT_MIN_INTERVAL = 0.1
+
+
+class ProgressEvent(namedtuple('ProgressEvent', ['input_file', 'stage', 'frames_done', 'frames_total',
+                                                 'bytes_done', 'elapsed'])):
+    """
+    Progress of a single conversion
+
+    Fields:
+        input_file    -- path of the WebP file being converted, None for data held in memory
+        stage         -- one of the STAGE_* constants
+        frames_done   -- source frames processed in this stage
+        frames_total  -- number of frames in the file, known before decoding starts
+        bytes_done    -- raw frame data handed to the encoder so far
+        elapsed       -- seconds since the conversion started
+    """
+    __slots__ = ()
+
+    @property
+    def fraction(self):
+        """Completed fraction of the current stage, between 0 and 1"""
+        if self.stage == STAGE_DONE:
+            return 1.0
+        if not self.frames_total:
+            return 0.0
+        return min(1.0, self.frames_done / self.frames_total)
+
+    def describe(self):
+        """Human-readable status line for this event"""
+        name = os.path.basename(self.input_file) if self.input_file else "WebP data"
+        if self.stage == STAGE_PROBE:
+            return f"Reading {name}"
+        if self.stage == STAGE_DECODE:
+            return f"Decoding frame {self.frames_done} of {self.frames_total} from {name}"
+        if self.stage == STAGE_ENCODE:
+            return f"Encoding frame {self.frames_done} of {self.frames_total} from {name}"
+        return f"Video created successfully from {name}"
+
+
+class ProgressReporter:
+    """
+    Turns per-frame updates into a rate-limited stream of ProgressEvents.
+
+    Updates within min_interval of the last event are coalesced: only the latest
+    state is kept and reported with the next event. A stage change and finish()
+    are always reported, so the callback sees every stage and the final count.
+    """
+
+    def __init__(self, input_file, callback, frames_total=0, min_interval=DEFAULT_MIN_INTERVAL):
+        """
+        Initialize the reporter
+
+        Args:
+            input_file (str): Path of the WebP file being converted
+            callback (callable): Called with each ProgressEvent; None disables reporting
+            frames_total (int): Number of frames in the file, if already known
+            min_interval (float): Minimum time in seconds between two events of the same stage
+        """
+        self.input_file = input_file
+        self.callback = callback
+        self.frames_total = frames_total
+        self.min_interval = min_interval
+        self.stage = None
+        self.frames_done = 0
+        self.bytes_done = 0
+        self._start = time.monotonic()
+        self._last_emit = None
+
+    def update(self, stage, frames_done=None, bytes_done=None):
+        """
+        Record progress, emitting an event unless one was emitted very recently.
+
+        Args:
+            stage (str): Current stage
+            frames_done (int, optional): Source frames processed in this stage
+            bytes_done (int, optional): Raw frame data handed to the encoder so far
+        """
+        if self.callback is None:
+            return
+        if frames_done is not None:
+            self.frames_done = frames_done
+        if bytes_done is not None:
+            self.bytes_done = bytes_done
+
+        now = time.monotonic()
+        if stage != self.stage:
+            self.stage = stage
+        elif self._last_emit is not None and now - self._last_emit < self.min_interval:
+            return
+        self._emit(now)
+
+    def finish(self, frames_total=None):
+        """
+        Report the end of the conversion.
+
+        Args:
+            frames_total (int, optional): Final frame count, if it differs from the announced total
+        """
+        if self.callback is None:
+            return
+        if frames_total is not None:
+            self.frames_total = frames_total
+        self.stage = STAGE_DONE
+        self.frames_done = self.frames_total
+        self._emit(time.monotonic())
+
+    def _emit(self, now):
+        """Send the current state to the callback"""
+        self._last_emit = now
+        self.callback(ProgressEvent(self.input_file, self.stage, self.frames_done, self.frames_total,
+                                    self.bytes_done, now - self._start))
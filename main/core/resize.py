@@ -0,0 +1,140 @@
+"""
+Frame Resize Module
+Downscales composited frames right after decoding, so later stages work at the target size
+"""
+
+from collections import namedtuple
+import numpy as np
+from PIL import Image
+
+# Resampling filters by name
+RESAMPLE_FILTERS = {
+    'nearest': Image.NEAREST,
+    'box': Image.BOX,
+    'bilinear': Image.BILINEAR,
+    'hamming': Image.HAMMING,
+    'bicubic': Image.BICUBIC,
+    'lanczos': Image.LANCZOS,
+}
+
+# Filter used when none is given; sharpest of the filters for downscaling
+DEFAULT_RESAMPLE = 'lanczos'
+
+# Large reductions first shrink by an integer factor with Image.reduce(), then resample the
+# rest; at this gap the result cannot be told apart from resampling all the way
+REDUCING_GAP = 3.0
+
+
+def parse_max_size(value):
+    """
+    Parse a maximum frame size.
+
+    Args:
+        value (str, int or tuple): 'WIDTHxHEIGHT', a single number bounding both
+            dimensions, or a (width, height) tuple
+
+    Returns:
+        tuple: (width, height) of the box the frames must fit in
+
+    Raises:
+        ValueError: If the size cannot be parsed or is not positive
+    """
+    if isinstance(value, str):
+        parts = value.lower().split('x')
+        if len(parts) not in (1, 2):
+            raise ValueError(f"Invalid size: {value}")
+        value = [int(part) for part in parts]
+    elif isinstance(value, int):
+        value = [value]
+    size = tuple(value) * 2 if len(value) == 1 else tuple(value)
+    if len(size) != 2 or min(size) <= 0:
+        raise ValueError(f"Invalid size: {value}")
+    return size
+
+
+class Resize(namedtuple('Resize', ['max_size', 'scale', 'resample'])):
+    """
+    How decoded frames are downscaled
+
+    Fields:
+        max_size  -- (width, height) box the frames are fitted into keeping their aspect ratio, or None
+        scale     -- factor applied to the canvas size, between 0 and 1, or None
+        resample  -- name of the resampling filter, one of RESAMPLE_FILTERS
+
+    If both limits are given the smaller resulting size is used. Frames are
+    never enlarged, and resized frames get even dimensions, so the colour stage
+    does not have to pad them for yuv420p.
+    """
+    __slots__ = ()
+
+    def output_size(self, size):
+        """
+        Size of the frames produced for a canvas.
+
+        Args:
+            size (tuple): (width, height) of the canvas
+
+        Returns:
+            tuple: (width, height) of the resized frames; size itself if no downscaling is needed
+        """
+        width, height = size
+        factor = 1.0
+        if self.scale is not None:
+            factor = min(factor, self.scale)
+        if self.max_size is not None:
+            factor = min(factor, self.max_size[0] / width, self.max_size[1] / height)
+        if factor >= 1.0:
+            return tuple(size)
+        return tuple(max(2, int(length * factor) // 2 * 2) for length in size)
+
+    def apply(self, pixels):
+        """
+        Downscale one frame.
+
+        The colour of decoded frames is premultiplied by alpha, which is the form in
+        which resampling does not bleed the colour of transparent pixels into the edges.
+
+        Args:
+            pixels (numpy.ndarray): Premultiplied RGBA pixels, shape (height, width, 4), uint8
+
+        Returns:
+            numpy.ndarray: New array of the output size, or pixels itself if no resizing is needed
+        """
+        height, width = pixels.shape[:2]
+        size = self.output_size((width, height))
+        if size == (width, height):
+            return pixels
+        image = Image.frombuffer('RGBa', (width, height), np.ascontiguousarray(pixels), 'raw', 'RGBa', 0, 1)
+        resized = image.resize(size, RESAMPLE_FILTERS[self.resample], reducing_gap=REDUCING_GAP)
+        return np.asarray(resized)
+
+    def settings(self):
+        """The fields as JSON-serializable values, for cache keys and journals"""
+        return {
+            'max_size': list(self.max_size) if self.max_size is not None else None,
+            'scale': self.scale,
+            'resample': self.resample,
+        }
+
+
+def get_resize(resize=None):
+    """
+    Check a resize setting.
+
+    Args:
+        resize (Resize, optional): Downscaling to apply, or None to keep the canvas size
+
+    Returns:
+        Resize: The setting with max_size parsed, or None
+
+    Raises:
+        ValueError: If the scale, size or filter is invalid
+    """
+    if resize is None:
+        return None
+    if resize.resample not in RESAMPLE_FILTERS:
+        raise ValueError(f"Unknown resampling filter: {resize.resample}")
+    if resize.scale is not None and not 0 < resize.scale <= 1:
+        raise ValueError("The scale must be greater than 0 and at most 1")
+    max_size = parse_max_size(resize.max_size) if resize.max_size is not None else None
+    return resize._replace(max_size=max_size)
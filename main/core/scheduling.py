@@ -0,0 +1,123 @@
+"""
+Job Scheduling Module
+Estimates the cost of converting a file from its header and orders batch jobs by it
+"""
+
+from main.core.outputs import OUTPUT_MP4, OUTPUT_WEBM, OUTPUT_POSTER, OUTPUT_THUMBNAILS
+from main.core.probe import probe
+from main.core.profiles import get_profile, STATIC_DURATION
+
+# Scheduling policies
+SCHEDULE_INPUT = 'input'        # Convert the files in the given order
+SCHEDULE_LONGEST = 'longest'    # Most expensive first: shortest total time (makespan) on a pool
+SCHEDULE_SHORTEST = 'shortest'  # Cheapest first: lowest mean time until a file is done
+SCHEDULES = (SCHEDULE_INPUT, SCHEDULE_LONGEST, SCHEDULE_SHORTEST)
+
+# Encoding time of the x264 presets relative to medium
+PRESET_COST = {
+    'ultrafast': 0.3, 'superfast': 0.4, 'veryfast': 0.5, 'faster': 0.7, 'fast': 0.8,
+    'medium': 1.0, 'slow': 1.6, 'slower': 2.5, 'veryslow': 4.0,
+}
+
+# Cost of each kind of output relative to the MP4
+OUTPUT_COST = {
+    OUTPUT_MP4: 1.0,
+    OUTPUT_WEBM: 2.5,
+    OUTPUT_POSTER: 0.02,
+    OUTPUT_THUMBNAILS: 0.05,
+}
+
+# Fixed cost of a conversion (starting ffmpeg, opening the file), in the units of estimate_cost()
+FILE_OVERHEAD = 0.5
+
+# Encoding cost of each second of a video made from a still image, in encoded frames. The frame
+# is encoded once, so the length adds little, but longer videos are ranked after shorter ones.
+STILL_SECOND_COST = 0.1
+
+
+def estimate_cost(input_file, profile=None, outputs=None, resize=None, still_duration=STATIC_DURATION):
+    """
+    Estimate the cost of converting a file from its header.
+
+    The cost is the number of pixels decoded and encoded in megapixels: every
+    frame is decoded at the canvas size, and every frame is encoded at the size
+    left after resizing, weighted by the speed of the encoding preset and by the
+    outputs. A still image is encoded once, with a small extra cost per second
+    of still_duration. A fixed cost per file is added. Its unit is arbitrary;
+    fit_cost_scale() relates it to seconds.
+
+    Args:
+        input_file (str): Path to the WebP file
+        profile (str or EncodingProfile, optional): Encoding profile
+        outputs (list, optional): Output kinds or OutputTarget objects; defaults to an MP4
+        resize (Resize, optional): Downscaling applied to the decoded frames
+        still_duration (float, optional): Length in seconds of the video made from a still image
+
+    Returns:
+        float: Estimated cost; FILE_OVERHEAD if the header cannot be read
+    """
+    try:
+        info = probe(input_file)
+    except (OSError, ValueError):
+        return FILE_OVERHEAD
+    kinds = [getattr(output, 'kind', output) for output in outputs] if outputs else [OUTPUT_MP4]
+    weight = sum(OUTPUT_COST.get(kind, 1.0) for kind in kinds)
+    preset = PRESET_COST.get(get_profile(profile).preset, 1.0)
+    width, height = resize.output_size(info.size) if resize is not None else info.size
+    if info.is_animated:
+        encoded_frames = info.frame_count
+    else:
+        encoded_frames = 1 + STILL_SECOND_COST * still_duration
+    encoded_pixels = width * height * encoded_frames
+    return FILE_OVERHEAD + (info.pixel_count + encoded_pixels * preset * weight) / 1e6
+
+
+def schedule_order(costs, policy=SCHEDULE_INPUT):
+    """
+    Order in which to start jobs.
+
+    A pool starts the jobs in this order as workers become free, so with
+    SCHEDULE_LONGEST the large jobs are spread over the workers first and the
+    small ones fill the gaps at the end (longest processing time first).
+
+    Args:
+        costs (list): Estimated cost of every job
+        policy (str): One of SCHEDULES
+
+    Returns:
+        list: Job indexes in the order they should be started
+
+    Raises:
+        ValueError: If the policy is unknown
+    """
+    if policy not in SCHEDULES:
+        raise ValueError(f"Unknown scheduling policy: {policy}")
+    order = list(range(len(costs)))
+    if policy == SCHEDULE_LONGEST:
+        order.sort(key=lambda i: -costs[i])
+    elif policy == SCHEDULE_SHORTEST:
+        order.sort(key=lambda i: costs[i])
+    return order
+
+
+def fit_cost_scale(samples):
+    """
+    Fit the seconds per cost unit to measured conversions.
+
+    Args:
+        samples (list): (estimated cost, elapsed seconds) of converted files
+
+    Returns:
+        dict: seconds_per_unit fitted by least squares through the origin, the number of
+              samples and the mean relative error of the fitted estimates; None without samples
+    """
+    samples = [(cost, elapsed) for cost, elapsed in samples if cost and elapsed > 0]
+    if not samples:
+        return None
+    scale = sum(cost * elapsed for cost, elapsed in samples) / sum(cost * cost for cost, _ in samples)
+    error = sum(abs(scale * cost - elapsed) / elapsed for cost, elapsed in samples) / len(samples)
+    return {
+        'seconds_per_unit': scale,
+        'samples': len(samples),
+        'mean_relative_error': error,
+    }
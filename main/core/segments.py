@@ -0,0 +1,139 @@
+"""
+Segmented Encoding Module
+Splits one long animation into frame ranges that are encoded in parallel and joined losslessly
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import subprocess
+
+import imageio_ffmpeg
+
+from main.core.colour import get_colour_stage
+from main.core.decoder import WebPDecoder
+from main.core.encoder import FFmpegEncoder
+from main.core.pipeline import FrameQueue, DEFAULT_BUFFER_FRAMES
+from main.utils.resources import peak_rss
+
+# Animations with fewer frames per segment than this are not worth splitting
+DEFAULT_MIN_SEGMENT_FRAMES = 250
+
+
+def plan_segments(frame_count, segments, min_frames=DEFAULT_MIN_SEGMENT_FRAMES):
+    """
+    Split a frame range into segments of nearly equal length.
+
+    Args:
+        frame_count (int): Number of frames in the animation
+        segments (int): Maximum number of segments
+        min_frames (int): Minimum number of frames per segment
+
+    Returns:
+        list: (start, stop) frame ranges covering the whole animation; a single
+              range if the animation is too short to be split
+    """
+    count = max(1, min(segments, frame_count // max(1, min_frames)))
+    bounds = [frame_count * i // count for i in range(count + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def encode_segment(input_file, segment_file, start, stop, fps, profile=None, buffer_frames=DEFAULT_BUFFER_FRAMES,
+                   colour=None, resize=None, frame_duration=None):
+    """
+    Encode one frame range of an animation to its own video file.
+
+    The first frame of the range is the fully composited canvas, so the segment
+    does not depend on earlier frames. Runs inside a worker process, so it is a
+    module-level function and only returns picklable data.
+
+    Args:
+        input_file (str): Path to the input WebP file
+        segment_file (str): Path of the segment video to create
+        start (int): Index of the first frame
+        stop (int): Index after the last frame
+        fps (float): Frames per second of the whole video
+        profile (str or EncodingProfile, optional): Encoding profile
+        buffer_frames (int): Maximum number of decoded frames waiting for the encoder
+        colour (ColourStage, optional): Colour stage the frames pass through
+        resize (Resize, optional): Downscaling applied to every decoded frame
+        frame_duration (float, optional): Display time in milliseconds of every frame instead of
+            the durations in the file, for a frame rate given by the user
+
+    Returns:
+        dict: frame_count, dropped_frames, encoded_frames, decode_time, encode_time and peak_rss of the segment
+    """
+    decoder = WebPDecoder(input_file, resize, frame_duration)
+    decoder.probe()
+    colour = get_colour_stage(colour)
+    frames = FrameQueue(decoder.unique_frames(start, stop), buffer_frames, prepare=colour)
+    encode_time = 0.0
+    encoder = FFmpegEncoder(segment_file, colour.output_size(decoder.size), fps, profile=profile).open()
+    try:
+        for frame in frames:
+            begin = time.perf_counter()
+            encoder.write_data(frame.pixels, frame.repeat, frame.duration)
+            encode_time += time.perf_counter() - begin
+        begin = time.perf_counter()
+        encoder.close()
+        encode_time += time.perf_counter() - begin
+    except Exception:
+        encoder.abort()
+        raise
+
+    if decoder.frame_count != stop - start:
+        raise ValueError(f"Decoded {decoder.frame_count} frames instead of {stop - start} "
+                         f"for segment {start}-{stop}")
+    return {
+        'frame_count': decoder.frame_count,
+        'dropped_frames': decoder.dropped_frames,
+        'encoded_frames': encoder.frames_written,
+        'decode_time': frames.busy_time,
+        'encode_time': encode_time,
+        'peak_rss': peak_rss(),
+    }
+
+
+def concat_segments(segment_files, output_file):
+    """
+    Join segment videos into one file without re-encoding.
+
+    The segments must have been encoded with identical settings. Timestamps
+    continue across segments, so the result plays like a single encode.
+
+    Args:
+        segment_files (list): Segment videos in playback order
+        output_file (str): Path of the joined video
+
+    Raises:
+        RuntimeError: If ffmpeg fails
+    """
+    list_fd, list_file = tempfile.mkstemp(suffix='.txt', prefix='webp2mp4-concat-')
+    try:
+        with os.fdopen(list_fd, 'w', encoding='utf-8') as f:
+            for path in segment_files:
+                # Single quotes are escaped as '\'' in the concat list syntax
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        command = [
+            imageio_ffmpeg.get_ffmpeg_exe(), '-y', '-loglevel', 'error',
+            '-f', 'concat', '-safe', '0', '-i', list_file,
+            '-c', 'copy', '-movflags', '+faststart',
+            output_file,
+        ]
+        completed = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Joining segments failed: {completed.stderr.decode(errors='replace').strip()}")
+    finally:
+        os.remove(list_file)
+
+
+def segment_dir(output_file):
+    """Create a temporary directory for the segments of an output file, next to it"""
+    return tempfile.mkdtemp(prefix='.segments-', dir=os.path.dirname(os.path.abspath(output_file)))
+
+
+def remove_segment_dir(directory):
+    """Remove a segment directory and everything in it"""
+    shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,218 @@
+"""
+Folder Watcher Module
+Watches directories and converts new or changed WebP files as they appear
+"""
+
+import os
+import json
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from main.core.batch import BatchConverter, FileResult, convert_job, init_worker
+from main.core.cache import file_digest
+
+# Seconds between two scans of the watched directories
+DEFAULT_POLL_INTERVAL = 1.0
+
+# Seconds a file's size and modification time must stay unchanged before it is converted
+DEFAULT_SETTLE_TIME = 2.0
+
+# Name of the state file created in the first watched directory when none is given
+DEFAULT_STATE_FILE = '.webp2mp4-watch.json'
+
+
+class FolderWatcher:
+    """
+    Converts new and changed WebP files in one or more directories.
+
+    The directories are scanned recursively by polling, so no platform-specific
+    notification API is needed. Each converted file is recorded in a state file
+    with its modification time, size and content hash:
+
+    - a file whose modification time and size match its record costs one stat
+    - a file that was touched but whose hash still matches is not converted again
+    - a file still being written (size or modification time changing) is only
+      converted once it has been stable for settle_time seconds
+
+    Ready files are submitted to a process pool as soon as they are found, so the
+    workers are fed continuously while the watcher keeps scanning.
+    """
+
+    def __init__(self, directories, converter=None, state_file=None,
+                 poll_interval=DEFAULT_POLL_INTERVAL, settle_time=DEFAULT_SETTLE_TIME):
+        """
+        Initialize the watcher
+
+        Args:
+            directories (list): Directories to watch recursively
+            converter (BatchConverter, optional): Conversion settings (jobs, fps, output directory,
+                overwrite policy, cache, ...). Defaults to BatchConverter().
+            state_file (str, optional): Path of the state file. Defaults to a file in the first directory.
+            poll_interval (float): Seconds between two scans
+            settle_time (float): Seconds a file must stay unchanged before it is converted
+        """
+        self.directories = [os.path.abspath(d) for d in directories]
+        self.converter = converter or BatchConverter()
+        self.state_file = state_file or os.path.join(self.directories[0], DEFAULT_STATE_FILE)
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+
+        self.state = self._load_state()
+        self.converted = 0
+        self.failed = 0
+        self._candidates = {}   # path -> (mtime_ns, size, first time seen with this stat)
+        self._running = {}      # future -> (path, mtime_ns, size, digest)
+        self._stop_event = threading.Event()
+
+    def _load_state(self):
+        """Read the state file; a missing or unreadable file means nothing was converted yet"""
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        """Write the state file atomically"""
+        temp_path = self.state_file + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=1)
+        os.replace(temp_path, self.state_file)
+
+    def stop(self):
+        """Stop watching; conversions already running are finished"""
+        self._stop_event.set()
+
+    def _scan(self):
+        """
+        Find WebP files in the watched directories.
+
+        Returns:
+            dict: path -> (mtime_ns, size) for every WebP file found
+        """
+        found = {}
+        for directory in self.directories:
+            for root, dirs, names in os.walk(directory):
+                for name in names:
+                    if not name.lower().endswith('.webp'):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue  # Removed while scanning
+                    found[path] = (st.st_mtime_ns, st.st_size)
+        return found
+
+    def _ready_files(self, found, now):
+        """
+        Pick the files that need converting and have stopped changing.
+
+        Args:
+            found (dict): Result of _scan()
+            now (float): Current time
+
+        Returns:
+            list: (path, mtime_ns, size) of the files to convert
+        """
+        running = set(job[0] for job in self._running.values())
+        ready = []
+
+        for path, (mtime, size) in found.items():
+            record = self.state.get(path)
+            if path in running or (record and record['mtime'] == mtime and record['size'] == size):
+                self._candidates.pop(path, None)
+                continue
+
+            candidate = self._candidates.get(path)
+            if candidate is None or candidate[:2] != (mtime, size):
+                # New or still being written; wait for it to settle
+                self._candidates[path] = (mtime, size, now)
+                continue
+            if now - candidate[2] >= self.settle_time:
+                del self._candidates[path]
+                ready.append((path, mtime, size))
+
+        # Forget files that disappeared
+        for path in list(self._candidates):
+            if path not in found:
+                del self._candidates[path]
+        return ready
+
+    def _submit(self, executor, path, mtime, size, result_callback):
+        """Submit a settled file for conversion unless its content is unchanged"""
+        try:
+            digest = file_digest(path)
+        except OSError:
+            return  # Removed in the meantime
+
+        record = self.state.get(path)
+        if record and record.get('hash') == digest:
+            # Touched but not modified
+            record['mtime'], record['size'] = mtime, size
+            self._save_state()
+            return
+
+        if record is None:
+            # Never seen before; existing outputs are subject to the overwrite policy
+            result = self.converter.existing_output_result(path)
+            if result is not None:
+                self._finish(path, mtime, size, digest, result, result_callback)
+                return
+
+        future = executor.submit(convert_job, *self.converter.job_args(path))
+        self._running[future] = (path, mtime, size, digest)
+
+    def _finish(self, path, mtime, size, digest, result, result_callback):
+        """Record the outcome of a conversion in the state file"""
+        self.state[path] = {
+            'mtime': mtime,
+            'size': size,
+            'hash': digest,
+            'output': result.output_file,
+            'error': result.error,
+        }
+        self._save_state()
+
+        if result.success:
+            self.converted += 1
+        else:
+            self.failed += 1
+        if result_callback:
+            result_callback(result)
+
+    def _collect(self, result_callback):
+        """Record the conversions that have finished"""
+        for future in [f for f in self._running if f.done()]:
+            path, mtime, size, digest = self._running.pop(future)
+            if future.cancelled():
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process itself failed
+                result = FileResult(path, self.converter.output_path(path), False, error=str(e))
+            self._finish(path, mtime, size, digest, result, result_callback)
+
+    def run(self, result_callback=None):
+        """
+        Watch the directories until stop() is called.
+
+        Args:
+            result_callback (callable, optional): Called with the FileResult of every converted file
+        """
+        self._stop_event.clear()
+        with ProcessPoolExecutor(max_workers=self.converter.jobs, initializer=init_worker) as executor:
+            try:
+                while not self._stop_event.is_set():
+                    self._collect(result_callback)
+                    for path, mtime, size in self._ready_files(self._scan(), time.time()):
+                        self._submit(executor, path, mtime, size, result_callback)
+                    self._stop_event.wait(self.poll_interval)
+            finally:
+                # Drop queued conversions; running ones finish and are recorded
+                for future in self._running:
+                    future.cancel()
+                executor.shutdown(wait=True)
+                self._collect(result_callback)
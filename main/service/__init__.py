@@ -0,0 +1,3 @@
+"""
+Local HTTP service for the WebP to MP4 converter
+"""
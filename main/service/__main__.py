@@ -0,0 +1,10 @@
+"""
+Run the conversion service: python -m main.service
+"""
+
+import sys
+
+from main.service.server import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,592 @@
+"""
+Conversion Service Module
+Local asyncio HTTP service converting uploaded WebP files in a pool of worker processes
+
+Endpoints:
+    POST /jobs              Upload a WebP file (the request body) and queue its conversion;
+                            query parameters fps and profile. Returns the job status (202),
+                            or 503 with Retry-After when the queue is full.
+    POST /convert           Same, but waits for the conversion and returns the MP4 file
+    GET  /jobs/<id>         Status of a job: queued, running, done or failed
+    GET  /jobs/<id>/result  MP4 file of a finished job
+    GET  /health            Liveness, queue depth and jobs in flight
+    GET  /metrics           Counters and latency percentiles
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import argparse
+import tempfile
+from http import HTTPStatus
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+from main.core.batch import convert_job, default_jobs, init_worker
+from main.core.converter import PIPELINE_STREAM
+from main.core.pipeline import DEFAULT_BUFFER_FRAMES
+from main.core.profiles import PROFILES, STATIC_DURATION
+
+# Address the service listens on; only local clients can reach it
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Jobs waiting for a worker before new uploads are rejected
+DEFAULT_QUEUE_SIZE = 64
+
+# Largest accepted upload in bytes
+DEFAULT_MAX_UPLOAD = 64 * 1024 * 1024
+
+# Finished jobs whose status and video are kept; older ones are deleted
+DEFAULT_RETAINED_JOBS = 1000
+
+# Number of latest jobs the latency percentiles are computed over
+LATENCY_WINDOW = 1000
+
+# Seconds a client is asked to wait before retrying a rejected upload
+RETRY_AFTER = 1
+
+# Largest accepted request line or header line in bytes
+MAX_HEADER_LINE = 8192
+
+# Job states
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+class HTTPError(Exception):
+    """An error answered with an HTTP status code and a JSON message"""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class Job:
+    """
+    A conversion submitted to the service
+    """
+
+    def __init__(self, job_id, input_file, output_file, fps=None, profile=None):
+        """
+        Initialize the job
+
+        Args:
+            job_id (str): Identifier of the job
+            input_file (str): Path of the uploaded WebP file
+            output_file (str): Path of the MP4 file to create
+            fps (float, optional): Frames per second; detected from the file if None
+            profile (str, optional): Encoding profile name
+        """
+        self.id = job_id
+        self.input_file = input_file
+        self.output_file = output_file
+        self.fps = fps
+        self.profile = profile
+        self.status = JOB_QUEUED
+        self.error = None
+        self.result = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.done = asyncio.Event()
+
+    def to_dict(self):
+        """Return the job status as a plain dictionary"""
+        status = {
+            'id': self.id,
+            'status': self.status,
+            'error': self.error,
+            'submitted': self.submitted,
+            'started': self.started,
+            'finished': self.finished,
+        }
+        if self.result is not None and self.result.success:
+            status['frame_count'] = self.result.frame_count
+            status['encoded_frames'] = self.result.encoded_frames
+            status['elapsed'] = self.result.elapsed
+            status['result'] = f'/jobs/{self.id}/result'
+        return status
+
+
+def percentiles(values, fractions=(0.5, 0.9, 0.99)):
+    """
+    Nearest-rank percentiles of a list of values
+
+    Returns:
+        dict: 'p50', 'p90', ... -> value, or None for every percentile if there are no values
+    """
+    ordered = sorted(values)
+    result = {}
+    for fraction in fractions:
+        key = f'p{fraction * 100:g}'
+        if not ordered:
+            result[key] = None
+        else:
+            result[key] = ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+    return result
+
+
+class ConversionService:
+    """
+    Asyncio HTTP server that queues uploaded files and converts them in worker processes.
+
+    Uploads go into a bounded queue; when it is full the service answers 503
+    with Retry-After instead of buffering without limit, so clients feel the
+    backpressure. One dispatcher task per worker takes jobs from the queue and
+    runs them in a process pool, so a conversion never blocks the event loop.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, jobs=None, queue_size=DEFAULT_QUEUE_SIZE,
+                 max_upload=DEFAULT_MAX_UPLOAD, work_dir=None, retained_jobs=DEFAULT_RETAINED_JOBS,
+                 still_duration=STATIC_DURATION, buffer_frames=DEFAULT_BUFFER_FRAMES):
+        """
+        Initialize the service
+
+        Args:
+            host (str): Address to listen on
+            port (int): Port to listen on; 0 picks a free port, see the port attribute after start()
+            jobs (int, optional): Number of worker processes. Defaults to the CPU count.
+            queue_size (int): Jobs waiting for a worker before uploads are rejected
+            max_upload (int): Largest accepted upload in bytes
+            work_dir (str, optional): Directory for uploads and videos. Defaults to a temporary
+                directory that is removed when the service stops.
+            retained_jobs (int): Finished jobs whose status and video are kept
+            still_duration (float): Length in seconds of videos made from static images
+            buffer_frames (int): Maximum number of decoded frames a conversion keeps waiting for its encoder
+        """
+        self.host = host
+        self.port = port
+        self.jobs = max(1, jobs or default_jobs())
+        self.queue_size = queue_size
+        self.max_upload = max_upload
+        self.work_dir = work_dir
+        self.retained_jobs = retained_jobs
+        self.still_duration = still_duration
+        self.buffer_frames = buffer_frames
+
+        self.job_table = OrderedDict()
+        self.in_flight = 0
+        self.counters = {'submitted': 0, 'rejected': 0, 'done': 0, 'failed': 0}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)     # Submission to finish
+        self.wait_times = deque(maxlen=LATENCY_WINDOW)    # Submission to start
+        self.run_times = deque(maxlen=LATENCY_WINDOW)     # Start to finish
+        self.started = None
+
+        self._own_work_dir = work_dir is None
+        self._queue = None
+        self._executor = None
+        self._server = None
+        self._dispatchers = []
+
+    async def start(self):
+        """Start the worker pool and listen for connections"""
+        if self._own_work_dir:
+            self.work_dir = tempfile.mkdtemp(prefix='webp2mp4-service-')
+        else:
+            os.makedirs(self.work_dir, exist_ok=True)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._executor = ProcessPoolExecutor(max_workers=self.jobs, initializer=init_worker)
+        self._dispatchers = [asyncio.ensure_future(self._dispatch()) for _ in range(self.jobs)]
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.started = time.time()
+
+    async def stop(self):
+        """Stop listening, cancel queued jobs and shut the worker pool down"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for dispatcher in self._dispatchers:
+            dispatcher.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self._dispatchers = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._own_work_dir and self.work_dir:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    async def serve_forever(self):
+        """Run until cancelled, starting the service if start() was not called yet"""
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def _dispatch(self):
+        """Dispatcher task: run queued jobs in the worker pool one at a time"""
+        loop = asyncio.get_event_loop()
+        while True:
+            job = await self._queue.get()
+            job.status = JOB_RUNNING
+            job.started = time.time()
+            self.in_flight += 1
+            try:
+                job.result = await loop.run_in_executor(
+                    self._executor, convert_job, job.input_file, job.output_file, job.fps, PIPELINE_STREAM,
+                    self.still_duration, None, self.buffer_frames, job.profile)
+            except Exception as e:
+                # The worker process itself failed
+                job.result = None
+                job.error = str(e)
+            finally:
+                self.in_flight -= 1
+            self._finish(job)
+
+    def _finish(self, job):
+        """Record the outcome of a job and release the files it no longer needs"""
+        job.finished = time.time()
+        if job.result is not None and job.result.success:
+            job.status = JOB_DONE
+            self.counters['done'] += 1
+        else:
+            job.status = JOB_FAILED
+            job.error = job.error or (job.result.error if job.result is not None else None)
+            self.counters['failed'] += 1
+        self.latencies.append(job.finished - job.submitted)
+        self.wait_times.append(job.started - job.submitted)
+        self.run_times.append(job.finished - job.started)
+        _remove(job.input_file)
+        job.done.set()
+        self._evict()
+
+    def _evict(self):
+        """Forget the oldest finished jobs beyond retained_jobs and delete their videos"""
+        finished = [job for job in self.job_table.values() if job.finished is not None]
+        for job in finished[:max(0, len(finished) - self.retained_jobs)]:
+            del self.job_table[job.id]
+            _remove(job.output_file)
+
+    async def submit(self, data, fps=None, profile=None):
+        """
+        Store an uploaded file and queue its conversion.
+
+        Args:
+            data (bytes): Content of the WebP file
+            fps (float, optional): Frames per second; detected from the file if None
+            profile (str, optional): Encoding profile name
+
+        Returns:
+            Job: The queued job
+
+        Raises:
+            HTTPError: 503 if the queue is full
+        """
+        if self._queue.full():
+            self.counters['rejected'] += 1
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Conversion queue is full",
+                            {'Retry-After': str(RETRY_AFTER)})
+        job_id = uuid.uuid4().hex
+        input_file = os.path.join(self.work_dir, job_id + '.webp')
+        job = Job(job_id, input_file, os.path.join(self.work_dir, job_id + '.mp4'), fps, profile)
+
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, _write_file, input_file, data)
+        # The queue may have filled up while the file was written
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            _remove(input_file)
+            self.counters['rejected'] += 1
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Conversion queue is full",
+                            {'Retry-After': str(RETRY_AFTER)})
+        self.job_table[job_id] = job
+        self.counters['submitted'] += 1
+        return job
+
+    def health(self):
+        """
+        Liveness information
+
+        Returns:
+            dict: Status, uptime, workers, queue depth and jobs in flight
+        """
+        return {
+            'status': 'ok',
+            'uptime': time.time() - self.started,
+            'workers': self.jobs,
+            'queue_depth': self._queue.qsize(),
+            'queue_size': self.queue_size,
+            'in_flight': self.in_flight,
+        }
+
+    def metrics(self):
+        """
+        Counters and latency percentiles of the latest jobs
+
+        Returns:
+            dict: Health information, job counters and p50/p90/p99 of the time from submission
+                  to finish (latency), waiting in the queue (wait) and converting (run)
+        """
+        metrics = self.health()
+        metrics.update(self.counters)
+        metrics['latency'] = percentiles(self.latencies)
+        metrics['wait'] = percentiles(self.wait_times)
+        metrics['run'] = percentiles(self.run_times)
+        return metrics
+
+    # HTTP handling
+
+    async def _handle_connection(self, reader, writer):
+        """Serve the requests of one connection, keeping it open between requests"""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    await self._respond(writer, e.status, _json_body({'error': e.message}), keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body, keep_alive = request
+                try:
+                    status, content_type, payload, extra = await self._route(method, target, body)
+                except HTTPError as e:
+                    status, content_type, payload, extra = (e.status, 'application/json',
+                                                            _json_body({'error': e.message}), e.headers)
+                await self._respond(writer, status, payload, content_type, extra, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass  # Client went away or sent a line longer than the stream buffer
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        """
+        Read one request from a connection.
+
+        Returns:
+            tuple: (method, target, headers, body, keep_alive), or None if the client closed the connection
+
+        Raises:
+            HTTPError: If the request is malformed or too large
+        """
+        line = await reader.readline()
+        if not line:
+            return None
+        if len(line) > MAX_HEADER_LINE or not line.endswith(b'\n'):
+            raise HTTPError(HTTPStatus.REQUEST_URI_TOO_LONG, "Request line too long")
+        parts = line.decode('latin-1').split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+        method, target, version = parts
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if len(line) > MAX_HEADER_LINE:
+                raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Header line too long")
+            line = line.decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise HTTPError(HTTPStatus.LENGTH_REQUIRED, "Chunked uploads are not supported; send Content-Length")
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > self.max_upload:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                            f"Upload larger than {self.max_upload} bytes")
+        body = await reader.readexactly(length) if length > 0 else b''
+        return method, target, headers, body, keep_alive
+
+    async def _respond(self, writer, status, payload, content_type='application/json', headers=None,
+                       keep_alive=True):
+        """Write a response with a complete body"""
+        status = HTTPStatus(status)
+        lines = [
+            f'HTTP/1.1 {status.value} {status.phrase}',
+            f'Content-Type: {content_type}',
+            f'Content-Length: {len(payload)}',
+            'Connection: ' + ('keep-alive' if keep_alive else 'close'),
+        ]
+        lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload)
+        await writer.drain()
+
+    async def _route(self, method, target, body):
+        """
+        Dispatch a request to its handler.
+
+        Returns:
+            tuple: (status, content type, body bytes, extra headers)
+        """
+        url = urlsplit(target)
+        path = url.path.rstrip('/') or '/'
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        parts = path.strip('/').split('/')
+
+        if path == '/health' and method == 'GET':
+            return HTTPStatus.OK, 'application/json', _json_body(self.health()), {}
+        if path == '/metrics' and method == 'GET':
+            return HTTPStatus.OK, 'application/json', _json_body(self.metrics()), {}
+        if path in ('/jobs', '/convert') and method == 'POST':
+            job = await self.submit(_check_upload(body), *_conversion_params(query))
+            if path == '/jobs':
+                return HTTPStatus.ACCEPTED, 'application/json', _json_body(job.to_dict()), \
+                    {'Location': f'/jobs/{job.id}'}
+            await job.done.wait()
+            return await self._result(job)
+        if parts[0] == 'jobs' and len(parts) in (2, 3) and method == 'GET':
+            job = self.job_table.get(parts[1])
+            if job is None:
+                raise HTTPError(HTTPStatus.NOT_FOUND, "Unknown job")
+            if len(parts) == 2:
+                return HTTPStatus.OK, 'application/json', _json_body(job.to_dict()), {}
+            if parts[2] == 'result':
+                return await self._result(job)
+        if path in ('/health', '/metrics', '/jobs', '/convert') or parts[0] == 'jobs':
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} not allowed for {path}")
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No such endpoint: {path}")
+
+    async def _result(self, job):
+        """Response carrying the video of a job"""
+        if job.status == JOB_FAILED:
+            raise HTTPError(HTTPStatus.UNPROCESSABLE_ENTITY, job.error or "Conversion failed")
+        if job.status != JOB_DONE:
+            raise HTTPError(HTTPStatus.CONFLICT, f"Job is {job.status}")
+        loop = asyncio.get_event_loop()
+        data = await loop.run_in_executor(None, _read_file, job.output_file)
+        return HTTPStatus.OK, 'video/mp4', data, {'X-Job-Id': job.id}
+
+
+def _check_upload(body):
+    """Reject request bodies that are not WebP files"""
+    if len(body) < 12 or body[:4] != b'RIFF' or body[8:12] != b'WEBP':
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "The request body is not a WebP file")
+    return body
+
+
+def _conversion_params(query):
+    """Validate the fps and profile query parameters"""
+    fps = query.get('fps')
+    if fps is not None:
+        try:
+            fps = float(fps)
+        except ValueError:
+            fps = 0
+        if not fps > 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "fps must be a positive number")
+    profile = query.get('profile')
+    if profile is not None and profile not in PROFILES:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"Unknown profile: {profile}")
+    return fps, profile
+
+
+def _json_body(data):
+    """Encode a JSON response body"""
+    return json.dumps(data).encode('utf-8')
+
+
+def _write_file(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _remove(path):
+    """Remove a file if it exists"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def build_parser():
+    """
+    Build the argument parser
+
+    Returns:
+        argparse.ArgumentParser: Parser for the service options
+    """
+    parser = argparse.ArgumentParser(
+        prog="webp2mp4-service",
+        description="Run a local HTTP service converting uploaded WebP files to MP4.",
+    )
+    parser.add_argument(
+        "--host", default=DEFAULT_HOST,
+        help="address to listen on (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT,
+        help="port to listen on (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=default_jobs(),
+        help="number of worker processes (default: number of CPU cores)",
+    )
+    parser.add_argument(
+        "--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+        help="jobs waiting for a worker before uploads are rejected with 503 (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-upload", type=float, default=DEFAULT_MAX_UPLOAD / (1024 * 1024),
+        help="largest accepted upload in MB (default: %(default)d)",
+    )
+    parser.add_argument(
+        "--work-dir", default=None,
+        help="directory for uploads and videos (default: a temporary directory)",
+    )
+    return parser
+
+
+def main(argv=None):
+    """
+    Run the service until interrupted
+
+    Args:
+        argv (list, optional): Command-line arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        int: Exit code
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.jobs <= 0:
+        parser.error("--jobs must be a positive number")
+    if args.queue_size <= 0:
+        parser.error("--queue-size must be a positive number")
+
+    service = ConversionService(args.host, args.port, args.jobs, args.queue_size,
+                                int(args.max_upload * 1024 * 1024), args.work_dir)
+
+    async def run():
+        await service.start()
+        print(f"Serving on http://{service.host}:{service.port} with {service.jobs} workers (Ctrl+C to stop)",
+              file=sys.stderr)
+        await service.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("Stopped.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
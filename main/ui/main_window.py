@@ -3,12 +3,15 @@ Main window for the WebP to MP4 converter application
 """
 
 import os
-import time
+import queue
+import logging
 import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import sys
 
+from main.core.profiles import PROFILES, DEFAULT_PROFILE
+
 # Try to import tkinterdnd2, but don't fail if it's not available
 try:
     from tkinterdnd2 import DND_FILES, TkinterDnD
@@ -16,6 +19,14 @@ try:
 except ImportError:
     TKDND_AVAILABLE = False
 
+logger = logging.getLogger(__name__)
+
+# Interval in milliseconds at which updates from the conversion thread are applied to the window (~30 per second)
+UPDATE_INTERVAL_MS = 33
+
+# Kinds of update of which only the latest queued value is applied
+PROGRESS_UPDATES = ('progress', 'file_progress', 'progress_status')
+
 
 class MainWindow:
     """Main application window"""
@@ -33,10 +44,18 @@ class MainWindow:
         self.root.minsize(650, 720)    # Increased minimum height as well
         
         self.selected_files = []
+        self._selected_set = set()   # Same paths as selected_files, for fast duplicate checks
+        self._listed_count = 0       # Number of selected files shown in the listbox
+        self.batch_converter = None
         self.setup_ui()
         
         # Set up drag and drop
         self.setup_dnd()
+        
+        # Tk is not thread-safe: the conversion thread posts updates to this queue
+        # and the main loop applies them at a fixed rate
+        self.ui_updates = queue.Queue()
+        self.root.after(UPDATE_INTERVAL_MS, self.apply_updates)
     
     def setup_dnd(self):
         """Set up drag and drop functionality"""
@@ -54,8 +73,7 @@ class MainWindow:
         # Get the data (file paths)
         data = event.data
         
-        # Print debug info
-        print(f"Raw drop data: {data}")
+        logger.debug("Raw drop data: %s", data)
         
         # Process the paths based on the format
         file_paths = []
@@ -87,7 +105,7 @@ class MainWindow:
                 if path and os.path.exists(path):
                     file_paths.append(path)
         
-        print(f"Parsed file paths: {file_paths}")
+        logger.debug("Parsed file paths: %s", file_paths)
         
         # Process the files
         if file_paths:
@@ -151,6 +169,31 @@ class MainWindow:
         fps_tooltip = ttk.Label(fps_tooltip_frame, text="(Leave empty to use original frame rate)", foreground="gray")
         fps_tooltip.pack(side="left", padx=5)
         
+        # Parallel jobs option
+        jobs_frame = ttk.Frame(options_frame)
+        jobs_frame.pack(fill="x", padx=10, pady=2)
+        
+        ttk.Label(jobs_frame, text="Parallel jobs:").pack(side="left", padx=5)
+        self.jobs_var = tk.StringVar(value=str(os.cpu_count() or 1))
+        jobs_entry = ttk.Entry(jobs_frame, textvariable=self.jobs_var, width=15)
+        jobs_entry.pack(side="left", padx=5)
+        
+        # Encoding profile option
+        profile_frame = ttk.Frame(options_frame)
+        profile_frame.pack(fill="x", padx=10, pady=2)
+        
+        ttk.Label(profile_frame, text="Encoding profile:").pack(side="left", padx=5)
+        self.profile_var = tk.StringVar(value=DEFAULT_PROFILE)
+        profile_combo = ttk.Combobox(profile_frame, textvariable=self.profile_var, values=list(PROFILES),
+                                     state="readonly", width=12)
+        profile_combo.pack(side="left", padx=5)
+        self.profile_hint = ttk.Label(profile_frame, text=PROFILES[DEFAULT_PROFILE].description, foreground="gray")
+        self.profile_hint.pack(side="left", padx=5)
+        profile_combo.bind(
+            "<<ComboboxSelected>>",
+            lambda event: self.profile_hint.configure(text=PROFILES[self.profile_var.get()].description)
+        )
+        
         # Output directory option
         out_dir_frame = ttk.Frame(options_frame)
         out_dir_frame.pack(fill="x", padx=10, pady=2)
@@ -192,6 +235,10 @@ class MainWindow:
         self.file_progress_bar = ttk.Progressbar(progress_frame, variable=self.file_progress_var, maximum=100)
         self.file_progress_bar.pack(fill="x", padx=10, pady=(5, 10))
         
+        # Cancel button, only enabled while converting
+        self.cancel_btn = ttk.Button(progress_frame, text="Cancel", command=self.cancel_conversion, state="disabled")
+        self.cancel_btn.pack(pady=(0, 10))
+        
         # Status label
         self.status_var = tk.StringVar(value="Ready")
         status_frame = ttk.Frame(self.root)
@@ -224,7 +271,11 @@ class MainWindow:
             return
         
         # Check for duplicates and only add new files
-        new_files = [f for f in valid_files if f not in self.selected_files]
+        new_files = []
+        for f in valid_files:
+            if f not in self._selected_set:
+                self._selected_set.add(f)
+                new_files.append(f)
         
         if new_files:
             # Add valid files to the list
@@ -248,14 +299,24 @@ class MainWindow:
                 )
     
     def update_file_listbox(self):
-        """Update the listbox with the current selected files"""
-        self.file_listbox.delete(0, tk.END)
-        for file in self.selected_files:
-            self.file_listbox.insert(tk.END, os.path.basename(file))
+        """
+        Update the listbox with the current selected files.
+        
+        Files are only ever appended to the selection, so only the entries added since
+        the last update are inserted, in a single call, keeping large drops responsive.
+        """
+        if self._listed_count > len(self.selected_files):
+            self.file_listbox.delete(0, tk.END)
+            self._listed_count = 0
+        new_files = self.selected_files[self._listed_count:]
+        if new_files:
+            self.file_listbox.insert(tk.END, *(os.path.basename(file) for file in new_files))
+            self._listed_count = len(self.selected_files)
     
     def clear_selection(self):
         """Clear the selected files list"""
         self.selected_files = []
+        self._selected_set = set()
         self.update_file_listbox()
     
     def select_output_dir(self):
@@ -291,10 +352,22 @@ class MainWindow:
             messagebox.showerror("Error", "Invalid output directory")
             return
         
+        # Get number of parallel jobs
+        jobs_text = self.jobs_var.get().strip()
+        try:
+            jobs = int(jobs_text)
+            if jobs <= 0:
+                messagebox.showerror("Error", "Parallel jobs must be a positive number")
+                return
+        except ValueError:
+            messagebox.showerror("Error", "Invalid number of parallel jobs")
+            return
+        
         # Disable buttons during conversion
         for widget in self.root.winfo_children():
             if isinstance(widget, ttk.Button):
                 widget.configure(state="disabled")
+        self.cancel_btn.configure(state="normal")
         
         # Reset progress
         self.progress_var.set(0)
@@ -303,81 +376,119 @@ class MainWindow:
         # Start conversion in a separate thread
         self.conversion_thread = threading.Thread(
             target=self.convert_files,
-            args=(self.selected_files, fps, output_dir),
+            args=(list(self.selected_files), fps, output_dir, jobs, self.profile_var.get()),
             daemon=True
         )
         self.conversion_thread.start()
     
-    def convert_files(self, files, fps, output_dir):
+    def convert_files(self, files, fps, output_dir, jobs, profile):
         """Convert the selected files in a separate thread"""
-        from main.core.converter import WebPConverter
+        from main.core.batch import BatchConverter
+        from main.core.journal import batch_journal_path
         
-        total_files = len(files)
-        converted = 0
+        try:
+            # A journal lets a batch interrupted by a crash resume where it stopped, when the
+            # same files are converted again; it is kept away from the user's folders
+            journal_file = batch_journal_path(files, output_dir or None)
+            self.batch_converter = BatchConverter(jobs=jobs, fps=fps, output_dir=output_dir or None, profile=profile,
+                                                  journal_file=journal_file)
+            if self.batch_converter.jobs > 1:
+                self.post_update('status',
+                                 f"Converting {len(files)} files with {self.batch_converter.jobs} parallel jobs...")
+            
+            batch = self.batch_converter.run(
+                files,
+                result_callback=self.on_file_converted,
+                status_callback=lambda message: self.post_update('status', message),
+                progress_callback=self.on_progress
+            )
+            
+            status = (
+                f"Conversion complete. Converted {len(batch.succeeded)} of {len(batch.results)} files "
+                f"({batch.files_per_second:.2f} files/s, {batch.frames_per_second:.1f} frames/s)."
+            )
+            if batch.resumed:
+                status += f" Resumed after {len(batch.resumed)} files converted earlier."
+            if batch.cancelled:
+                status = f"Conversion cancelled. Converted {len(batch.succeeded)} of {len(batch.results)} files."
+            elif not batch.failed and os.path.exists(journal_file):
+                # Nothing left to resume
+                os.remove(journal_file)
+            self.post_update('status', status)
+        except Exception as e:
+            logger.exception("Batch conversion failed")
+            self.post_update('status', f"Conversion failed: {e}")
+        finally:
+            self.post_update('file_progress', 0)  # Reset file progress when done
+            
+            # Re-enable buttons
+            self.post_update('finished', None)
+    
+    def on_file_converted(self, result, done, total):
+        """Update the overall progress when a file finishes"""
+        self.post_update('progress', (done / total) * 100)
+        if not result.success:
+            self.post_update('status', f"Error converting {os.path.basename(result.input_file)}: {result.error}")
+        self.post_update('file_progress', 0)  # Reset single file progress for the next file
+    
+    def cancel_conversion(self):
+        """Cancel the running conversion; files already being converted are finished"""
+        if self.batch_converter is not None:
+            self.batch_converter.cancel()
+            self.status_var.set("Cancelling conversion...")
+    
+    def on_progress(self, event):
+        """Update the status text and file progress from a conversion progress event"""
+        self.post_update('progress_status', event.describe())
+        self.post_update('file_progress', event.fraction * 100)
+    
+    def post_update(self, kind, value):
+        """
+        Queue an update of the window; safe to call from any thread
         
-        for file_path in files:
-            try:
-                self.status_var.set(f"Converting {os.path.basename(file_path)}...")
-                self.file_progress_var.set(0)  # Reset single file progress
-                
-                # Determine FPS for this file if set to auto
-                file_fps = fps
-                if file_fps is None:
-                    file_fps = WebPConverter.detect_fps(file_path)
-                    self.status_var.set(f"Converting {os.path.basename(file_path)} at {file_fps:.2f} FPS...")
-                
-                # Determine output path
-                if output_dir:
-                    # Use specified output directory
-                    output_path = os.path.join(output_dir, os.path.splitext(os.path.basename(file_path))[0] + ".mp4")
-                else:
-                    # Use same directory as input file
-                    output_path = os.path.splitext(file_path)[0] + ".mp4"
-                
-                # Convert the file with file progress callback
-                WebPConverter.convert(file_path, output_path, file_fps, self.update_status_and_progress)
-                
-                converted += 1
-                self.progress_var.set((converted / total_files) * 100)
-                
-            except Exception as e:
-                self.status_var.set(f"Error converting {os.path.basename(file_path)}: {str(e)}")
-                self.file_progress_var.set(0)  # Reset file progress on error
-                time.sleep(2)  # Pause to show the error
-        
-        self.status_var.set(f"Conversion complete. Converted {converted} of {total_files} files.")
-        self.file_progress_var.set(0)  # Reset file progress when done
-        
-        # Re-enable buttons
-        self.root.after(0, self.enable_buttons)
+        Args:
+            kind: 'status' for a message, 'progress_status' for the description of the current
+                progress, 'progress' or 'file_progress' for a bar, or 'finished'
+            value: New status text or progress percentage
+        """
+        self.ui_updates.put((kind, value))
     
-    def update_status_and_progress(self, status_text):
-        """Update both status text and file progress based on status message"""
-        self.status_var.set(status_text)
+    def apply_updates(self):
+        """
+        Apply the queued updates in the Tk main loop.
         
-        # Try to extract progress information from status text
-        try:
-            if "Processing frame " in status_text:
-                # Extract frame number from status text like "Processing frame 5 of file.webp"
-                parts = status_text.split()
-                if len(parts) >= 3 and parts[0] == "Processing" and parts[1] == "frame":
-                    frame_num = int(parts[2])
-                    # We don't know the total frames, but we can update based on what we've seen
-                    # Use a simple approach: increment progress as we process more frames
-                    progress = min(frame_num, 100)  # Cap at 100%
-                    self.file_progress_var.set(progress)
-            elif "Creating video" in status_text:
-                # When creating the final video, set progress to 90%
-                self.file_progress_var.set(90)
-            elif "complete" in status_text.lower() or "created successfully" in status_text.lower():
-                # When complete, set to 100%
-                self.file_progress_var.set(100)
-        except Exception:
-            # If any error in parsing, don't update progress
-            pass
+        Progress updates are coalesced: of the values queued since the last call only
+        the latest of each kind is shown, so a fast conversion costs the window at most
+        one redraw per interval however many events it sends. Status messages, such as
+        errors, and the end of the conversion are applied one by one, in order, and a
+        progress description only replaces a message that was queued before it.
+        """
+        progress = {}
+        while True:
+            try:
+                kind, value = self.ui_updates.get_nowait()
+            except queue.Empty:
+                break
+            if kind in PROGRESS_UPDATES:
+                progress[kind] = value
+            elif kind == 'status':
+                self.status_var.set(value)
+                progress.pop('progress_status', None)
+            elif kind == 'finished':
+                self.enable_buttons()
+        
+        if 'progress_status' in progress:
+            self.status_var.set(progress['progress_status'])
+        if 'progress' in progress:
+            self.progress_var.set(progress['progress'])
+        if 'file_progress' in progress:
+            self.file_progress_var.set(progress['file_progress'])
+        
+        self.root.after(UPDATE_INTERVAL_MS, self.apply_updates)
     
     def enable_buttons(self):
         """Re-enable all buttons after conversion is complete"""
         for widget in self.root.winfo_children():
             if isinstance(widget, ttk.Button):
                 widget.configure(state="normal")
+        self.cancel_btn.configure(state="disabled")
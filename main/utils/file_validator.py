@@ -6,6 +6,8 @@ Provides utilities for validating WebP files
 import os
 from PIL import Image
 
+from main.core.probe import probe
+
 
 class FileValidator:
     """
@@ -17,6 +19,8 @@ class FileValidator:
         """
         Validate that all selected files are WebP files.
         
+        Files are checked by parsing their WebP headers, without decoding any image data.
+        
         Args:
             files (list): List of file paths to validate
             
@@ -34,13 +38,23 @@ class FileValidator:
                     invalid_files.append((file, "File does not exist"))
                     continue
                     
-                # Try to open with PIL to verify it's a valid image
-                with Image.open(file) as img:
-                    if img.format != "WEBP":
-                        invalid_files.append((file, f"Not a WebP file (detected as {img.format})"))
-                    else:
-                        valid_files.append(file)
+                # Check the WebP headers
+                probe(file)
+                valid_files.append(file)
+            except ValueError as e:
+                invalid_files.append((file, FileValidator._invalid_reason(file, e)))
             except Exception as e:
                 invalid_files.append((file, f"Error: {str(e)}"))
         
         return valid_files, invalid_files
+    
+    @staticmethod
+    def _invalid_reason(file, error):
+        """Explain why a file is not a valid WebP file, naming its format if PIL recognizes it"""
+        try:
+            with Image.open(file) as img:
+                if img.format != "WEBP":
+                    return f"Not a WebP file (detected as {img.format})"
+        except Exception:
+            pass
+        return f"Error: {str(error)}"
@@ -0,0 +1,33 @@
+"""
+Resource Usage Module
+Reports the memory used by conversions
+"""
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+import sys
+
+
+def peak_rss():
+    """
+    Peak resident memory of this process and of the largest finished child process.
+
+    The child figure covers the ffmpeg encoders, which run as separate processes.
+    Both are peaks over the lifetime of the process, so in a worker converting
+    several files they cover all conversions so far.
+
+    Returns:
+        int: Peak resident set size in bytes, or None if the platform does not report it
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    usage += resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # macOS reports bytes, other systems kilobytes
+    if sys.platform == 'darwin':
+        return usage
+    return usage * 1024
@@ -9,10 +9,9 @@ setup(
     version="0.1.0",
     description="A utility to convert WebP files to MP4 format",
     author="kai",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
     install_requires=[
         "pillow>=9.0.0",
-        "moviepy>=1.0.3",
         "imageio>=2.9.0",
         "imageio-ffmpeg>=0.4.5",
         "numpy>=1.19.0",
@@ -25,16 +24,16 @@ setup(
     },
     entry_points={
         "console_scripts": [
-            "webp2mp4=webp2mp4.__main__:main",
+            "webp2mp4=main.__main__:main",
+            "webp2mp4-service=main.service.server:main",
         ],
     },
-    python_requires=">=3.6",
+    python_requires=">=3.7",
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Intended Audience :: End Users/Desktop",
         "License :: OSI Approved :: MIT License",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9",
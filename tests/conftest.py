@@ -0,0 +1,66 @@
+"""
+Shared fixtures: sample WebP files and a reader for the timestamps of encoded videos
+"""
+
+import re
+import struct
+import subprocess
+from fractions import Fraction
+from pathlib import Path
+
+import imageio_ffmpeg
+import pytest
+from PIL import Image
+
+
+def make_animation(path, durations, size=(32, 24), mode='RGB'):
+    """Save an animation with one distinct solid colour per frame"""
+    frames = [Image.new(mode, size, (40 * i % 256, 255 - 40 * i % 256, 90)) for i in range(len(durations))]
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=list(durations), loop=0,
+                   lossless=True)
+    return str(path)
+
+
+def _mp4_length(path):
+    """Length in milliseconds from the movie header of an MP4 file, or None if it has none"""
+    data = path.read_bytes() if path.suffix == '.mp4' else b''
+    start = data.find(b'mvhd') + 4
+    if start < 4:
+        return None
+    if data[start] == 0:
+        timescale, duration = struct.unpack('>II', data[start + 12:start + 20])
+    else:
+        timescale, duration = struct.unpack('>IQ', data[start + 20:start + 32])
+    return duration * 1000 / timescale if duration else None
+
+
+def read_video(path):
+    """
+    Frame timestamps and length of a video, read with ffmpeg without decoding it.
+
+    The length of an MP4 file comes from its header: ffmpeg only estimates it when
+    frames are reordered (B-frames), and can be off by a frame.
+
+    Returns:
+        tuple: (sorted presentation times in milliseconds, length in milliseconds)
+    """
+    path = Path(path)
+    process = subprocess.run([imageio_ffmpeg.get_ffmpeg_exe(), '-i', str(path), '-map', '0:v', '-c', 'copy',
+                              '-f', 'framecrc', '-'], capture_output=True, text=True, check=True)
+    numerator, denominator = re.search(r'^#tb 0: (\d+)/(\d+)', process.stdout, re.M).groups()
+    time_base = Fraction(int(numerator), int(denominator))
+    times = sorted(float(int(line.split(',')[2]) * time_base * 1000)
+                   for line in process.stdout.splitlines() if line and not line.startswith('#'))
+    hours, minutes, seconds = re.search(r'Duration: (\d+):(\d+):([\d.]+)', process.stderr).groups()
+    length = _mp4_length(path)
+    if length is None:
+        length = ((int(hours) * 60 + int(minutes)) * 60 + float(seconds)) * 1000
+    return times, length
+
+
+@pytest.fixture
+def animation(tmp_path):
+    """Factory saving a test animation with the given frame durations"""
+    def create(durations, name='anim.webp', **kwargs):
+        return make_animation(tmp_path / name, durations, **kwargs)
+    return create
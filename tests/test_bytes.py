@@ -0,0 +1,71 @@
+"""
+Tests of the in-memory bytes-to-bytes conversion
+"""
+
+import io
+import tempfile
+
+import pytest
+from PIL import Image
+
+from main.core.converter import WebPConverter
+from conftest import read_video
+
+DURATIONS = [100, 40, 300]
+
+
+@pytest.fixture
+def webp(animation):
+    with open(animation(DURATIONS), 'rb') as f:
+        return f.read()
+
+
+def check_video(tmp_path, data, expected_times, expected_length):
+    assert data[4:8] == b'ftyp'
+    path = tmp_path / 'out.mp4'
+    path.write_bytes(data)
+    times, length = read_video(path)
+    assert times == pytest.approx(expected_times, abs=1)
+    assert length == pytest.approx(expected_length, abs=10)
+
+
+def test_bytes_to_bytes(tmp_path, webp):
+    check_video(tmp_path, WebPConverter.convert_bytes(webp), [0, 100, 140], 440)
+
+
+def test_stream_in_stream_out(tmp_path, webp):
+    output = io.BytesIO()
+    assert WebPConverter.convert_bytes(io.BytesIO(webp), output=output) is None
+    check_video(tmp_path, output.getvalue(), [0, 100, 140], 440)
+
+
+def test_still_image(tmp_path):
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 24), (0, 128, 255)).save(buffer, 'WEBP')
+    check_video(tmp_path, WebPConverter.convert_bytes(buffer.getvalue(), still_duration=1.5), [0], 1500)
+
+
+def test_no_temporary_files(webp, monkeypatch):
+    def refuse(*args, **kwargs):
+        raise AssertionError("temporary file created")
+
+    for name in ('mkstemp', 'mkdtemp', 'NamedTemporaryFile', 'TemporaryFile', 'TemporaryDirectory'):
+        monkeypatch.setattr(tempfile, name, refuse)
+    assert WebPConverter.convert_bytes(webp)[4:8] == b'ftyp'
+
+
+def test_progress_reported(webp):
+    events = []
+    WebPConverter.convert_bytes(webp, progress_callback=events.append)
+    assert events[-1].frames_done == events[-1].frames_total == len(DURATIONS)
+
+
+@pytest.mark.parametrize('data', [b'', b'not a webp file', b'RIFF\x10\x00\x00\x00WEBPVP8 '])
+def test_invalid_data(data):
+    with pytest.raises((OSError, ValueError)):
+        WebPConverter.convert_bytes(data)
+
+
+def test_still_duration_must_be_positive(webp):
+    with pytest.raises(ValueError):
+        WebPConverter.convert_bytes(webp, still_duration=0)
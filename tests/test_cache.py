@@ -0,0 +1,96 @@
+"""
+Tests of the conversion cache
+"""
+
+import itertools
+
+import pytest
+
+from main.core import cache as cache_module
+from main.core.cache import ConversionCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Make every call to time.time() in the cache return a later time"""
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(cache_module.time, 'time', lambda: float(next(ticks)))
+
+
+def video(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(b'v' * size)
+    return str(path)
+
+
+def test_key_depends_on_content_and_params(tmp_path):
+    first = tmp_path / 'a.webp'
+    second = tmp_path / 'b.webp'
+    first.write_bytes(b'one')
+    second.write_bytes(b'one')
+
+    key = ConversionCache.key(str(first), {'fps': 10})
+    assert ConversionCache.key(str(second), {'fps': 10}) == key
+    assert ConversionCache.key(str(first), {'fps': 12}) != key
+    second.write_bytes(b'two')
+    assert ConversionCache.key(str(second), {'fps': 10}) != key
+
+
+def test_hit_and_miss_stats(tmp_path, clock):
+    cache = ConversionCache(str(tmp_path / 'cache'))
+
+    assert cache.fetch('a', str(tmp_path / 'out.mp4')) is None
+    cache.store('a', video(tmp_path, 'a.mp4', 10), {'frame_count': 3})
+    assert cache.fetch('a', str(tmp_path / 'out.mp4')) == {'frame_count': 3}
+    assert (tmp_path / 'out.mp4').read_bytes() == b'v' * 10
+    assert cache.fetch('b', str(tmp_path / 'out.mp4')) is None
+
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 2
+    assert stats['hit_rate'] == pytest.approx(1 / 3)
+    assert stats['entries'] == 1
+    assert stats['size'] == 10
+
+
+def test_evicts_least_recently_used(tmp_path, clock):
+    cache = ConversionCache(str(tmp_path / 'cache'), max_size=25)
+    cache.store('a', video(tmp_path, 'a.mp4', 10))
+    cache.store('b', video(tmp_path, 'b.mp4', 10))
+    # Using 'a' makes 'b' the least recently used entry
+    assert cache.fetch('a', str(tmp_path / 'out.mp4')) is not None
+
+    cache.store('c', video(tmp_path, 'c.mp4', 10))
+
+    assert cache.fetch('b', str(tmp_path / 'out.mp4')) is None
+    assert cache.fetch('a', str(tmp_path / 'out.mp4')) is not None
+    assert cache.fetch('c', str(tmp_path / 'out.mp4')) is not None
+    assert not (tmp_path / 'cache' / 'b.mp4').exists()
+    assert cache.stats()['size'] == 20
+
+
+def test_entry_larger_than_limit_is_not_kept(tmp_path, clock):
+    cache = ConversionCache(str(tmp_path / 'cache'), max_size=5)
+    cache.store('a', video(tmp_path, 'a.mp4', 10))
+    assert cache.stats()['entries'] == 0
+
+
+def test_missing_file_counts_as_miss(tmp_path, clock):
+    cache = ConversionCache(str(tmp_path / 'cache'))
+    cache.store('a', video(tmp_path, 'a.mp4', 10))
+    (tmp_path / 'cache' / 'a.mp4').unlink()
+
+    assert cache.fetch('a', str(tmp_path / 'out.mp4')) is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_clear_resets_stats(tmp_path, clock):
+    cache = ConversionCache(str(tmp_path / 'cache'))
+    cache.store('a', video(tmp_path, 'a.mp4', 10))
+    cache.fetch('a', str(tmp_path / 'out.mp4'))
+
+    cache.clear()
+
+    assert cache.stats()['hits'] == 0
+    assert cache.stats()['entries'] == 0
+    assert not (tmp_path / 'cache' / 'a.mp4').exists()
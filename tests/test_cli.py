@@ -0,0 +1,147 @@
+"""
+Tests of the headless command-line mode
+"""
+
+import argparse
+import json
+import os
+
+import pytest
+from PIL import Image
+
+from main.cli.command_line import (main, collect_inputs, parse_outputs, parse_background, parse_size,
+                                   EXIT_OK, EXIT_FAILURES, EXIT_USAGE)
+from main.core.profiles import PROFILES
+from conftest import make_animation, read_video
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    directory = tmp_path / 'in'
+    (directory / 'sub').mkdir(parents=True)
+    first = make_animation(directory / 'a.webp', [50, 100])
+    second = make_animation(directory / 'sub' / 'b.webp', [40, 40, 40], size=(30, 20))
+    (directory / 'notes.txt').write_text('not a webp')
+    return directory, first, second
+
+
+def run(argv, capsys):
+    code = main(argv)
+    out = capsys.readouterr().out
+    return code, json.loads(out) if out.strip() else None
+
+
+def test_parse_options():
+    assert parse_outputs('mp4, poster,webm') == ['mp4', 'poster', 'webm']
+    assert parse_background('#ff8000') == (255, 128, 0)
+    assert parse_size('320x240') == (320, 240)
+    assert parse_size('480') == (480, 480)
+    for parse, value in ((parse_outputs, 'mp4,gif'), (parse_outputs, ','), (parse_background, 'nope'),
+                         (parse_size, '10x')):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse(value)
+
+
+@pytest.mark.parametrize('options', [
+    ['-j', '0'],
+    ['--fps', '0'],
+    ['--still-duration', '0'],
+    ['--buffer-frames', '0'],
+    ['--segments', '0'],
+    ['--scale', '1.5'],
+    ['--sample', '0'],
+    ['--calibrate', '--watch'],
+    ['--journal', 'j.jsonl', '--watch'],
+    ['--outputs', 'mp4,poster', '--pipeline', 'png'],
+    ['--pipeline', 'moviepy'],
+    ['--profile', 'nope'],
+    ['--schedule', 'random'],
+    ['--even', 'stretch'],
+])
+def test_usage_errors(tmp_path, options):
+    with pytest.raises(SystemExit) as error:
+        main([str(tmp_path)] + options)
+    assert error.value.code == 2
+
+
+def test_collect_inputs(inputs, tmp_path):
+    directory, first, second = inputs
+    files, missing = collect_inputs([str(directory), first, str(directory / '*.webp'), str(tmp_path / 'none')])
+    assert files == [first, second]
+    assert missing == [str(tmp_path / 'none')]
+
+
+def test_converts_and_prints_summary(inputs, tmp_path, capsys):
+    directory, first, second = inputs
+    output_dir = tmp_path / 'out'
+    code, summary = run([str(directory), '-j', '1', '-o', str(output_dir), '-q'], capsys)
+    assert code == EXIT_OK
+    assert summary['succeeded'] == 2 and summary['failed'] == 0 and summary['missing'] == []
+    assert sorted(os.listdir(output_dir)) == ['a.mp4', 'b.mp4']
+
+
+def test_missing_inputs(inputs, tmp_path, capsys):
+    directory, first, second = inputs
+    code, summary = run([first, str(tmp_path / 'none.webp'), '-q'], capsys)
+    assert code == EXIT_FAILURES
+    assert summary['missing'] == [str(tmp_path / 'none.webp')]
+    assert main([str(tmp_path / 'none.webp')]) == EXIT_USAGE
+
+
+def test_overwrite_skip(inputs, capsys):
+    directory, first, second = inputs
+    run([first, '-j', '1', '-q'], capsys)
+    code, summary = run([first, '-j', '1', '-q', '--overwrite', 'skip'], capsys)
+    assert code == EXIT_OK
+    assert summary['skipped'] == 1
+
+
+def test_frame_options(inputs, tmp_path, capsys):
+    directory, first, second = inputs
+    output_dir = tmp_path / 'out'
+    code, _ = run([second, '-j', '1', '-q', '-o', str(output_dir), '--fps', '5', '--max-size', '16',
+                   '--background', 'white', '--even', 'crop', '--profile', 'fast', '--outputs', 'mp4,poster'],
+                  capsys)
+    assert code == EXIT_OK
+    times, _ = read_video(output_dir / 'b.mp4')
+    assert times == pytest.approx([0, 200, 400], abs=1)
+    with Image.open(output_dir / 'b.jpg') as poster:
+        assert poster.size == (16, 10)
+
+
+def test_journal_and_cost_log(inputs, tmp_path, capsys):
+    directory, first, second = inputs
+    journal, cost_log = str(tmp_path / 'journal.jsonl'), str(tmp_path / 'costs.jsonl')
+    options = [str(directory), '-j', '1', '-q', '--journal', journal, '--cost-log', cost_log,
+               '--schedule', 'longest']
+    run(options, capsys)
+    with open(cost_log, encoding='utf-8') as f:
+        assert len(f.readlines()) == 2
+
+    code, summary = run(options, capsys)
+    assert code == EXIT_OK
+    assert summary['resumed'] == 2
+
+
+def test_cache_dir(inputs, tmp_path, capsys):
+    directory, first, second = inputs
+    options = [first, '-j', '1', '-q', '--cache-dir', str(tmp_path / 'cache')]
+    run(options, capsys)
+    _, summary = run(options, capsys)
+    assert summary['cache_hits'] == 1
+
+
+def test_calibrate(inputs, capsys):
+    directory, first, second = inputs
+    code, report = run([str(directory), '-j', '1', '-q', '--calibrate', '--sample', '1'], capsys)
+    assert code == EXIT_OK
+    assert [item['profile'] for item in report['profiles']] == list(PROFILES)
+    assert all(item['files'] == 1 and item['failed'] == 0 for item in report['profiles'])
+    assert not os.path.exists(os.path.splitext(first)[0] + '.mp4')
+
+
+def test_watch_needs_directories(inputs):
+    directory, first, second = inputs
+    with pytest.raises(SystemExit) as error:
+        main([first, '--watch'])
+    assert error.value.code == 2
@@ -0,0 +1,85 @@
+"""
+Tests of the colour stage
+"""
+
+import numpy as np
+import pytest
+
+from main.core.colour import ColourStage, EVEN_PAD, EVEN_CROP, get_colour_stage, parse_colour
+
+
+def frame(height, width, rgba):
+    """Premultiplied RGBA frame of one colour"""
+    return np.full((height, width, 4), rgba, dtype=np.uint8)
+
+
+@pytest.mark.parametrize('even, size, expected', [
+    (EVEN_PAD, (5, 3), (6, 4)),
+    (EVEN_PAD, (4, 2), (4, 2)),
+    (EVEN_CROP, (5, 3), (4, 2)),
+    (EVEN_CROP, (1, 7), (2, 6)),
+])
+def test_output_size(even, size, expected):
+    assert ColourStage((0, 0, 0), even).output_size(size) == expected
+
+
+def test_black_background_drops_alpha():
+    pixels = frame(2, 2, (10, 20, 30, 128))
+    out = ColourStage((0, 0, 0), EVEN_PAD).apply(pixels)
+    assert out.shape == (2, 2, 3)
+    assert out.flags['C_CONTIGUOUS']
+    assert (out == (10, 20, 30)).all()
+
+
+def test_background_fills_transparent_pixels():
+    out = ColourStage((200, 100, 50), EVEN_PAD).apply(frame(2, 2, (0, 0, 0, 0)))
+    assert (out == (200, 100, 50)).all()
+
+
+def test_background_blends_with_coverage():
+    # Premultiplied red at half coverage over white: 128 + 255 * 127 / 255
+    out = ColourStage((255, 255, 255), EVEN_PAD).apply(frame(2, 2, (128, 0, 0, 128)))
+    assert (out == (255, 127, 127)).all()
+
+
+def test_opaque_pixels_ignore_background():
+    out = ColourStage((255, 255, 255), EVEN_PAD).apply(frame(2, 2, (1, 2, 3, 255)))
+    assert (out == (1, 2, 3)).all()
+
+
+def test_pad_adds_background_row_and_column():
+    out = ColourStage((9, 8, 7), EVEN_PAD).apply(frame(3, 5, (1, 2, 3, 255)))
+    assert out.shape == (4, 6, 3)
+    assert (out[:3, :5] == (1, 2, 3)).all()
+    assert (out[3] == (9, 8, 7)).all()
+    assert (out[:, 5] == (9, 8, 7)).all()
+
+
+def test_crop_drops_last_row_and_column():
+    pixels = np.zeros((3, 5, 4), dtype=np.uint8)
+    pixels[..., 3] = 255
+    pixels[..., 0] = np.arange(5)
+    out = ColourStage((0, 0, 0), EVEN_CROP).apply(pixels)
+    assert out.shape == (2, 4, 3)
+    assert (out[..., 0] == np.arange(4)).all()
+
+
+def test_crop_pads_single_pixel_dimension():
+    out = ColourStage((5, 5, 5), EVEN_CROP).apply(frame(1, 3, (1, 1, 1, 255)))
+    assert out.shape == (2, 2, 3)
+    assert (out[0] == (1, 1, 1)).all()
+    assert (out[1] == (5, 5, 5)).all()
+
+
+def test_get_colour_stage():
+    assert get_colour_stage() == ColourStage((0, 0, 0), EVEN_PAD)
+    assert get_colour_stage(ColourStage('white', EVEN_CROP)) == ColourStage((255, 255, 255), EVEN_CROP)
+    with pytest.raises(ValueError):
+        get_colour_stage(ColourStage('white', 'stretch'))
+
+
+def test_parse_colour():
+    assert parse_colour('#ff8000') == (255, 128, 0)
+    assert parse_colour([1, 2, 3]) == (1, 2, 3)
+    with pytest.raises(ValueError):
+        parse_colour((1, 2, 300))
@@ -0,0 +1,57 @@
+"""
+Tests of files whose decoding fails part-way through
+"""
+
+import logging
+
+import pytest
+from PIL import WebPImagePlugin
+
+from main.core.converter import WebPConverter, PIPELINE_STREAM, PIPELINE_PNG
+from conftest import read_video
+
+
+@pytest.fixture
+def failing_decoder(monkeypatch):
+    """Make decoding fail after the given number of frames"""
+    def fail_after(count):
+        load = WebPImagePlugin.WebPImageFile.load
+
+        def truncated(self):
+            if self.tell() == count:
+                raise OSError("corrupt frame")
+            return load(self)
+        monkeypatch.setattr(WebPImagePlugin.WebPImageFile, 'load', truncated)
+    return fail_after
+
+
+@pytest.mark.parametrize('pipeline', [PIPELINE_STREAM, PIPELINE_PNG])
+def test_frames_before_error_are_kept(tmp_path, animation, failing_decoder, caplog, pipeline):
+    source = animation([50, 60, 70, 80, 90])
+    failing_decoder(3)
+    messages = []
+    output = tmp_path / 'out.mp4'
+    with caplog.at_level(logging.WARNING, logger='main.core.converter'):
+        result = WebPConverter.convert_file(source, str(output), pipeline=pipeline,
+                                            status_callback=messages.append)
+
+    assert result.frame_count == 3
+    assert len(read_video(output)[0]) == 3
+    assert "Decoding anim.webp stopped after 3 frames: corrupt frame" in messages
+    assert caplog.records[-1].exc_info[0] is OSError
+
+
+def test_frames_before_error_are_kept_in_every_output(tmp_path, animation, failing_decoder):
+    source = animation([50, 60, 70, 80, 90])
+    failing_decoder(2)
+    result = WebPConverter.convert_file(source, str(tmp_path / 'out.mp4'), outputs=['mp4', 'webm'])
+    assert result.frame_count == 2
+    assert len(read_video(result.outputs['webm'])[0]) == 2
+
+
+def test_error_before_first_frame_is_raised(tmp_path, animation, failing_decoder):
+    source = animation([50, 60])
+    failing_decoder(0)
+    with pytest.raises(OSError):
+        WebPConverter.convert_file(source, str(tmp_path / 'out.mp4'))
+    assert not (tmp_path / 'out.mp4').exists()
@@ -0,0 +1,106 @@
+"""
+Tests of frame compositing in the decoder, for animations updating part of the canvas
+"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from main.core.compositor import FrameCompositor
+from main.core.decoder import WebPDecoder
+from main.core.probe import probe
+
+
+def moving_box(path, alpha):
+    """Save an animation of a box moving over a plain or transparent background"""
+    frames = []
+    for i in range(12):
+        pixels = np.zeros((60, 80, 4), np.uint8)
+        if not alpha:
+            pixels[...] = (30, 60, 90, 255)
+        x, y = i * 5, i * 3
+        pixels[y:y + 12, x:x + 16] = (255, i * 20, 0, 180 if alpha else 255)
+        frames.append(Image.fromarray(pixels, 'RGBA'))
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=50, lossless=True)
+    return str(path)
+
+
+def reference(path, index):
+    """Full-canvas composite of a frame, as Pillow decodes it"""
+    with Image.open(path) as im:
+        im.seek(index)
+        compositor = FrameCompositor(im.size)
+        compositor.composite(np.asarray(im.convert('RGBA')))
+        return compositor.canvas
+
+
+def contains(box, inner):
+    return box[0] <= inner[0] and box[1] <= inner[1] and box[2] >= inner[2] and box[3] >= inner[3]
+
+
+def test_composite_premultiplies_like_pillow():
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, (7, 9, 4), dtype=np.uint8)
+    compositor = FrameCompositor((9, 7))
+    compositor.composite(pixels)
+
+    black = Image.new('RGB', (9, 7))
+    black.paste(Image.fromarray(pixels, 'RGBA'), mask=Image.fromarray(pixels[..., 3]))
+    assert np.array_equal(compositor.canvas[..., :3], np.asarray(black))
+    assert np.array_equal(compositor.canvas[..., 3], pixels[..., 3])
+
+
+def test_composite_region_only_touches_its_box():
+    compositor = FrameCompositor((10, 8))
+    patch = np.full((2, 3, 4), 255, np.uint8)
+    assert compositor.composite(patch, (4, 5, 7, 7))
+    assert not compositor.composite(patch, (4, 5, 7, 7))
+
+    expected = np.zeros((8, 10, 4), np.uint8)
+    expected[5:7, 4:7] = 255
+    assert np.array_equal(compositor.canvas, expected)
+
+
+def test_update_regions_cover_disposed_frames(tmp_path):
+    path = moving_box(tmp_path / 'alpha.webp', alpha=True)
+    info = probe(path)
+    assert any(frame.dispose for frame in info.frames)
+
+    decoder = WebPDecoder(path)
+    decoder.probe()
+    regions = decoder._update_regions(info.size)
+    assert len(regions) == info.frame_count
+    for index, frame in enumerate(info.frames):
+        assert contains(regions[index], frame.region)
+        previous = info.frames[index - 1] if index else None
+        if previous is not None and previous.dispose:
+            assert contains(regions[index], previous.region)
+
+
+def test_update_regions_need_matching_headers(tmp_path):
+    path = moving_box(tmp_path / 'plain.webp', alpha=False)
+    decoder = WebPDecoder(path)
+    decoder.probe()
+    assert decoder._update_regions((81, 60)) is None
+
+
+@pytest.mark.parametrize('alpha', [False, True])
+@pytest.mark.parametrize('start', [0, 5])
+def test_frames_match_full_canvas_decoding(tmp_path, alpha, start):
+    path = moving_box(tmp_path / 'anim.webp', alpha)
+    decoder = WebPDecoder(path)
+
+    indices = []
+    for frame in decoder.frames(start):
+        assert np.array_equal(frame.pixels, reference(path, frame.index)), frame.index
+        indices.append(frame.index)
+    assert indices == list(range(start, 12))
+    assert decoder.mode == 'partial'
+
+
+def test_first_frame_of_range_is_a_keyframe(tmp_path):
+    path = moving_box(tmp_path / 'anim.webp', alpha=True)
+    first = next(WebPDecoder(path).frames(5))
+    assert first.region == (0, 0, 80, 60)
+    assert not first.partial
+    assert first.changed
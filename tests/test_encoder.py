@@ -0,0 +1,143 @@
+"""
+Tests of the ffmpeg encoder and the Matroska stream it is fed with
+"""
+
+import io
+
+import numpy as np
+import pytest
+
+from main.core import encoder as encoder_module
+from main.core.encoder import (FFmpegEncoder, VP9_CODEC, _ebml_size, _ebml_uint, _matroska_frame,
+                               timing_params)
+from main.core.profiles import PROFILES
+from conftest import read_video
+
+SIZE = (32, 24)
+
+
+def frames(count):
+    return [np.full((SIZE[1], SIZE[0], 3), 30 * i % 256, np.uint8) for i in range(count)]
+
+
+def encode(output, durations, **kwargs):
+    with FFmpegEncoder(output, SIZE, 10, **kwargs) as encoder:
+        for frame, duration in zip(frames(len(durations)), durations):
+            encoder.write(frame, duration=duration)
+    return encoder
+
+
+def test_ebml_size_is_eight_bytes():
+    assert _ebml_size(0) == b'\x01' + bytes(7)
+    assert _ebml_size(300) == b'\x01\x00\x00\x00\x00\x00\x01\x2c'
+
+
+@pytest.mark.parametrize('value, payload', [
+    (0, b'\x00'),
+    (1000, b'\x03\xe8'),
+    (1 << 32, b'\x01\x00\x00\x00\x00'),
+])
+def test_ebml_uint(value, payload):
+    assert _ebml_uint(b'\xe7', value) == b'\xe7' + _ebml_size(len(payload)) + payload
+
+
+def test_matroska_frame_sizes_add_up():
+    before, after = _matroska_frame(100, 40, 80)
+    cluster_size = int.from_bytes(before[5:12], 'big')
+    assert len(before) - 12 + 100 + len(after) == cluster_size
+    assert after == _ebml_uint(b'\x9b', 80)
+
+
+@pytest.mark.parametrize('version, params', [
+    ((7, 0), ['-fps_mode', 'vfr', '-enc_time_base', 'demux']),
+    (None, ['-fps_mode', 'vfr', '-enc_time_base', 'demux']),
+    ((6, 1), ['-fps_mode', 'vfr', '-enc_time_base', '-1']),
+    ((5, 1), ['-fps_mode', 'vfr', '-enc_time_base', '-1']),
+    ((5, 0), ['-vsync', 'vfr', '-enc_time_base', '-1']),
+    ((4, 2), ['-vsync', 'vfr', '-enc_time_base', '-1']),
+])
+def test_timing_params_follow_ffmpeg_version(version, params):
+    assert timing_params(version) == params
+
+
+@pytest.mark.parametrize('name, codec', [('out.mp4', None), ('out.webm', VP9_CODEC)])
+def test_frames_keep_their_timestamps(tmp_path, name, codec):
+    output = tmp_path / name
+    kwargs = {'codec': codec} if codec else {}
+    encoder = encode(str(output), [40, 200, 60, 500], **kwargs)
+
+    times, length = read_video(output)
+    assert encoder.frames_written == 4
+    assert times == pytest.approx([0, 40, 240, 300], abs=1)
+    assert length == pytest.approx(800, abs=10)
+
+
+def test_repeat_count_uses_frame_rate(tmp_path):
+    output = tmp_path / 'out.mp4'
+    with FFmpegEncoder(str(output), SIZE, 10) as encoder:
+        first, second = frames(2)
+        encoder.write(first, repeat=3)
+        encoder.write(second)
+
+    times, length = read_video(output)
+    assert times == pytest.approx([0, 300], abs=1)
+    assert length == pytest.approx(400, abs=10)
+
+
+def test_fractional_durations_do_not_drift(tmp_path):
+    output = tmp_path / 'out.mp4'
+    encode(str(output), [1000 / 30] * 30)
+
+    times, length = read_video(output)
+    assert times == pytest.approx([round(i * 1000 / 30) for i in range(30)], abs=1)
+    assert length == pytest.approx(1000, abs=10)
+
+
+def test_still_lasts_the_given_time(tmp_path):
+    output = tmp_path / 'out.mp4'
+    with FFmpegEncoder.still(str(output), SIZE, 2.5) as encoder:
+        encoder.write(frames(1)[0])
+
+    times, length = read_video(output)
+    assert times == [0]
+    assert length == pytest.approx(2500, abs=10)
+
+
+def test_encode_to_stream(tmp_path):
+    stream = io.BytesIO()
+    encode(stream, [100, 100, 300])
+    output = tmp_path / 'out.mp4'
+    output.write_bytes(stream.getvalue())
+
+    times, _ = read_video(output)
+    assert times == pytest.approx([0, 100, 200], abs=1)
+
+
+def test_old_ffmpeg_gets_closing_frame(tmp_path, monkeypatch):
+    monkeypatch.setattr(encoder_module, 'ffmpeg_version', lambda: (6, 1))
+    output = tmp_path / 'out.webm'
+    encoder = encode(str(output), [100, 400], codec=VP9_CODEC)
+
+    times, length = read_video(output)
+    assert encoder.frames_written == 2
+    assert times == pytest.approx([0, 100, 500], abs=1)
+    assert length == pytest.approx(501, abs=10)
+
+
+def test_abort_removes_output(tmp_path):
+    output = tmp_path / 'out.mp4'
+    with pytest.raises(KeyError):
+        with FFmpegEncoder(str(output), SIZE, 10) as encoder:
+            encoder.write(frames(1)[0])
+            raise KeyError('stop')
+    assert not output.exists()
+
+
+@pytest.mark.parametrize('name', sorted(PROFILES))
+def test_builtin_profiles_encode_yuv420p(name):
+    assert FFmpegEncoder('out.mp4', (32, 24), 10, profile=name)._pixel_format() == 'yuv420p'
+
+
+def test_custom_profile_pixel_format():
+    profile = PROFILES['archive']._replace(pix_fmt='yuv444p')
+    assert FFmpegEncoder('out.mp4', (32, 24), 10, profile=profile)._pixel_format() == 'yuv444p'
@@ -0,0 +1,125 @@
+"""
+Tests of the batch journal
+"""
+
+import json
+import os
+import time
+
+from main.core.batch import FileResult
+from main.core.journal import (BatchJournal, batch_journal_path, JOURNAL_MAX_AGE, STATE_DONE, STATE_FAILED,
+                               STATE_PENDING, STATE_RUNNING)
+
+
+def converted(tmp_path, name='clip'):
+    """An input file and its output, as left by a successful conversion"""
+    input_file = tmp_path / f'{name}.webp'
+    output_file = tmp_path / f'{name}.mp4'
+    input_file.write_bytes(b'webp data')
+    output_file.write_bytes(b'mp4 data')
+    return str(input_file), str(output_file)
+
+
+def done_journal(tmp_path, settings=None):
+    input_file, output_file = converted(tmp_path)
+    path = str(tmp_path / 'journal.jsonl')
+    with BatchJournal(path, settings) as journal:
+        journal.mark_pending([input_file])
+        journal.mark_running(input_file)
+        journal.mark_done(FileResult(input_file, output_file, True))
+    return path, input_file, output_file
+
+
+def test_completed_after_done(tmp_path):
+    path, input_file, output_file = done_journal(tmp_path)
+    with BatchJournal(path) as journal:
+        assert journal.state(input_file) == STATE_DONE
+        assert journal.completed(input_file, output_file)
+        assert journal.completed(input_file, output_file, verify=True)
+        assert not journal.completed(input_file, output_file + '.other')
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    path, input_file, output_file = done_journal(tmp_path)
+    other = str(tmp_path / 'other.webp')
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'input': other, 'state': STATE_DONE})[:20])
+
+    with BatchJournal(path) as journal:
+        assert journal.completed(input_file, output_file)
+        assert journal.state(other) is None
+    # The torn line is dropped when the journal is compacted
+    with open(path, encoding='utf-8') as f:
+        assert all(json.loads(line) for line in f)
+
+
+def test_not_completed_when_input_changed(tmp_path):
+    path, input_file, output_file = done_journal(tmp_path)
+    with open(input_file, 'ab') as f:
+        f.write(b' more')
+    with BatchJournal(path) as journal:
+        assert not journal.completed(input_file, output_file)
+
+
+def test_not_completed_when_output_changed(tmp_path):
+    path, input_file, output_file = done_journal(tmp_path)
+    with open(output_file, 'wb') as f:
+        f.write(b'mp4 dat!')  # Same size, so only the checksum tells
+    with BatchJournal(path) as journal:
+        assert journal.completed(input_file, output_file)
+        assert not journal.completed(input_file, output_file, verify=True)
+    os.remove(output_file)
+    with BatchJournal(path) as journal:
+        assert not journal.completed(input_file, output_file)
+
+
+def test_last_record_wins(tmp_path):
+    path, input_file, output_file = done_journal(tmp_path)
+    with BatchJournal(path) as journal:
+        journal.mark_running(input_file)
+    with BatchJournal(path) as journal:
+        assert journal.state(input_file) == STATE_RUNNING
+        assert not journal.completed(input_file, output_file)
+
+
+def test_failed_is_not_completed(tmp_path):
+    input_file, output_file = converted(tmp_path)
+    path = str(tmp_path / 'journal.jsonl')
+    with BatchJournal(path) as journal:
+        journal.mark_failed(FileResult(input_file, output_file, False, error='broken'))
+    with BatchJournal(path) as journal:
+        assert journal.state(input_file) == STATE_FAILED
+        assert not journal.completed(input_file, output_file)
+        assert journal.counts()[STATE_FAILED] == 1
+
+
+def test_different_settings_start_over(tmp_path):
+    path, input_file, output_file = done_journal(tmp_path, {'fps': 10})
+    with BatchJournal(path, {'fps': 10}) as journal:
+        assert journal.completed(input_file, output_file)
+    with BatchJournal(path, {'fps': 12}) as journal:
+        assert journal.state(input_file) is None
+        assert journal.counts()[STATE_PENDING] == 0
+
+
+def test_batch_journal_path_keyed_by_batch(tmp_path):
+    directory = str(tmp_path / 'journals')
+    first = batch_journal_path(['b.webp', 'a.webp'], 'out', directory)
+    assert os.path.dirname(first) == directory
+    assert batch_journal_path(['a.webp', 'b.webp'], 'out', directory) == first
+    assert batch_journal_path(['a.webp', 'b.webp'], None, directory) != first
+    assert batch_journal_path(['a.webp'], 'out', directory) != first
+
+
+def test_batch_journal_path_deletes_stale_journals(tmp_path):
+    directory = tmp_path / 'journals'
+    directory.mkdir()
+    stale, recent = directory / 'stale.jsonl', directory / 'recent.jsonl'
+    stale.write_text('{}')
+    recent.write_text('{}')
+    old = time.time() - JOURNAL_MAX_AGE - 60
+    os.utime(stale, (old, old))
+
+    batch_journal_path(['a.webp'], None, str(directory))
+    assert not stale.exists()
+    assert recent.exists()
@@ -0,0 +1,77 @@
+"""
+Tests of how the window applies updates posted by the conversion thread
+"""
+
+import queue
+
+import pytest
+
+pytest.importorskip('tkinter')
+
+from main.ui.main_window import MainWindow
+
+
+class Variable:
+    """Records the values a Tk variable is set to"""
+
+    def __init__(self):
+        self.values = []
+
+    def set(self, value):
+        self.values.append(value)
+
+
+class Root:
+    def after(self, interval, callback):
+        self.scheduled = callback
+
+
+def window():
+    """A window with only the parts apply_updates() uses, without a display"""
+    win = MainWindow.__new__(MainWindow)
+    win.root = Root()
+    win.ui_updates = queue.Queue()
+    win.status_var, win.progress_var, win.file_progress_var = Variable(), Variable(), Variable()
+    win.finished = 0
+
+    def enable_buttons():
+        win.finished += 1
+    win.enable_buttons = enable_buttons
+    return win
+
+
+def test_progress_is_coalesced():
+    win = window()
+    for i in range(100):
+        win.post_update('progress', i)
+        win.post_update('file_progress', 100 - i)
+    win.apply_updates()
+    assert win.progress_var.values == [99]
+    assert win.file_progress_var.values == [1]
+    assert win.root.scheduled == win.apply_updates
+
+
+def test_messages_are_applied_in_order():
+    win = window()
+    win.post_update('status', "Converting 3 files")
+    win.post_update('progress_status', "a.webp: decoding")
+    win.post_update('status', "Error converting a.webp: corrupt")
+    win.post_update('progress_status', "b.webp: decoding")
+    win.post_update('progress_status', "b.webp: encoding")
+    win.post_update('status', "Conversion complete")
+    win.post_update('finished', None)
+    win.apply_updates()
+    assert win.status_var.values == ["Converting 3 files", "Error converting a.webp: corrupt", "Conversion complete"]
+    assert win.finished == 1
+
+
+def test_latest_progress_description_follows_messages():
+    win = window()
+    win.post_update('status', "Error converting a.webp: corrupt")
+    win.post_update('progress_status', "b.webp: decoding")
+    win.post_update('progress_status', "b.webp: encoding")
+    win.apply_updates()
+    assert win.status_var.values == ["Error converting a.webp: corrupt", "b.webp: encoding"]
+
+    win.apply_updates()
+    assert len(win.status_var.values) == 2
@@ -0,0 +1,96 @@
+"""
+Tests of creating several outputs from one decoding pass
+"""
+
+import os
+import threading
+
+import pytest
+from PIL import Image
+
+from main.core import outputs as outputs_module
+from main.core.converter import WebPConverter, PIPELINE_PNG
+from main.core.outputs import OutputTarget, output_targets, ThumbnailStripOutput
+from conftest import read_video
+
+DURATIONS = [40, 80, 40, 200, 40, 40]
+
+
+def test_output_targets_named_after_mp4(tmp_path):
+    output_file = str(tmp_path / 'clip.mp4')
+    targets = output_targets(['mp4', 'webm', 'poster', 'thumbnails'], output_file)
+    assert [target.path for target in targets] == [
+        output_file, str(tmp_path / 'clip.webm'), str(tmp_path / 'clip.jpg'), str(tmp_path / 'clip-thumbnails.jpg')]
+
+
+def test_output_targets_keep_explicit_paths(tmp_path):
+    target = OutputTarget('poster', str(tmp_path / 'cover.jpg'))
+    assert output_targets(['mp4', target], str(tmp_path / 'clip.mp4'))[1] == target
+
+
+@pytest.mark.parametrize('outputs', [
+    [],
+    ['gif'],
+    [OutputTarget('gif', 'clip.gif')],
+    ['mp4', OutputTarget('poster', 'clip.mp4')],
+])
+def test_output_targets_rejected(outputs):
+    with pytest.raises(ValueError):
+        output_targets(outputs, 'clip.mp4')
+
+
+def test_thumbnails_pick_middle_of_equal_parts():
+    strip = ThumbnailStripOutput(OutputTarget('thumbnails', 'strip.jpg'), count=4, height=10)
+    strip.open((40, 20), 10, 20)
+    assert strip._picks == [2, 7, 12, 17]
+    assert strip._thumbnail_size == (20, 10)
+
+
+def test_all_outputs_from_one_pass(tmp_path, animation):
+    output_file = tmp_path / 'clip.mp4'
+    result = WebPConverter.convert_file(animation(DURATIONS), str(output_file),
+                                        outputs=['mp4', 'webm', 'poster', 'thumbnails'])
+
+    assert result.output_file == str(output_file)
+    assert sorted(result.outputs) == ['mp4', 'poster', 'thumbnails', 'webm']
+    assert result.frame_count == len(DURATIONS)
+    for kind in ('mp4', 'webm'):
+        times, length = read_video(result.outputs[kind])
+        assert len(times) == len(DURATIONS)
+        assert length == pytest.approx(sum(DURATIONS), abs=10)
+    with Image.open(result.outputs['poster']) as poster:
+        assert poster.size == (32, 24)
+    with Image.open(result.outputs['thumbnails']) as strip:
+        assert strip.size == (32 * len(DURATIONS), 24)
+    assert sorted(os.listdir(tmp_path)) == ['anim.webp', 'clip-thumbnails.jpg', 'clip.jpg', 'clip.mp4', 'clip.webm']
+
+
+def test_still_image_outputs(tmp_path):
+    source = tmp_path / 'still.webp'
+    Image.new('RGB', (32, 24), (200, 10, 10)).save(source)
+    result = WebPConverter.convert_file(str(source), str(tmp_path / 'still.mp4'), outputs=['mp4', 'poster'],
+                                        still_duration=2)
+
+    _, length = read_video(result.outputs['mp4'])
+    assert length == pytest.approx(2000, abs=10)
+    with Image.open(result.outputs['poster']) as poster:
+        assert poster.getpixel((16, 12))[0] > 150
+
+
+def test_failing_output_aborts_all(tmp_path, animation, monkeypatch):
+    def fail(self, frame):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(outputs_module.PosterOutput, 'write', fail)
+    source = animation(DURATIONS)
+    before = threading.active_count()
+    with pytest.raises(RuntimeError, match="disk full"):
+        WebPConverter.convert_file(source, str(tmp_path / 'clip.mp4'), outputs=['mp4', 'webm', 'poster'])
+    assert os.listdir(tmp_path) == ['anim.webp']
+    assert threading.active_count() == before
+
+
+def test_outputs_need_streaming_pipeline(tmp_path, animation):
+    with pytest.raises(ValueError):
+        WebPConverter.convert_file(animation(DURATIONS), str(tmp_path / 'clip.mp4'), pipeline=PIPELINE_PNG,
+                                   outputs=['mp4', 'poster'])
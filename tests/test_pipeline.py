@@ -0,0 +1,97 @@
+"""
+Tests of the bounded frame queue and of the fan-out to several outputs
+"""
+
+import threading
+import time
+
+import pytest
+
+from main.core.pipeline import FrameQueue, FrameFanOut
+
+
+class Producer:
+    """Frame generator counting the frames taken from it"""
+
+    def __init__(self, count, fail_at=None):
+        self.count = count
+        self.fail_at = fail_at
+        self.produced = 0
+        self.closed = False
+
+    def __iter__(self):
+        try:
+            for i in range(self.count):
+                if i == self.fail_at:
+                    raise KeyError(i)
+                self.produced += 1
+                yield i
+        finally:
+            self.closed = True
+
+
+def test_items_in_order_with_prepare():
+    frames = FrameQueue(Producer(20), max_frames=3, prepare=lambda i: i * 10)
+    assert list(frames) == [i * 10 for i in range(20)]
+    assert frames.busy_time > 0
+
+
+def test_producer_stays_within_buffer():
+    producer = Producer(50)
+    ahead = []
+    for consumed, item in enumerate(FrameQueue(producer, max_frames=4), 1):
+        time.sleep(0.002)  # Let the producer fill the queue
+        ahead.append(producer.produced - consumed)
+    # The queue holds 4 items and the producer may hold one it waits to put
+    assert max(ahead) <= 5
+    assert max(ahead) >= 3
+
+
+def test_error_raised_after_earlier_items():
+    received = []
+    with pytest.raises(KeyError):
+        for item in FrameQueue(Producer(10, fail_at=6), max_frames=2):
+            received.append(item)
+    assert received == list(range(6))
+
+
+def test_stopping_early_stops_producer():
+    producer = Producer(1000)
+    before = threading.active_count()
+    for item in FrameQueue(producer, max_frames=2):
+        if item == 3:
+            break
+    assert producer.produced < 10
+    assert threading.active_count() == before
+
+
+def test_buffer_must_hold_a_frame():
+    with pytest.raises(ValueError):
+        FrameQueue([], max_frames=0)
+
+
+def test_fan_out_hands_every_item_to_every_consumer():
+    received = [[], [], []]
+    fan_out = FrameFanOut([items.append for items in received], max_frames=2)
+    for i in range(30):
+        fan_out.put(i)
+    fan_out.close()
+    assert received == [list(range(30))] * 3
+
+
+def test_fan_out_consumer_error_stops_the_stream():
+    received = []
+
+    def failing(item):
+        if item == 2:
+            raise KeyError(item)
+
+    fan_out = FrameFanOut([failing, received.append], max_frames=1)
+    with pytest.raises(KeyError):
+        # The failed consumer keeps draining its queue, so put() never blocks
+        for i in range(100):
+            fan_out.put(i)
+    with pytest.raises(KeyError):
+        fan_out.close()
+    assert received == list(range(len(received)))
+    assert all(not thread.is_alive() for thread in fan_out._threads)
@@ -0,0 +1,124 @@
+"""
+Tests of the WebP header probe
+"""
+
+import struct
+
+import pytest
+from PIL import Image
+
+from main.core.probe import probe, frame_durations, ANMF_DISPOSE, ANMF_NO_BLEND, VP8X_ALPHA, VP8X_ANIMATION
+
+
+def chunk(fourcc, payload):
+    """A RIFF chunk, padded to an even size"""
+    return fourcc + struct.pack('<I', len(payload)) + payload + b'\0' * (len(payload) & 1)
+
+
+def uint24(value):
+    return value.to_bytes(3, 'little')
+
+
+def vp8l(width, height, alpha):
+    """Start of a lossless bitstream; the probe only reads the header"""
+    bits = (width - 1) | (height - 1) << 14 | int(alpha) << 28
+    return chunk(b'VP8L', b'\x2f' + struct.pack('<I', bits) + b'\0' * 5)
+
+
+def anmf(x, y, width, height, duration, flags=0, alpha=False):
+    header = uint24(x // 2) + uint24(y // 2) + uint24(width - 1) + uint24(height - 1) + uint24(duration)
+    return chunk(b'ANMF', header + bytes([flags]) + vp8l(width, height, alpha))
+
+
+def animation(size, frames, flags=VP8X_ANIMATION, loop_count=0):
+    """A WebP file with the given ANMF chunks"""
+    width, height = size
+    body = chunk(b'VP8X', bytes([flags, 0, 0, 0]) + uint24(width - 1) + uint24(height - 1))
+    body += chunk(b'ANIM', bytes([1, 2, 3, 4]) + struct.pack('<H', loop_count))
+    body += b''.join(frames)
+    return b'RIFF' + struct.pack('<I', 4 + len(body)) + b'WEBP' + body
+
+
+def test_animation_frames_from_anmf_headers():
+    data = animation((100, 80), [
+        anmf(0, 0, 100, 80, 40),
+        anmf(10, 20, 30, 16, 70, flags=ANMF_DISPOSE, alpha=True),
+        anmf(4, 6, 8, 8, 0, flags=ANMF_NO_BLEND),
+    ], flags=VP8X_ANIMATION | VP8X_ALPHA, loop_count=3)
+
+    info = probe(data)
+
+    assert info.size == (100, 80)
+    assert info.is_animated
+    assert info.has_alpha
+    assert info.loop_count == 3
+    assert info.background == (1, 2, 3, 4)
+    assert info.frame_count == 3
+    assert info.durations == [40, 70, 0]
+    assert [frame.region for frame in info.frames] == [(0, 0, 100, 80), (10, 20, 40, 36), (4, 6, 12, 14)]
+    assert [frame.dispose for frame in info.frames] == [False, True, False]
+    assert [frame.blend for frame in info.frames] == [True, True, False]
+    assert [frame.has_alpha for frame in info.frames] == [False, True, False]
+    assert info.partial
+    assert info.pixel_count == 100 * 80 * 3
+
+
+def test_single_frame_without_animation_flag_is_still():
+    info = probe(animation((16, 16), [anmf(0, 0, 16, 16, 50)], flags=0))
+    assert not info.is_animated
+    assert not info.partial
+
+
+def test_simple_lossless_still(tmp_path):
+    path = tmp_path / 'still.webp'
+    Image.new('RGBA', (33, 17), (1, 2, 3, 100)).save(path, lossless=True)
+
+    info = probe(str(path))
+
+    assert info.size == (33, 17)
+    assert not info.is_animated
+    assert info.has_alpha
+    assert info.loop_count is None
+    assert frame_durations(str(path)) == []
+
+
+def test_matches_pillow_for_saved_animation(tmp_path):
+    path = tmp_path / 'anim.webp'
+    frames = [Image.new('RGB', (48, 32), (i * 40, 0, 0)) for i in range(4)]
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=[10, 20, 30, 40], lossless=True)
+
+    info = probe(str(path))
+
+    with Image.open(path) as im:
+        assert info.size == im.size
+        assert info.frame_count == im.n_frames
+    assert frame_durations(str(path)) == [10, 20, 30, 40]
+
+
+def test_not_a_webp_file():
+    with pytest.raises(ValueError):
+        probe(b'GIF89a' + b'\0' * 20)
+
+
+@pytest.mark.parametrize('length', [0, 4, 11, 12, 20, 30, 45])
+def test_truncated_header_raises(length):
+    data = animation((100, 80), [anmf(0, 0, 100, 80, 40), anmf(10, 20, 30, 16, 70)])
+    with pytest.raises(ValueError):
+        probe(data[:length])
+
+
+def test_truncated_anmf_chunk_raises():
+    data = animation((100, 80), [anmf(0, 0, 100, 80, 40)])
+    # Cut inside the 16-byte ANMF header
+    cut = data.index(b'ANMF') + 8 + 10
+    with pytest.raises(ValueError):
+        probe(data[:cut])
+
+
+def test_truncated_after_complete_frames_keeps_them():
+    data = animation((100, 80), [anmf(0, 0, 100, 80, 40), anmf(10, 20, 30, 16, 70)])
+    # Drop the second frame entirely: the first is still described
+    cut = data.rindex(b'ANMF')
+    info = probe(data[:cut])
+    assert info.frame_count == 1
+    assert info.durations == [40]
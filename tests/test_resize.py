@@ -0,0 +1,69 @@
+"""
+Tests of frame downscaling
+"""
+
+import numpy as np
+import pytest
+
+from main.core.resize import Resize, get_resize, parse_max_size
+
+
+def resize(max_size=None, scale=None):
+    return Resize(max_size, scale, 'lanczos')
+
+
+@pytest.mark.parametrize('setting, size, expected', [
+    (resize(max_size=(320, 320)), (640, 480), (320, 240)),
+    (resize(max_size=(320, 320)), (480, 640), (240, 320)),
+    # 1000 * 0.3 = 300, 333 * 0.3 = 99.9, rounded down to even sizes
+    (resize(max_size=(300, 300)), (1000, 333), (300, 98)),
+    (resize(max_size=(1000, 1000)), (640, 480), (640, 480)),
+    (resize(max_size=(640, 480)), (640, 480), (640, 480)),
+])
+def test_output_size_max_size(setting, size, expected):
+    assert setting.output_size(size) == expected
+
+
+@pytest.mark.parametrize('setting, size, expected', [
+    (resize(scale=0.5), (640, 480), (320, 240)),
+    (resize(scale=0.5), (101, 75), (50, 36)),
+    (resize(scale=1.0), (101, 75), (101, 75)),
+    (resize(scale=0.01), (100, 50), (2, 2)),
+])
+def test_output_size_scale(setting, size, expected):
+    assert setting.output_size(size) == expected
+
+
+def test_smaller_limit_wins():
+    assert resize(max_size=(400, 400), scale=0.5).output_size((1000, 500)) == (400, 200)
+    assert resize(max_size=(900, 900), scale=0.5).output_size((1000, 500)) == (500, 250)
+
+
+def test_apply_downscales():
+    pixels = np.full((48, 64, 4), (10, 20, 30, 255), dtype=np.uint8)
+    out = resize(scale=0.5).apply(pixels)
+    assert out.shape == (24, 32, 4)
+    assert (out == (10, 20, 30, 255)).all()
+
+
+def test_apply_returns_frame_unchanged_without_downscaling():
+    pixels = np.zeros((8, 8, 4), dtype=np.uint8)
+    assert resize(max_size=(16, 16)).apply(pixels) is pixels
+
+
+def test_parse_max_size():
+    assert parse_max_size('640x480') == (640, 480)
+    assert parse_max_size('512') == (512, 512)
+    assert parse_max_size(256) == (256, 256)
+    for value in ('0x10', '1x2x3', 'abc'):
+        with pytest.raises(ValueError):
+            parse_max_size(value)
+
+
+def test_get_resize():
+    assert get_resize(None) is None
+    assert get_resize(Resize('320x200', None, 'bilinear')).max_size == (320, 200)
+    with pytest.raises(ValueError):
+        get_resize(resize(scale=1.5))
+    with pytest.raises(ValueError):
+        get_resize(Resize(None, 0.5, 'sinc'))
@@ -0,0 +1,67 @@
+"""
+Tests of job scheduling and cost calibration
+"""
+
+import pytest
+
+from main.core.scheduling import (SCHEDULE_INPUT, SCHEDULE_LONGEST, SCHEDULE_SHORTEST, FILE_OVERHEAD,
+                                  estimate_cost, schedule_order, fit_cost_scale)
+from main.core.resize import Resize
+
+
+@pytest.mark.parametrize('policy, expected', [
+    (SCHEDULE_INPUT, [0, 1, 2, 3]),
+    (SCHEDULE_LONGEST, [1, 3, 0, 2]),
+    (SCHEDULE_SHORTEST, [2, 0, 3, 1]),
+])
+def test_schedule_order(policy, expected):
+    assert schedule_order([2.0, 9.0, 1.0, 5.0], policy) == expected
+
+
+def test_equal_costs_keep_input_order():
+    assert schedule_order([1.0, 1.0, 1.0], SCHEDULE_LONGEST) == [0, 1, 2]
+    assert schedule_order([1.0, 1.0, 1.0], SCHEDULE_SHORTEST) == [0, 1, 2]
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        schedule_order([1.0], 'random')
+
+
+def test_fit_cost_scale_exact():
+    fit = fit_cost_scale([(1.0, 0.5), (2.0, 1.0), (4.0, 2.0)])
+    assert fit['seconds_per_unit'] == pytest.approx(0.5)
+    assert fit['samples'] == 3
+    assert fit['mean_relative_error'] == pytest.approx(0.0)
+
+
+def test_fit_cost_scale_least_squares():
+    # sum(c * t) / sum(c * c) = (1 * 1 + 2 * 4) / (1 + 4)
+    fit = fit_cost_scale([(1.0, 1.0), (2.0, 4.0)])
+    assert fit['seconds_per_unit'] == pytest.approx(9 / 5)
+    assert fit['mean_relative_error'] == pytest.approx((abs(1.8 - 1) / 1 + abs(3.6 - 4) / 4) / 2)
+
+
+def test_fit_cost_scale_ignores_unusable_samples():
+    assert fit_cost_scale([]) is None
+    assert fit_cost_scale([(None, 1.0), (0.0, 2.0), (1.0, 0.0)]) is None
+    assert fit_cost_scale([(None, 1.0), (2.0, 1.0)])['samples'] == 1
+
+
+def test_estimate_cost_unreadable_file(tmp_path):
+    path = tmp_path / 'broken.webp'
+    path.write_bytes(b'not a webp file')
+    assert estimate_cost(str(path)) == FILE_OVERHEAD
+
+
+def test_estimate_cost_grows_with_size_and_shrinks_with_resize(tmp_path):
+    from PIL import Image
+
+    small = tmp_path / 'small.webp'
+    large = tmp_path / 'large.webp'
+    Image.new('RGB', (64, 64)).save(small)
+    Image.new('RGB', (256, 256)).save(large)
+
+    assert estimate_cost(str(large)) > estimate_cost(str(small))
+    assert estimate_cost(str(large), resize=Resize(None, 0.25, 'lanczos')) < estimate_cost(str(large))
+    assert estimate_cost(str(large), still_duration=10) > estimate_cost(str(large), still_duration=1)
@@ -0,0 +1,35 @@
+"""
+Tests of segment planning
+"""
+
+import pytest
+
+from main.core.segments import plan_segments
+
+
+def test_short_animation_is_one_segment():
+    assert plan_segments(100, 4, min_frames=250) == [(0, 100)]
+
+
+def test_segments_limited_by_min_frames():
+    assert plan_segments(600, 8, min_frames=250) == [(0, 300), (300, 600)]
+
+
+def test_exact_multiple():
+    assert plan_segments(1000, 4, min_frames=250) == [(0, 250), (250, 500), (500, 750), (750, 1000)]
+
+
+@pytest.mark.parametrize('frame_count, segments, min_frames', [
+    (1001, 4, 250), (999, 3, 1), (7, 3, 2), (5000, 16, 250), (1, 4, 0), (0, 4, 1),
+])
+def test_segments_cover_all_frames_in_order(frame_count, segments, min_frames):
+    plan = plan_segments(frame_count, segments, min_frames)
+
+    assert 1 <= len(plan) <= max(1, segments)
+    assert plan[0][0] == 0
+    assert plan[-1][1] == frame_count
+    assert all(stop == start for (_, stop), (start, _) in zip(plan, plan[1:]))
+    lengths = [stop - start for start, stop in plan]
+    assert max(lengths) - min(lengths) <= 1
+    if len(plan) > 1:
+        assert min(lengths) >= min_frames
@@ -0,0 +1,164 @@
+"""
+Tests of the local HTTP conversion service
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from main.service.server import ConversionService, percentiles
+from conftest import make_animation
+
+
+def run_service(test, **kwargs):
+    """Run an async test function with a started service, passing it the service"""
+    async def main():
+        service = ConversionService(port=0, jobs=1, **kwargs)
+        await service.start()
+        try:
+            await test(service)
+        finally:
+            await service.stop()
+    asyncio.run(main())
+
+
+async def send(reader, writer, method, path, body=b'', headers=None):
+    """Send one request on a connection and read its response"""
+    lines = [f'{method} {path} HTTP/1.1', 'Host: localhost', f'Content-Length: {len(body)}']
+    lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+    status = int((await reader.readline()).split()[1])
+    response_headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1').strip()
+        if not line:
+            break
+        name, _, value = line.partition(':')
+        response_headers[name.lower()] = value.strip()
+    payload = await reader.readexactly(int(response_headers['content-length']))
+    return status, response_headers, payload
+
+
+async def request(service, method, path, body=b''):
+    """Send a request on a connection of its own"""
+    reader, writer = await asyncio.open_connection(service.host, service.port)
+    try:
+        return await send(reader, writer, method, path, body, {'Connection': 'close'})
+    finally:
+        writer.close()
+
+
+@pytest.fixture
+def webp(tmp_path):
+    with open(make_animation(tmp_path / 'clip.webp', [50, 100, 50]), 'rb') as f:
+        return f.read()
+
+
+def test_percentiles():
+    assert percentiles([]) == {'p50': None, 'p90': None, 'p99': None}
+    assert percentiles(list(range(1, 101))) == {'p50': 50, 'p90': 90, 'p99': 99}
+
+
+def test_health_and_metrics():
+    async def test(service):
+        status, _, payload = await request(service, 'GET', '/health')
+        assert status == 200
+        health = json.loads(payload)
+        assert health['status'] == 'ok' and health['workers'] == 1 and health['queue_depth'] == 0
+
+        status, _, payload = await request(service, 'GET', '/metrics')
+        metrics = json.loads(payload)
+        assert metrics['submitted'] == 0 and metrics['latency']['p50'] is None
+    run_service(test)
+
+
+def test_convert_returns_video(webp):
+    async def test(service):
+        status, headers, payload = await request(service, 'POST', '/convert?fps=10', webp)
+        assert status == 200
+        assert headers['content-type'] == 'video/mp4'
+        assert payload[4:8] == b'ftyp'
+
+        metrics = json.loads((await request(service, 'GET', '/metrics'))[2])
+        assert metrics['submitted'] == 1 and metrics['done'] == 1
+        assert metrics['latency']['p50'] > 0
+    run_service(test)
+
+
+def test_job_status_and_result(webp):
+    async def test(service):
+        status, headers, payload = await request(service, 'POST', '/jobs?profile=fast', webp)
+        assert status == 202
+        job = json.loads(payload)
+        assert headers['location'] == f"/jobs/{job['id']}"
+
+        for _ in range(200):
+            job = json.loads((await request(service, 'GET', f"/jobs/{job['id']}"))[2])
+            if job['status'] in ('done', 'failed'):
+                break
+            await asyncio.sleep(0.05)
+        assert job['status'] == 'done'
+        assert job['frame_count'] == 3
+
+        status, headers, payload = await request(service, 'GET', job['result'])
+        assert status == 200 and headers['x-job-id'] == job['id'] and payload[4:8] == b'ftyp'
+    run_service(test)
+
+
+def test_failed_conversion(webp):
+    async def test(service):
+        status, _, payload = await request(service, 'POST', '/convert', webp[:40])
+        assert status == 422
+        assert json.loads(payload)['error']
+        assert json.loads((await request(service, 'GET', '/metrics'))[2])['failed'] == 1
+    run_service(test)
+
+
+@pytest.mark.parametrize('method, path, body, expected', [
+    ('POST', '/jobs', b'not a webp file', 400),
+    ('POST', '/jobs?fps=0', None, 400),
+    ('POST', '/jobs?profile=nope', None, 400),
+    ('GET', '/jobs/unknown', b'', 404),
+    ('GET', '/jobs/unknown/result', b'', 404),
+    ('GET', '/nowhere', b'', 404),
+    ('DELETE', '/jobs', b'', 405),
+    ('GET', '/convert', b'', 405),
+])
+def test_rejected_requests(webp, method, path, body, expected):
+    async def test(service):
+        status, _, payload = await request(service, method, path, webp if body is None else body)
+        assert status == expected
+        assert json.loads(payload)['error']
+    run_service(test)
+
+
+def test_upload_too_large(webp):
+    async def test(service):
+        status, _, _ = await request(service, 'POST', '/jobs', webp)
+        assert status == 413
+    run_service(test, max_upload=100)
+
+
+def test_full_queue_answers_503(webp):
+    async def test(service):
+        # A queue the dispatchers do not read, already full
+        service._queue = asyncio.Queue(maxsize=1)
+        service._queue.put_nowait(None)
+        status, headers, _ = await request(service, 'POST', '/jobs', webp)
+        assert status == 503
+        assert headers['retry-after'] == '1'
+        assert service.counters['rejected'] == 1
+    run_service(test, queue_size=1)
+
+
+def test_keep_alive_serves_several_requests():
+    async def test(service):
+        reader, writer = await asyncio.open_connection(service.host, service.port)
+        try:
+            for _ in range(3):
+                status, headers, _ = await send(reader, writer, 'GET', '/health')
+                assert status == 200 and headers['connection'] == 'keep-alive'
+        finally:
+            writer.close()
+    run_service(test)
@@ -0,0 +1,11 @@
+import pytest
+
+from benchmarks.startup import IMPORT_BUDGETS, measure_import
+
+
+@pytest.mark.parametrize('module', sorted(IMPORT_BUDGETS))
+def test_entry_point_does_not_import_heavy_packages(module):
+    # Import times depend on the machine, so the budgets are left to benchmarks/startup.py
+    _, forbidden = IMPORT_BUDGETS[module]
+    _, packages = measure_import(module, repeat=1)
+    assert [package for package in forbidden if package in packages] == []
@@ -0,0 +1,73 @@
+"""
+Frame timing of converted videos: every frame keeps its own duration
+"""
+
+import pytest
+
+from main.core.converter import WebPConverter, PIPELINE_STREAM, PIPELINE_PNG
+from conftest import read_video
+
+UNEVEN = [100, 1000, 40, 260]
+
+
+def expected_times(durations):
+    times, total = [], 0
+    for duration in durations:
+        times.append(total)
+        total += duration
+    return times, total
+
+
+@pytest.mark.parametrize('pipeline', [PIPELINE_STREAM, PIPELINE_PNG])
+def test_uneven_durations_are_kept(tmp_path, animation, pipeline):
+    output = tmp_path / 'out.mp4'
+    result = WebPConverter.convert_file(animation(UNEVEN), str(output), pipeline=pipeline)
+
+    times, length = read_video(output)
+    expected, total = expected_times(UNEVEN)
+    assert times == pytest.approx(expected, abs=1)
+    assert length == pytest.approx(total, abs=10)
+    assert result.encoded_frames == len(UNEVEN)
+
+
+def test_uneven_durations_in_every_video_output(tmp_path, animation):
+    WebPConverter.convert_file(animation(UNEVEN), str(tmp_path / 'out.mp4'), outputs=['mp4', 'webm'])
+
+    expected, _ = expected_times(UNEVEN)
+    for name in ('out.mp4', 'out.webm'):
+        times, _ = read_video(tmp_path / name)
+        assert times == pytest.approx(expected, abs=1)
+
+
+def test_uneven_durations_across_segments(tmp_path, animation):
+    durations = [40 if i % 3 else 120 for i in range(520)]
+    output = tmp_path / 'out.mp4'
+    result = WebPConverter.convert_file(animation(durations, size=(16, 16)), str(output), segments=2)
+
+    times, _ = read_video(output)
+    expected, _ = expected_times(durations)
+    assert result.encoded_frames == len(durations)
+    assert times == pytest.approx(expected, abs=1)
+
+
+def test_given_fps_overrides_durations(tmp_path, animation):
+    output = tmp_path / 'out.mp4'
+    WebPConverter.convert_file(animation(UNEVEN), str(output), fps=10)
+
+    times, length = read_video(output)
+    assert times == pytest.approx([0, 100, 200, 300], abs=1)
+    assert length == pytest.approx(400, abs=10)
+
+
+def test_still_image_lasts_still_duration(tmp_path):
+    from PIL import Image
+
+    source = tmp_path / 'still.webp'
+    Image.new('RGB', (32, 24), (10, 20, 30)).save(source)
+    output = tmp_path / 'out.mp4'
+    result = WebPConverter.convert_file(str(source), str(output), still_duration=2)
+
+    times, length = read_video(output)
+    assert times == [0]
+    assert length == pytest.approx(2000, abs=10)
+    assert result.encoded_frames == 1
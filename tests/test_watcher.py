@@ -0,0 +1,126 @@
+"""
+Tests of the watch-folder daemon
+"""
+
+import os
+import threading
+from concurrent.futures import Future
+
+from main.core.batch import BatchConverter, FileResult
+from main.core.watcher import FolderWatcher
+from conftest import make_animation
+
+
+class InlineExecutor:
+    """Runs submitted jobs at once, in the calling thread"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append(args[0])
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def watcher(tmp_path, **kwargs):
+    kwargs.setdefault('settle_time', 2.0)
+    return FolderWatcher([str(tmp_path)], BatchConverter(jobs=1), **kwargs)
+
+
+def convert_ready(watch, now):
+    """Run one scan at the given time, converting the ready files inline"""
+    executor = InlineExecutor()
+    for path, mtime, size in watch._ready_files(watch._scan(), now):
+        watch._submit(executor, path, mtime, size, None)
+    watch._collect(None)
+    return executor.submitted
+
+
+def test_files_wait_until_settled(tmp_path):
+    path = make_animation(tmp_path / 'clip.webp', [50, 50])
+    (tmp_path / 'notes.txt').write_text('not a webp')
+    watch = watcher(tmp_path)
+
+    assert watch._ready_files(watch._scan(), 100.0) == []
+    assert watch._ready_files(watch._scan(), 101.0) == []
+    ready = watch._ready_files(watch._scan(), 102.0)
+    assert [entry[0] for entry in ready] == [path]
+
+
+def test_changing_file_restarts_settle_time(tmp_path):
+    path = tmp_path / 'clip.webp'
+    make_animation(path, [50, 50])
+    watch = watcher(tmp_path)
+    watch._ready_files(watch._scan(), 100.0)
+
+    with open(path, 'ab') as f:
+        f.write(b'more')
+    assert watch._ready_files(watch._scan(), 102.0) == []
+    assert watch._ready_files(watch._scan(), 104.0) != []
+
+
+def test_converted_file_is_recorded_and_not_converted_again(tmp_path):
+    path = make_animation(tmp_path / 'clip.webp', [50, 50])
+    watch = watcher(tmp_path, settle_time=0)
+
+    assert convert_ready(watch, 100.0) == []
+    assert convert_ready(watch, 100.0) == [path]
+    assert os.path.exists(tmp_path / 'clip.mp4')
+    assert watch.converted == 1
+    assert watch.state[path]['output'] == str(tmp_path / 'clip.mp4')
+
+    # The state file carries the record over to a new watcher
+    restarted = watcher(tmp_path, settle_time=0)
+    convert_ready(restarted, 200.0)
+    assert convert_ready(restarted, 200.0) == []
+
+
+def test_touched_file_with_same_content_is_not_converted(tmp_path):
+    path = make_animation(tmp_path / 'clip.webp', [50, 50])
+    watch = watcher(tmp_path, settle_time=0)
+    convert_ready(watch, 100.0)
+    convert_ready(watch, 100.0)
+
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    convert_ready(watch, 200.0)
+    assert convert_ready(watch, 200.0) == []
+    assert watch.state[path]['mtime'] == st.st_mtime_ns + 10 ** 9
+    assert watch.converted == 1
+
+
+def test_modified_file_is_converted_again(tmp_path):
+    path = make_animation(tmp_path / 'clip.webp', [50, 50])
+    watch = watcher(tmp_path, settle_time=0)
+    convert_ready(watch, 100.0)
+    convert_ready(watch, 100.0)
+
+    make_animation(path, [50, 50, 50])
+    convert_ready(watch, 200.0)
+    assert convert_ready(watch, 200.0) == [path]
+    assert watch.converted == 2
+
+
+def test_unreadable_state_file_starts_empty(tmp_path):
+    state_file = tmp_path / 'state.json'
+    state_file.write_text('{not json')
+    assert watcher(tmp_path, state_file=str(state_file)).state == {}
+
+
+def test_run_converts_until_stopped(tmp_path):
+    make_animation(tmp_path / 'clip.webp', [50, 50])
+    watch = watcher(tmp_path, settle_time=0, poll_interval=0.05)
+    results = []
+
+    def on_result(result):
+        results.append(result)
+        watch.stop()
+
+    thread = threading.Thread(target=watch.run, args=(on_result,))
+    thread.start()
+    thread.join(60)
+    assert not thread.is_alive()
+    assert len(results) == 1 and isinstance(results[0], FileResult) and results[0].success
+    assert os.path.exists(tmp_path / 'clip.mp4')